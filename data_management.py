@@ -4,8 +4,16 @@ import pandas as pd
 django.setup()
 from nba_py.team import TeamList
 from nba_py.player import PlayerList
-from nba_py.league import TeamStats
+from nba_py.league import TeamStats, PlayerStats
 from nba_stats.models import *
+from nba_stats.checkpoints import CheckpointStore
+from nba_stats.bulk import bulk_load_chunks
+from nba_stats.fingerprints import PlayerFingerprintStore, player_list_hash
+from nba_stats.derived_splits import derive_all_splits, derive_splits
+from nba_stats.stints import build_stints, build_stints_for_dates
+from nba_stats.helpers.game import backfill_play_by_play_numbers
+from nba_stats.aggregated_splits import (rebuild_traditional_splits,
+                                         aggregate_traditional_splits, compare_splits)
 from nba_stats.email_handler import EmailHandler
 from nba_stats.helpers.player import create_update_all_seasons_for_player
 from nba_stats.helpers.split import create_update_all_splits_for_entity
@@ -17,8 +25,11 @@ from nba_stats.web_handlers.player_handler import (PlayerTransactionHandler,
                                                    PlayerShotChartHandler,
                                                    PlayerHandler)
 from nba_stats.web_handlers.team_handler import OnOffHandler, TeamHandler
-from nba_stats.web_handlers.game_handler import (GameHandler, GameSummaryHandler,
-                                                 BoxScoreHandler, PlayByPlayHandler)
+from nba_stats.ingestion import GameIngestionPipeline
+from nba_stats.partitioning import ensure_season_partitions
+from nba_stats.query_plans import check_hot_queries
+from nba_stats.fetch_client import get_fetch_client
+from nba_stats.response_cache import configure_response_cache
 from nba_stats.utils import *
 from nba_stats.constants import *
 __author__ = 'John Griebel'
@@ -32,7 +43,10 @@ parser = argparse.ArgumentParser(description="Data management for NBAPex. This i
 parser.add_argument('command', choices=['teams', 'players', 'individuals', 'player_traditional',
                                         'team_seasons', 'shotcharts', 'coaches',
                                         'update_player_stats', 'update_team_stats',
-                                        'update_leaguewide_stats', 'update_all'])
+                                        'update_leaguewide_stats', 'update_all',
+                                        'backfill_players', 'check_query_plans',
+                                        'verify_splits', 'build_stints',
+                                        'backfill_pbp_numbers'])
 parser.add_argument('-begin-date', dest='begin_date',
                     help="Date should be entered in this format: YYYY-MM-DD.")
 parser.add_argument('-end-date', dest='end_date',
@@ -40,9 +54,16 @@ parser.add_argument('-end-date', dest='end_date',
 parser.add_argument('-year', dest="year",
                     help="Enter a year homie.")
 parser.add_argument("-season_type", dest="season_type", default=REGULAR_SEASON)
+parser.add_argument("-no-cache", dest="no_cache", action="store_true",
+                    help="Bypass the on disk stats.nba.com response cache.")
+parser.add_argument("-resume", "--resume", dest="resume", action="store_true",
+                    help="Skip work already completed by a previous (failed) run of the same "
+                         "update command for this year and season type.")
 
 
 args = parser.parse_args()
+if args.no_cache:
+    configure_response_cache(enabled=False)
 command = args.command
 begin_date = None
 end_date = None
@@ -62,12 +83,15 @@ if command == 'games':
         end_date = pd.datetime(year=end_date_parts[0], month=end_date_parts[1],
                                day=end_date_parts[2])
         kwargs = {'begin_date': begin_date, 'end_date': end_date}
-elif "update" in command:
+elif "update" in command or command in ["verify_splits", "build_stints"]:
     if args.year is None:
         parser.error("If you're trying to update, you need to enter a year!")
     else:
         kwargs['year'] = int(args.year)
         kwargs['season_type'] = args.season_type
+        kwargs['resume'] = args.resume
+elif command == 'backfill_pbp_numbers' and args.year is not None:
+    kwargs['year'] = int(args.year)
 
 
 def convert_season_type(season_type):
@@ -202,33 +226,73 @@ def seed_team_splits():
                                                                p=pct_done))
 
 
-def update_player_stats(season, season_type=REGULAR_SEASON):
+def backfill_placeholder_players():
+    # Box score and play by play ingestion create bare bones players (just an id, name and
+    # maybe a team) for anyone they haven't seen before. Fill in the rest of their bios here.
+    players = Player.objects.filter(first_name__isnull=True,
+                                    birthdate__isnull=True).order_by('id')
+    tot = players.count()
+    log.debug(("Backfilling ", tot, " placeholder players"))
+    for cur, player in enumerate(players, start=1):
+        log.debug(("Backfilling player #", cur, "/", tot, ": ", player.display_first_last))
+        player_handler = PlayerHandler(player)
+        try:
+            player_handler.fetch_raw_data()
+        except (IndexError, KeyError, Team.DoesNotExist) as e:
+            log.debug(("Couldn't find a bio for ", player.player_id, e))
+            continue
+        player_handler.create_update_player()
+    log.debug("Finished backfilling placeholder players.")
+
+
+def update_player_stats(season=None, year=None, season_type=REGULAR_SEASON, resume=False):
+    if year is not None:
+        season = LeagueSeason.objects.get(year=year)
     log.debug("Updating player statistics for " + str(season))
+    checkpoints = CheckpointStore('update_player_stats', season, season_type, resume=resume)
     player_list = PlayerList()
     # Only gets active players
-    person_ids = player_list.info()['PERSON_ID']
+    player_rows = player_list.info().to_dict('records')
+    fingerprints = PlayerFingerprintStore()
     cur = 1
-    tot = len(person_ids)
-    completed_pids = []
+    tot = len(player_rows)
+    completed_pids = [int(pid) for pid in checkpoints.completed_units("player")]
+    skipped = 0
     try:
-        for pid in person_ids:
-            if pid in completed_pids:
+        for row in player_rows:
+            pid = int(row['PERSON_ID'])
+            if checkpoints.is_done("player", pid):
+                cur += 1
                 continue
             log.debug(("Working on player #", cur, "/", tot, ". ",
                        str(100 * (cur/tot))[:4], "% done."))
-            player_handler = PlayerHandler(int(pid))
+            cur += 1
+            if not fingerprints.changed(pid, "list", player_list_hash(row)):
+                # Same team and roster status as last time, nothing worth fetching. Still
+                # counts as done, he needs his shot charts etc. like everybody else.
+                skipped += 1
+                completed_pids.append(pid)
+                continue
+
+            player_handler = PlayerHandler(pid)
             player_handler.fetch_raw_data()
-            player_handler.create_update_player()
+            if (fingerprints.changed(pid, "summary", player_handler.content_hash) or
+                    player_handler.player_instance is None):
+                player_handler.create_update_player()
 
             player = player_handler.player_instance
 
-            log.debug(("Begin updating transactions for ", player.display_first_last))
             ptrans_handler = PlayerTransactionHandler(player)
             ptrans_handler.fetch_raw_data()
-            ptrans_handler.transactions()
+            if fingerprints.changed(pid, "transactions", ptrans_handler.content_hash):
+                log.debug(("Begin updating transactions for ", player.display_first_last))
+                ptrans_handler.transactions()
 
+            fingerprints.save(pid)
+            checkpoints.mark_done("player", pid)
             completed_pids.append(pid)
-            cur += 1
+
+        log.debug(("Skipped ", skipped, " of ", tot, " players, unchanged since the last run"))
 
         lsh = LeagueStatsHandler()
         tracking_handler = LeaguePlayerTrackingHandler()
@@ -244,6 +308,13 @@ def update_player_stats(season, season_type=REGULAR_SEASON):
                     for measure_type in MEASURE_TYPES:
                         if measure_type in ["Four Factors", "Opponent", "Defense"]:
                             continue
+                        if (per_mode == TOTALS and measure_type == BASE and
+                                group_set in AGGREGATED_GROUP_SETS):
+                            # Rebuilt from the box scores in update_leaguewide_stats
+                            continue
+                        unit = ("splits", per_mode, group_set, group_value, measure_type)
+                        if checkpoints.is_done(*unit):
+                            continue
                         lsh.fetch_raw_data(measure_type=measure_type,
                                            per_mode=per_mode,
                                            group_set=group_set,
@@ -252,8 +323,13 @@ def update_player_stats(season, season_type=REGULAR_SEASON):
                                            season_type=season_type)
                         splits = lsh.splits()
                         log.debug("Just created or updated {x} splits".format(x=len(splits)))
+                        checkpoints.mark_done(*unit)
                     if per_mode == TOTALS:
                         for pt_measure_type in PT_MEASURE_TYPES:
+                            unit = ("tracking", per_mode, group_set, group_value,
+                                    pt_measure_type)
+                            if checkpoints.is_done(*unit):
+                                continue
                             tracking_handler.fetch_raw_data(pt_measure_type=pt_measure_type,
                                                             per_mode=per_mode,
                                                             group_set=group_set,
@@ -263,6 +339,12 @@ def update_player_stats(season, season_type=REGULAR_SEASON):
                             tracks = tracking_handler.tracking()
                             log.debug("Just created or updated {x} "
                                       "tracking records.".format(x=len(tracks)))
+                            checkpoints.mark_done(*unit)
+
+        if not checkpoints.is_done("derived_splits"):
+            # PerGame, Per36 etc. come from the Totals rather than from stats.nba.com
+            derive_all_splits("Player", season=season, season_type=season_type)
+            checkpoints.mark_done("derived_splits")
 
     except Exception as e:
         log.debug(("COMPLETED PIDS", completed_pids))
@@ -271,10 +353,11 @@ def update_player_stats(season, season_type=REGULAR_SEASON):
     return completed_pids
 
 
-def update_team_stats(season=None, year=None, season_type=REGULAR_SEASON):
+def update_team_stats(season=None, year=None, season_type=REGULAR_SEASON, resume=False):
     if year is not None:
         season = LeagueSeason.objects.get(year=year)
     log.debug(("Updating team stats for ", season))
+    checkpoints = CheckpointStore('update_team_stats', season, season_type, resume=resume)
     lsh = LeagueStatsHandler()
     for per_mode in [TOTALS, PER_POSSESSION, PER_PLAY]:
         for group_set in GROUP_SETS:
@@ -283,6 +366,13 @@ def update_team_stats(season=None, year=None, season_type=REGULAR_SEASON):
                 for measure_type in MEASURE_TYPES:
                     if measure_type == USAGE:
                         continue
+                    if (per_mode == TOTALS and measure_type == BASE and
+                            group_set in AGGREGATED_GROUP_SETS):
+                        # Rebuilt from the box scores in update_leaguewide_stats
+                        continue
+                    unit = ("splits", per_mode, group_set, group_value, measure_type)
+                    if checkpoints.is_done(*unit):
+                        continue
                     lsh.fetch_raw_data(player_or_team=TeamStats,
                                        measure_type=measure_type,
                                        per_mode=per_mode,
@@ -292,13 +382,20 @@ def update_team_stats(season=None, year=None, season_type=REGULAR_SEASON):
                                        season_type=season_type)
                     splits = lsh.splits()
                     log.debug("Just created or updated {x} team splits".format(x=len(splits)))
+                    checkpoints.mark_done(*unit)
+
+    if not checkpoints.is_done("derived_splits"):
+        derive_all_splits("Team", season=season, season_type=season_type)
+        checkpoints.mark_done("derived_splits")
 
     teams = get_currently_active_teams()
     cur = 1
     for team in teams:
         log.debug(("Working on ", team))
         log.debug((cur, "/", 30, " = ", str(100 * (cur/30))[:4], "% done."))
-        create_update_team_seasons(team, season)
+        if not checkpoints.is_done("team_seasons", team.team_id):
+            create_update_team_seasons(team, season)
+            checkpoints.mark_done("team_seasons", team.team_id)
 
         on_off_handler = OnOffHandler(team)
         for mtype in MEASURE_TYPES:
@@ -307,31 +404,39 @@ def update_team_stats(season=None, year=None, season_type=REGULAR_SEASON):
             for pmode in [TOTALS, PER_POSSESSION, PER_PLAY]:
                 if mtype == SCORING:
                     continue
+                unit = ("on_off", team.team_id, mtype, pmode)
+                if checkpoints.is_done(*unit):
+                    continue
                 on_off_handler.fetch_raw_data(measure_type=mtype,
                                               season=season,
                                               season_type=season_type,
                                               per_mode=pmode)
                 on_off_handler.all()
+                checkpoints.mark_done(*unit)
         log.debug(("Done updating", team))
         cur += 1
 
 
-def update_leaguewide_stats(season=None, year=None, season_type=REGULAR_SEASON):
+def update_leaguewide_stats(season=None, year=None, season_type=REGULAR_SEASON, resume=False):
     if year is not None:
         season = LeagueSeason.objects.get(year=year)
     log.debug(("Updating league wide stats for ", season))
+    checkpoints = CheckpointStore('update_leaguewide_stats', season, season_type, resume=resume)
     lineup_handler = LineupHandler()
     for mt in MEASURE_TYPES:
         if mt in [USAGE, DEFENSE]:
             continue
         for per_mode in [TOTALS, PER_POSSESSION, PER_PLAY]:
             for quant in range(2, 6):
+                if checkpoints.is_done("lineups", mt, per_mode, quant):
+                    continue
                 lineup_handler.fetch_raw_data(measure_type=mt,
                                               per_mode=per_mode,
                                               group_quantity=quant,
                                               season=season,
                                               season_type=season_type)
                 lineup_handler.lineups()
+                checkpoints.mark_done("lineups", mt, per_mode, quant)
 
     log.debug("Finished updating lineups")
 
@@ -345,87 +450,54 @@ def update_leaguewide_stats(season=None, year=None, season_type=REGULAR_SEASON):
     end_date = season.playoffs_end_date or date.today()
 
     log.debug(("Game range to update: ", start_date, " - ", end_date))
-    games = None
-    for dt in pd.date_range(start=start_date, end=end_date):
-        log.debug(("Beginning updates for games on ", dt))
-        game_handler = GameHandler()
-        games = game_handler.create_games(dt.date(), season)
-        Game.objects.bulk_create(games)
-
-        ostats = []
-        oxs = []
-        lscores = []
-
-        btypes = ['Traditional', 'Advanced', 'Misc', 'Scoring',
-                  'Usage', 'Tracking', 'Four Factors', 'Hustle']
-        bscore_dict = {}
-        for k in btypes:
-            bscore_dict[k] = {'players': [], 'teams': []}
-
-        pbp_events = []
-
-        for game in games:
-            summary_handler = GameSummaryHandler(game)
-            summary_handler.fetch_raw_data()
-
-            sup_game_info = summary_handler.game_info()
-            for fld in sup_game_info:
-                if fld == "game_time":
-                    # The NBA is utterly moronic, so we have to do this to handle the case
-                    # Where they sent us a timestamp such as 1:60; i.e. 1 hour 60 minutes.
-                    hours, minutes = [int(p) for p in sup_game_info[fld].split(":")]
-                    duration = timedelta(hours=hours, minutes=minutes)
-                    setattr(game, fld, duration)
-                    continue
-                setattr(game, fld, sup_game_info[fld])
-            game.save()
-
-            ostats += summary_handler.other_stats()
-            oxs += summary_handler.official_xrefs()
-            lscores += summary_handler.line_scores()
-
-            box_handler = BoxScoreHandler(game)
-            box_handler.fetch_raw_data()
-            for btype in btypes:
-                boxes = box_handler.boxscore(btype)
-                bscore_dict[btype]['players'] += boxes['players']
-                bscore_dict[btype]['teams'] += boxes['teams']
-
-            pbp_handler = PlayByPlayHandler(game)
-            pbp_handler.fetch_raw_data()
-
-            pbp_events += pbp_handler.play_by_play()
-
-        GameOtherStats.objects.bulk_create(ostats)
-        GameOfficialXref.objects.bulk_create(oxs)
-        LineScore.objects.bulk_create(lscores)
-
-        for btype in btypes:
-            player_boxes = bscore_dict[btype]['players']
-            team_boxes = bscore_dict[btype]['teams']
-
-            if player_boxes:
-                player_boxes[0].__class__.objects.bulk_create(player_boxes)
-            if team_boxes:
-                team_boxes[0].__class__.objects.bulk_create(team_boxes)
-
-        PlayByPlayEvent.objects.bulk_create(pbp_events)
-        log.debug(("Finished updates for all games on ", dt))
-
-    if games is not None:
-        game_log_handler = GameLogHandler()
-        game_log_handler.fetch_raw_data(season=season,
-                                        season_type=season_type)
-        game_ids = games.values_list('game_id', flat=True)
-        game_logs = game_log_handler.game_logs(game_ids=game_ids)
-        PlayerGameLog.objects.bulk_create(game_logs)
+    # Box scores and play by play are partitioned by season on Postgres
+    ensure_season_partitions(season.year)
+    # Fetching, parsing and writing of consecutive dates overlap; see nba_stats/ingestion.py
+    pipeline = GameIngestionPipeline(season, checkpoints=checkpoints)
+    dates = [dt.date() for dt in pd.date_range(start=start_date, end=end_date)
+             if not checkpoints.is_done("game_date", dt.date())]
+    pipeline.run(dates)
+    log.debug(("Request rate limiter state ", get_fetch_client().metrics()))
+
+    # Everything loaded for the season this time round, including by an earlier run being
+    # resumed; the steps below only go by their own checkpoints
+    loaded_dates = dates + [convert_datetime_string_to_date_instance(game_date) for game_date
+                            in checkpoints.completed_units("game_date")]
+    games = list(Game.objects.filter(season=season, game_date_est__in=loaded_dates))
+
+    if not checkpoints.is_done("stints"):
+        # Who was on the court when, from the play by play loaded for every date
+        build_stints_for_dates(season, loaded_dates)
+        checkpoints.mark_done("stints")
+
+    if not checkpoints.is_done("game_logs"):
+        game_ids = [game.game_id for game in games]
+        if game_ids:
+            game_log_handler = GameLogHandler()
+            game_log_handler.fetch_raw_data(season=season,
+                                            season_type=season_type)
+            game_logs = game_log_handler.game_logs(game_ids=game_ids)
+            # game_logs is a generator, so load it a chunk at a time rather than all at once
+            bulk_load_chunks(PlayerGameLog, game_logs)
+        checkpoints.mark_done("game_logs")
+
+    # Now that the box scores are in, rebuild the traditional splits they add up to
+    for entity, split_model in [("Player", PlayerTraditionalSplit),
+                                ("Team", TeamTraditionalSplit)]:
+        if checkpoints.is_done("aggregated_splits", entity):
+            continue
+        rebuild_traditional_splits(entity, season, season_type)
+        derive_splits(split_model, season=season, season_type=season_type)
+        checkpoints.mark_done("aggregated_splits", entity)
     return games
 
 
-def create_shotchart_details(season, players, game_ids=None):
+def create_shotchart_details(season, players, game_ids=None, checkpoints=None):
     sc_handler = PlayerShotChartHandler()
 
     for player in players:
+        if checkpoints is not None and checkpoints.is_done("shotcharts", player.player_id):
+            continue
         log.debug(("Begin updating shot charts for ", player.display_first_last))
 
         sc_handler.fetch_raw_data(player=player,
@@ -436,23 +508,95 @@ def create_shotchart_details(season, players, game_ids=None):
 
         log.debug(("Just created scdtls for ",
                    player.display_first_last))
+        if checkpoints is not None:
+            checkpoints.mark_done("shotcharts", player.player_id)
 
 
-def update_all(year, season_type=REGULAR_SEASON):
+def update_all(year, season_type=REGULAR_SEASON, resume=False):
     log.debug("Updating all statistical data")
     season = LeagueSeason.objects.get(year=year)
+    checkpoints = CheckpointStore('update_all', season, season_type, resume=resume)
 
-    player_id_list = update_player_stats(season, season_type)
+    player_id_list = update_player_stats(season=season, season_type=season_type, resume=resume)
     players = Player.objects.filter(id__in=player_id_list)
-    games = update_leaguewide_stats(season, season_type)
-    game_ids = games.values_list('game_id', flat=True).distinct('game_id')
-    update_team_stats(season)
+    games = update_leaguewide_stats(season=season, season_type=season_type, resume=resume)
+    # Only the shots from the games just loaded; an empty list means there weren't any
+    game_ids = [game.game_id for game in games]
+    update_team_stats(season=season, season_type=season_type, resume=resume)
 
-    create_shotchart_details(season, players, game_ids)
+    if game_ids:
+        create_shotchart_details(season, players, game_ids, checkpoints=checkpoints)
+    backfill_placeholder_players()
 
     log.debug("Completed updating all statistical data")
 
 
+def verify_splits(season=None, year=None, season_type=REGULAR_SEASON, resume=False):
+    # Fetches the traditional splits we rebuild from box scores and reports every difference
+    # between theirs and ours. Nothing is saved.
+    if year is not None:
+        season = LeagueSeason.objects.get(year=year)
+    lsh = LeagueStatsHandler()
+    mismatches = []
+    for entity, player_or_team in [("Player", PlayerStats), ("Team", TeamStats)]:
+        ours = aggregate_traditional_splits(entity, season, season_type)
+        if ours is None:
+            log.debug(("No box scores to verify ", entity, " splits against"))
+            continue
+        fetched = []
+        for group_set in AGGREGATED_GROUP_SETS:
+            # We've never fetched e.g. Days Rest, so have no way to ask for it
+            for group_value in SET_TO_VALUES_MAP.get(group_set, []):
+                if group_set == "Month" and group_value == "0":
+                    continue
+                if group_value == "CUR_SEASON":
+                    group_value = make_season_str(season.year)
+                lsh.fetch_raw_data(player_or_team=player_or_team, measure_type=BASE,
+                                   per_mode=TOTALS, group_set=group_set,
+                                   group_value=group_value, season=season,
+                                   season_type=season_type)
+                fetched += lsh.raw_data
+        fetched_sets = {row['group_set'] for row in fetched}
+        ours = ours[ours['group_set'].isin(fetched_sets)]
+        mismatches += [(entity,) + mismatch for mismatch in compare_splits(entity, ours, fetched)]
+    for mismatch in mismatches:
+        print(mismatch)
+    print("{n} differences between the fetched and rebuilt splits".format(n=len(mismatches)))
+    return mismatches
+
+
+def rebuild_season_stints(season=None, year=None, season_type=REGULAR_SEASON, resume=False):
+    # Stints for every game of the season we have play by play for
+    if year is not None:
+        season = LeagueSeason.objects.get(year=year)
+    games = Game.objects.filter(season=season).order_by('game_date_est')
+    total = build_stints(games)
+    log.debug(("Built ", total, " stints for ", season))
+    return total
+
+
+def backfill_pbp_numbers(year=None):
+    # Play by play stored before elapsed_seconds and the scores were parsed at ingestion.
+    # Every season unless a year is given.
+    games = Game.objects.order_by('game_date_est')
+    if year is not None:
+        games = games.filter(season__year=year)
+    total = backfill_play_by_play_numbers(games)
+    log.debug(("Backfilled ", total, " play by play events"))
+    return total
+
+
+def check_query_plans():
+    # Exits non zero if any of the hot queries has stopped using its index
+    failures = check_hot_queries()
+    for label, plan in failures.items():
+        print(label + " isn't using its index:")
+        print("\n".join("    " + line for line in plan))
+    if failures:
+        raise SystemExit(1)
+    print("All hot queries are using their indexes.")
+
+
 def error_func():
     raise NotImplementedError("The doofus that wrote this program needs to implement"
                               " whatever it is you are trying to do.")
@@ -465,7 +609,12 @@ func_dict = {'teams': seed_teams,
              'update_player_stats': update_player_stats,
              'update_team_stats': update_team_stats,
              'update_leaguewide_stats': update_leaguewide_stats,
-             'update_all': update_all}
+             'update_all': update_all,
+             'backfill_players': backfill_placeholder_players,
+             'check_query_plans': check_query_plans,
+             'verify_splits': verify_splits,
+             'build_stints': rebuild_season_stints,
+             'backfill_pbp_numbers': backfill_pbp_numbers}
 
 action_func = func_dict.get(command, error_func)
 
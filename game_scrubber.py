@@ -3,7 +3,8 @@ import argparse
 import django
 import pandas as pd
 django.setup()
-from nba_stats.models import *
+from nba_stats.models import Game
+from nba_stats.scrubber import GameScrubber
 
 parser = argparse.ArgumentParser(description="Delete games and all relevant information from the "
                                              "database because something went wrong during data"
@@ -34,39 +35,18 @@ elif mode == 'after':
 elif mode == 'all':
     games = Game.objects.all()
 
-if games:
+if games is not None and games.exists():
     print("Number of Games to be deleted: {num_games}".format(num_games=games.count()))
-    # There's probably a cleverer way to do this, but being explicit is fine.
-    qs_to_delete = [LineScore.objects.filter(game__in=games),
-                    PlayerTraditionalBoxScore.objects.filter(game__in=games),
-                    PlayerAdvancedBoxScore.objects.filter(game__in=games),
-                    PlayerMiscBoxScore.objects.filter(game__in=games),
-                    PlayerScoringBoxScore.objects.filter(game__in=games),
-                    PlayerUsageBoxScore.objects.filter(game__in=games),
-                    PlayerTrackingBoxScore.objects.filter(game__in=games),
-                    PlayerFourFactorsBoxScore.objects.filter(game__in=games),
-                    PlayerHustleStatsBoxScore.objects.filter(game__in=games),
-                    TeamTraditionalBoxScore.objects.filter(game__in=games),
-                    TeamAdvancedBoxScore.objects.filter(game__in=games),
-                    TeamMiscBoxScore.objects.filter(game__in=games),
-                    TeamScoringBoxScore.objects.filter(game__in=games),
-                    TeamUsageBoxScore.objects.filter(game__in=games),
-                    TeamTrackingBoxScore.objects.filter(game__in=games),
-                    TeamFourFactorsBoxScore.objects.filter(game__in=games),
-                    TeamHustleStatsBoxScore.objects.filter(game__in=games),
-                    PlayByPlayEvent.objects.filter(game__in=games),
-                    GameOfficialXref.objects.filter(game__in=games),
-                    # Need to guarantee that games will be deleted last
-                    games]
-
-    for qs in qs_to_delete:
-        if qs:
-            print("About to delete {n} {model}".format(n=qs.count(),
-                                                       model=qs.first().__class__.__name__))
-            if pretend:
-                print("Pretend mode is on. Skipping actual deletion")
-            else:
-                qs.delete()
+    # Everything that points at a game is deleted along with it, see nba_stats/scrubber.py
+    scrubber = GameScrubber(games)
+
+    if pretend:
+        for label, count in scrubber.counts().items():
+            print("About to delete {n} {model}".format(n=count, model=label))
+        print("Pretend mode is on. Skipping actual deletion")
+    else:
+        for label, count in scrubber.delete().items():
+            print("Deleted {n} {model}".format(n=count, model=label))
 
 else:
     print("No games were found for the date range chosen!")
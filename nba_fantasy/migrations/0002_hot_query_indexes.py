@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# Lineups are always looked up by team and date (or a range of dates), and rosters are
+# nearly always the current one. Index names are the ones nba_stats/query_plans.py checks for.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nba_fantasy', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX fantasy_lineup_entry_team_date "
+            "ON fantasy_lineup_entry (team_id, lineup_date)",
+            "DROP INDEX IF EXISTS fantasy_lineup_entry_team_date"),
+        migrations.RunSQL(
+            "CREATE INDEX fantasy_team_roster_entry_current "
+            "ON fantasy_team_roster_entry (team_id) WHERE end_date IS NULL",
+            "DROP INDEX IF EXISTS fantasy_team_roster_entry_current"),
+    ]
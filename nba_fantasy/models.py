@@ -318,9 +318,8 @@ class FantasyLineupEntry(models.Model):
             # game_log = PlayerGameLog.objects.filter(player=self.player,
             #                                         game_date=self.lineup_date)
             # if game_log.exists():
-            pbs = PlayerTraditionalBoxScore.objects.filter(player=self.player,
-                                                           game__game_date_est=
-                                                           self.lineup_date).first()
+            pbs = PlayerTraditionalBoxScore.objects.for_date(self.lineup_date).filter(
+                player=self.player).first()
             scoring_settings = self.team.league.scoringsettings
             model_fields_map = scoring_settings.get_model_fields_map(suffix="BoxScore")
             total_score = 0
@@ -328,8 +327,9 @@ class FantasyLineupEntry(models.Model):
                 model = getattr(stats_models, model_name)
                 fields = model_fields_map[model_name]
                 if pbs is not None:
-                    values = model.objects.filter(player=self.player,
-                                                  game=pbs.game).values(*fields).first()
+                    values = model.objects.filter(player=self.player, game=pbs.game_id,
+                                                  season_year=pbs.season_year
+                                                  ).values(*fields).first()
                 else:
                     values = None
                 for fld in fields:
@@ -0,0 +1,219 @@
+import calendar
+import logging
+import numpy as np
+import pandas as pd
+from nba_stats.bulk import bulk_upsert
+from nba_stats.frames import map_column, iter_frame_rows
+from nba_stats.models import (Game, Player, Team, PlayerTraditionalBoxScore,
+                              TeamTraditionalBoxScore, PlayerTraditionalSplit,
+                              TeamTraditionalSplit)
+from nba_stats.utils import make_season_str
+from nba_stats.constants import (PLAYOFFS, TOTALS, BASE, AGGREGATED_GROUP_SETS, MAX_DAYS_REST,
+                                 PLAYERS_ON_COURT)
+log = logging.getLogger('stats')
+
+# Rebuilds traditional Totals splits from the box scores we already have, instead of asking
+# stats.nba.com for each group set/group value. Every group set here is just a different
+# way of bucketing the same games, so it's one read of the box scores for the season and then
+# a groupby per group set. aggregate_traditional_splits does the math without saving anything,
+# so the results can be checked against the fetched splits with compare_splits.
+
+# Box score columns that are simply added up. blka and pfd aren't in the box scores, so
+# rebuilt splits leave whatever was there already.
+SUM_FIELDS = ["min", "fgm", "fga", "fg3m", "fg3a", "ftm", "fta", "oreb", "dreb", "reb", "ast",
+              "stl", "blk", "tov", "pf", "pts", "plus_minus"]
+# percentage -> (made, attempted)
+PCT_FIELDS = {'fg_pct': ("fgm", "fga"), 'fg3_pct': ("fg3m", "fg3a"), 'ft_pct': ("ftm", "fta")}
+DOUBLE_DOUBLE_STATS = ["pts", "reb", "ast", "stl", "blk"]
+
+# entity -> (box score model, split model, entity model)
+ENTITY_MODELS = {'Player': (PlayerTraditionalBoxScore, PlayerTraditionalSplit, Player),
+                 'Team': (TeamTraditionalBoxScore, TeamTraditionalSplit, Team)}
+
+# How far apart ours and the NBA's numbers can be and still be considered the same. Minutes
+# are rounded differently game to game, everything else should match exactly.
+COMPARE_TOLERANCES = {'min': 1.0, 'fg_pct': 0.001, 'fg3_pct': 0.001, 'ft_pct': 0.001,
+                      'w_pct': 0.001}
+COMPARE_FIELDS = ["gp", "w", "l", "w_pct"] + SUM_FIELDS + list(PCT_FIELDS)
+
+
+def season_games(season, season_type):
+    # Games of the season type, as a frame of id, date and home team
+    games = Game.objects.filter(season=season)
+    if season_type == PLAYOFFS:
+        games = games.filter(game_date_est__gte=season.playoffs_start_date)
+    else:
+        games = games.filter(game_date_est__gte=season.regular_season_start_date,
+                             game_date_est__lt=season.playoffs_start_date)
+    return pd.DataFrame.from_records(list(games.values_list('id', 'game_date_est',
+                                                            'home_team_id')),
+                                     columns=['game_id', 'game_date', 'home_team_id'])
+
+
+def all_star_break(games):
+    # The last game day before the All-Star break, i.e. the start of the longest stretch
+    # without games in February. None if there were no February games.
+    dates = pd.Series(sorted(set(games['game_date'])))
+    dates = dates[dates.map(lambda dt: dt.month) == 2].reset_index(drop=True)
+    if len(dates) < 2:
+        return None
+    gaps = dates.diff().shift(-1)
+    return dates[gaps.idxmax()]
+
+
+def _team_results(game_ids, season):
+    # (game_id, team) -> whether that team won, from the two teams' points
+    rows = (TeamTraditionalBoxScore.objects.filter(season_year=season.year, game_id__in=game_ids)
+            .values_list('game_id', 'team_id', 'pts'))
+    results = pd.DataFrame.from_records(list(rows), columns=['game_id', 'team_id', 'pts'])
+    opp_pts = results.groupby('game_id')['pts'].transform('sum') - results['pts']
+    results['win'] = results['pts'] > opp_pts
+    return results[['game_id', 'team_id', 'win']]
+
+
+def clean_box_score_frame(frame, entity):
+    # Box score rows as they come out of the db -> one row per entity per game played, keyed
+    # on entity.lower(), with every SUM_FIELDS column a float
+    if entity == "Team":
+        frame.insert(0, "team", frame['team_id'])
+    else:
+        frame = frame.rename(columns={'player_id': "player"})
+        # Box scores list guys who didn't get off the bench, they didn't play in the game
+        frame = frame[frame['min'].fillna(0).astype(float) > 0].copy()
+    for field in SUM_FIELDS:
+        frame[field] = frame[field].fillna(0).astype(float)
+    if entity == "Team":
+        # A team box score's minutes are its players' added up (240 for a regulation game),
+        # the NBA's team splits count the minutes the team played
+        frame['min'] = frame['min'] / PLAYERS_ON_COURT
+    return frame
+
+
+def box_score_frame(entity, season, season_type):
+    # One row per entity per game played, with the game's date and home team and whether
+    # the entity's team won
+    box_score_model = ENTITY_MODELS[entity][0]
+    games = season_games(season, season_type)
+    if games.empty:
+        return None, games
+    key = entity.lower()
+    columns = [key + "_id", "game_id", "team_id"] + SUM_FIELDS
+    if entity == "Team":
+        columns = columns[1:]
+    rows = (box_score_model.objects.filter(season_year=season.year,
+                                           game_id__in=games['game_id'].tolist())
+            .values_list(*columns))
+    frame = clean_box_score_frame(pd.DataFrame.from_records(list(rows), columns=columns), entity)
+    frame = frame.merge(games, on='game_id')
+    frame = frame.merge(_team_results(games['game_id'].tolist(), season),
+                        on=['game_id', 'team_id'], how='left')
+    frame['win'] = frame['win'].fillna(False).astype(bool)
+    return frame, games
+
+
+def group_values(frame, entity, group_set, season, season_type, games):
+    # The group value for each box score row under group_set, NaN for rows that don't
+    # belong to any
+    key = entity.lower()
+    if group_set == "Overall":
+        return pd.Series(make_season_str(season.year), index=frame.index)
+    if group_set == "Location":
+        return pd.Series(np.where(frame['team_id'] == frame['home_team_id'], "Home", "Road"),
+                         index=frame.index)
+    if group_set == "Month":
+        return frame['game_date'].map(lambda dt: calendar.month_name[dt.month])
+    if group_set == "Wins/Losses":
+        return pd.Series(np.where(frame['win'], "W", "L"), index=frame.index)
+    if group_set == "Pre/Post All-Star":
+        if season_type == PLAYOFFS:
+            return pd.Series("Post All-Star", index=frame.index)
+        break_date = all_star_break(games)
+        if break_date is None:
+            return pd.Series(np.nan, index=frame.index)
+        return pd.Series(np.where(frame['game_date'] <= break_date, "Pre All-Star",
+                                  "Post All-Star"), index=frame.index)
+    if group_set == "Days Rest":
+        ordered = frame.sort_values([key, 'game_date'])
+        days = pd.to_datetime(ordered['game_date']).groupby(ordered[key]).diff().dt.days - 1
+        days = days.clip(upper=MAX_DAYS_REST)
+        # No rest to speak of before an entity's first game
+        labels = days.map(lambda d: np.nan if pd.isnull(d) else
+                          ("{d}+ Days Rest" if d == MAX_DAYS_REST else
+                           "{d} Days Rest").format(d=int(d)))
+        return labels.reindex(frame.index)
+    raise ValueError("Can't aggregate the {gs} group set".format(gs=group_set))
+
+
+def _aggregate(frame, entity, group_set, values):
+    key = entity.lower()
+    frame = frame.assign(group_value=values).dropna(subset=['group_value'])
+    sum_fields = SUM_FIELDS + ['win']
+    if entity == "Player":
+        # How many of the double double stats a player got into double figures in
+        tens = (frame[DOUBLE_DOUBLE_STATS] >= 10).sum(axis=1)
+        frame = frame.assign(dd2=(tens >= 2).astype(int), td3=(tens >= 3).astype(int))
+        sum_fields += ['dd2', 'td3']
+    grouped = frame.groupby([key, 'group_value'])
+    splits = grouped[sum_fields].sum()
+    splits['gp'] = grouped.size()
+    splits = splits.reset_index()
+    splits['w'] = splits.pop('win').astype(int)
+    splits['l'] = splits['gp'] - splits['w']
+    splits['w_pct'] = (splits['w'] / splits['gp']).round(3)
+    for pct, (made, attempted) in PCT_FIELDS.items():
+        splits[pct] = (splits[made] / splits[attempted]).where(splits[attempted] > 0, 0).round(3)
+    splits['min'] = splits['min'].round(1)
+    splits['group_set'] = group_set
+    return splits
+
+
+def aggregate_traditional_splits(entity, season, season_type, group_sets=AGGREGATED_GROUP_SETS):
+    # entity is "Player" or "Team". Returns a frame with one row per split, keyed on the
+    # entity's id, group_set and group_value, or None if there are no games to go on.
+    frame, games = box_score_frame(entity, season, season_type)
+    if frame is None or frame.empty:
+        return None
+    splits = [_aggregate(frame, entity, group_set,
+                         group_values(frame, entity, group_set, season, season_type, games))
+              for group_set in group_sets]
+    return pd.concat(splits, ignore_index=True)
+
+
+def rebuild_traditional_splits(entity, season, season_type, group_sets=AGGREGATED_GROUP_SETS):
+    splits = aggregate_traditional_splits(entity, season, season_type, group_sets)
+    if splits is None:
+        return []
+    split_model, entity_model = ENTITY_MODELS[entity][1:]
+    key = entity.lower()
+    entities = entity_model.objects.in_bulk(splits[key].unique().tolist())
+    splits[key] = map_column(splits[key], entities.get).astype(object)
+    constants = {'season': season, 'season_type': season_type, 'measure_type': BASE,
+                 'per_mode': TOTALS, 'create_user': "rebuild_traditional_splits"}
+    result = bulk_upsert(split_model, list(iter_frame_rows(splits, constants)))
+    log.debug(("Rebuilt ", result.created, " new and ", result.updated, " existing ",
+               split_model.__name__, "s from box scores"))
+    return result.objects
+
+
+def compare_splits(entity, splits, fetched_rows):
+    # Checks our splits against ones fetched from stats.nba.com (LeagueStatsHandler.raw_data),
+    # returning a list of (entity id, group_set, group_value, field, ours, theirs) for every
+    # difference. A field of None means one side has a split the other doesn't.
+    key = entity.lower()
+    fetched = pd.DataFrame([dict(row, **{key: row[key].pk}) for row in fetched_rows])
+    theirs = {(row[key], row['group_set'], str(row['group_value'])): row
+              for row in fetched.to_dict('records')}
+    ours = {(row[key], row['group_set'], str(row['group_value'])): row
+            for row in splits.to_dict('records')}
+    mismatches = []
+    for split_key in set(ours) ^ set(theirs):
+        mismatches.append(split_key + (None, split_key in ours, split_key in theirs))
+    for split_key in set(ours) & set(theirs):
+        for field in COMPARE_FIELDS:
+            if field not in theirs[split_key] or theirs[split_key][field] is None:
+                continue
+            our_value = float(ours[split_key][field])
+            their_value = float(theirs[split_key][field])
+            if abs(our_value - their_value) > COMPARE_TOLERANCES.get(field, 0):
+                mismatches.append(split_key + (field, our_value, their_value))
+    return mismatches
@@ -6,4 +6,9 @@ class NbaStatsConfig(AppConfig):
     verbose_name = "NBA Stats Application"
 
     def ready(self):
-        import nba_stats.signals
\ No newline at end of file
+        import nba_stats.signals
+        from nba_stats.fetch_client import install_nba_py_transport
+        install_nba_py_transport()
+        # Field metadata for every model, so the parsers never have to go through _meta
+        from nba_stats.model_registry import get_model_registry
+        get_model_registry().build()
\ No newline at end of file
@@ -0,0 +1,215 @@
+import logging
+from collections import namedtuple
+from datetime import timedelta
+from itertools import islice
+from django.db import connections, transaction
+from django.utils import timezone
+from nba_stats.constants import BULK_UPSERT_BATCH_SIZE, BULK_LOAD_WITH_COPY, FRAME_CHUNK_SIZE
+from nba_stats.model_registry import get_model_registry
+from nba_stats.utils import make_unique_filter_dict
+log = logging.getLogger('stats')
+
+UpsertResult = namedtuple('UpsertResult', ['objects', 'created', 'updated'])
+
+
+def _unique_fields(model):
+    # Same rules as make_unique_filter_dict
+    return list(get_model_registry().info(model).unique_fields)
+
+
+def _chunks(items, size):
+    for idx in range(0, len(items), size):
+        yield items[idx:idx + size]
+
+
+def _upsert_one(model, data):
+    filter_dict = make_unique_filter_dict(model, data=data)
+    obj, created = model.objects.update_or_create(**filter_dict, defaults=data)
+    return obj, created
+
+
+def _upsert_batch(model, rows, key_fields, connection):
+    # rows all have the same keys, so the same INSERT column list and UPDATE SET clause.
+    # xmax is 0 for a freshly inserted row and the locking transaction id for one that was
+    # updated through ON CONFLICT, which is how we tell created and updated apart.
+    opts = model._meta
+    qn = connection.ops.quote_name
+    now = timezone.now()
+    fields = [f for f in opts.concrete_fields if not f.primary_key]
+    update_fields = [f for f in fields if f.name in rows[0] and f.name not in key_fields]
+
+    objs = []
+    params = []
+    for data in rows:
+        obj = model(**data)
+        if hasattr(obj, "create_ts"):
+            obj.create_ts = now
+        if hasattr(obj, "normalize_season_type"):
+            obj.normalize_season_type()
+        if hasattr(obj, "set_partition_key"):
+            obj.set_partition_key()
+        objs.append(obj)
+        params += [f.get_db_prep_save(getattr(obj, f.attname), connection) for f in fields]
+
+    columns = ", ".join(qn(f.column) for f in fields)
+    conflict = ", ".join(qn(opts.get_field(name).column) for name in key_fields)
+    assignments = ["{c} = EXCLUDED.{c}".format(c=qn(f.column)) for f in update_fields]
+    if "mod_ts" in [f.name for f in fields]:
+        assignments.append("{c} = EXCLUDED.{ts}".format(c=qn("mod_ts"), ts=qn("create_ts")))
+    if not assignments:
+        # DO NOTHING wouldn't give us the existing row back
+        col = qn(opts.get_field(key_fields[0]).column)
+        assignments.append("{c} = EXCLUDED.{c}".format(c=col))
+    placeholder = "(" + ", ".join(["%s"] * len(fields)) + ")"
+    sql = ("INSERT INTO {table} ({columns}) VALUES {values} "
+           "ON CONFLICT ({conflict}) DO UPDATE SET {assignments} "
+           "RETURNING {pk}, (xmax = 0)").format(table=qn(opts.db_table), columns=columns,
+                                                values=", ".join([placeholder] * len(objs)),
+                                                conflict=conflict,
+                                                assignments=", ".join(assignments),
+                                                pk=qn(opts.pk.column))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        returned = cursor.fetchall()
+
+    created = 0
+    # Postgres returns the rows in VALUES order
+    for obj, (pk, inserted) in zip(objs, returned):
+        obj.pk = pk
+        created += int(inserted)
+    return objs, created
+
+
+def _group_upsert_rows(model, rows, vendor):
+    # Returns ({column set: {key values: data}}, rows for update_or_create). Rows in a group
+    # share their columns, so they can go in the same INSERT.
+    fallback_rows = []
+    groups = {}
+    for data in rows:
+        filter_dict = make_unique_filter_dict(model, data=data)
+        if vendor != 'postgresql' or None in filter_dict.values():
+            fallback_rows.append(data)
+            continue
+        # A statement can't touch the same row twice, so the last dict for a key wins
+        key = tuple(sorted(data.keys()))
+        identity = tuple(getattr(v, 'pk', v) for v in filter_dict.values())
+        groups.setdefault(key, {})[identity] = data
+    return groups, fallback_rows
+
+
+def bulk_upsert(model, rows, batch_size=BULK_UPSERT_BATCH_SIZE, using="default"):
+    # Creates or updates a row per data dict, matching existing rows on the model's
+    # unique_together (see make_unique_filter_dict). The set based equivalent of calling
+    # update_or_create(**filter_dict, defaults=data) for each one.
+    # On Postgres that's one INSERT ... ON CONFLICT DO UPDATE per batch; anywhere else,
+    # or for rows with a null in their key (nulls never conflict), it's update_or_create.
+    connection = connections[using]
+    key_fields = _unique_fields(model)
+    objects = []
+    created = 0
+    updated = 0
+
+    groups, fallback_rows = _group_upsert_rows(model, rows, connection.vendor)
+    with transaction.atomic(using=using):
+        for group in groups.values():
+            for batch in _chunks(list(group.values()), batch_size):
+                objs, batch_created = _upsert_batch(model, batch, key_fields, connection)
+                objects += objs
+                created += batch_created
+                updated += len(objs) - batch_created
+
+        for data in fallback_rows:
+            obj, was_created = _upsert_one(model, data)
+            objects.append(obj)
+            created += int(was_created)
+            updated += int(not was_created)
+
+    log.debug(("Upserted ", model.__name__, " created: ", created, " updated: ", updated))
+    return UpsertResult(objects, created, updated)
+
+
+def _copy_value(value):
+    # Postgres' COPY text format: tab separated, \N for null, backslash escapes
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, timedelta):
+        return "{s} seconds".format(s=value.total_seconds())
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+class _CopyStream:
+    # File-like wrapper so COPY pulls rows as it needs them instead of us building one
+    # enormous string for a season's worth of play by play.
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = ""
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+    readline = read
+
+
+def copy_insert(model, objs, using="default"):
+    # Inserts unsaved model instances with COPY FROM STDIN. Unlike bulk_create the instances
+    # don't get their pks back, so only use it for rows nothing else needs to point at.
+    connection = connections[using]
+    opts = model._meta
+    qn = connection.ops.quote_name
+    fields = [f for f in opts.concrete_fields if not f.primary_key]
+    now = timezone.now()
+
+    def lines():
+        for obj in objs:
+            # Mirror BaseModel.save for anything that never had create_ts set
+            if getattr(obj, "create_ts", False) is None:
+                obj.create_ts = now
+            values = [f.get_db_prep_save(getattr(obj, f.attname), connection) for f in fields]
+            yield "\t".join(_copy_value(v) for v in values) + "\n"
+
+    sql = "COPY {table} ({columns}) FROM STDIN".format(
+        table=qn(opts.db_table), columns=", ".join(qn(f.column) for f in fields))
+    with connection.cursor() as cursor:
+        # Django's cursor wrapper doesn't expose copy_expert, the psycopg2 cursor does
+        cursor.cursor.copy_expert(sql, _CopyStream(lines()))
+
+
+def bulk_load(model, objs, using="default"):
+    # Fastest available way to insert a pile of new rows: COPY on Postgres, bulk_create
+    # everywhere else (or when BULK_LOAD_WITH_COPY is switched off).
+    if not objs:
+        return
+    for obj in objs:
+        # Box scores and play by play need to know which season's partition they go in
+        if hasattr(obj, "set_partition_key"):
+            obj.set_partition_key()
+    if BULK_LOAD_WITH_COPY and connections[using].vendor == 'postgresql':
+        log.debug(("Copying ", len(objs), " ", model.__name__, " rows"))
+        copy_insert(model, objs, using=using)
+    else:
+        model.objects.using(using).bulk_create(objs)
+
+
+def bulk_load_chunks(model, objs, chunk_size=FRAME_CHUNK_SIZE, using="default"):
+    # bulk_load for instances built lazily (e.g. GameLogHandler.game_logs), a chunk at a
+    # time so only chunk_size of them are ever held at once. Returns how many were loaded.
+    objs = iter(objs)
+    total = 0
+    while True:
+        chunk = list(islice(objs, chunk_size))
+        if not chunk:
+            return total
+        bulk_load(model, chunk, using=using)
+        total += len(chunk)
@@ -0,0 +1,49 @@
+import logging
+from nba_stats.models import UpdateCheckpoint
+log = logging.getLogger('stats')
+
+
+def make_unit_key(*parts):
+    return "|".join(str(p) for p in parts)
+
+
+class CheckpointStore:
+    # Remembers which units of work an update command has finished for a season/season type.
+    # Without resume the slate is wiped and everything runs again; with resume anything
+    # recorded by a previous (presumably failed) run is skipped.
+
+    def __init__(self, command, season, season_type, resume=False):
+        self.command = command
+        self.season = season
+        self.season_type = season_type
+        self.resume = resume
+        checkpoints = UpdateCheckpoint.objects.filter(command=command, season=season,
+                                                      season_type=season_type)
+        if resume:
+            self.completed = set(checkpoints.values_list('unit', flat=True))
+            log.debug(("Resuming ", command, " with ", len(self.completed),
+                       " units of work already done"))
+        else:
+            checkpoints.delete()
+            self.completed = set()
+
+    def is_done(self, *unit):
+        return make_unit_key(*unit) in self.completed
+
+    def mark_done(self, *unit):
+        key = make_unit_key(*unit)
+        if key in self.completed:
+            return
+        # bulk_create bypasses BaseModel.save, which would otherwise mangle season_type
+        # and leave us unable to find the row again.
+        UpdateCheckpoint.objects.bulk_create([UpdateCheckpoint(command=self.command,
+                                                               season=self.season,
+                                                               season_type=self.season_type,
+                                                               unit=key,
+                                                               create_user=self.command)])
+        self.completed.add(key)
+
+    def completed_units(self, prefix):
+        # e.g. completed_units("player") -> the player ids finished so far
+        prefix = make_unit_key(prefix) + "|"
+        return [key[len(prefix):] for key in self.completed if key.startswith(prefix)]
@@ -51,6 +51,15 @@ TEAM_LIST_ENDPOINT = 'commonteamyears'
 TEAM_DETAILS_ENDPOINT = 'teamdetails'
 TEAM_ROSTER_ENDPOINT = 'commonteamroster'
 
+GAME_LOG_ENDPOINT = "leaguegamelog"
+GAME_LOG_PARAMS = {'LeagueID': '00',
+                   'Season': None,
+                   'SeasonType': None,
+                   'PlayerOrTeam': None,
+                   'Counter': 1000,
+                   'Sorter': 'PTS',
+                   'Direction': 'DESC'}
+
 SHOTCHART_ENDPOINT = "shotchartdetail"
 SHOTCHART_PARAMS = {'PlayerID': None,
                     'TeamID': 0,
@@ -188,6 +197,30 @@ PT_MEASURE_TYPES = [SPEED_DISTANCE,
                     PAINT_TOUCH,
                     EFFICIENCY]
 
+# Play by play EVENTMSGTYPEs
+EVENT_FIELD_GOAL_MADE = 1
+EVENT_FIELD_GOAL_MISSED = 2
+EVENT_FREE_THROW = 3
+EVENT_REBOUND = 4
+EVENT_TURNOVER = 5
+EVENT_SUBSTITUTION = 8
+# Events only somebody on the court can be player1/2/3 of, unlike e.g. technical fouls
+ON_COURT_EVENT_TYPES = {EVENT_FIELD_GOAL_MADE, EVENT_FIELD_GOAL_MISSED, EVENT_FREE_THROW,
+                        EVENT_REBOUND, EVENT_TURNOVER}
+# PERSON1TYPE of an event credited to a home/visiting player or team
+HOME_PERSON_TYPES = {2, 4}
+VISITOR_PERSON_TYPES = {3, 5}
+REGULATION_PERIODS = 4
+PERIOD_SECONDS = 12 * 60
+OVERTIME_SECONDS = 5 * 60
+# Games' worth of play by play turned into stints per transaction (see nba_stats.stints)
+STINT_GAME_CHUNK_SIZE = 100
+# How long a season's stints are kept in memory for lineup/on-off queries before being
+# reread (see nba_stats.stint_queries)
+STINT_CACHE_SECONDS = 15 * 60
+# Games' worth of play by play per transaction when backfilling elapsed_seconds and scores
+PBP_BACKFILL_GAME_CHUNK_SIZE = 100
+
 PBP_URL = ("playbyplayv2?EndPeriod=10&EndRange=1000000000&GameID={game_id}&RangeType=2&Season={season}&SeasonType"
            "={season_type}&StartPeriod=1&StartRange=0")
 
@@ -213,6 +246,79 @@ HEADERS = {'user-agent': ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_5) '
                           'Chrome/45.0.2454.101 Safari/537.36'),
            'Referer': "http://stats.nba.com/scores"}
 
+# Connection pooling for the shared fetch client. pool_connections is the number of
+# distinct hosts urllib3 will keep pools for, pool_maxsize is the number of keep-alive
+# connections kept open per host.
+FETCH_POOL_CONNECTIONS = 10
+FETCH_POOL_MAXSIZE = 20
+FETCH_MAX_RETRIES = 2
+# (connect, read) timeouts in seconds. stats.nba.com is notoriously slow to respond.
+FETCH_DEFAULT_TIMEOUT = (5, 30)
+FETCH_HOST_TIMEOUTS = {'stats.nba.com': (5, 60),
+                       'www.basketball-reference.com': (5, 30)}
+FETCH_SESSION_HEADERS = {'Accept-Encoding': "gzip, deflate",
+                         'Connection': "keep-alive"}
+# Max number of requests we'll have in flight at once when fetching concurrently,
+# e.g. every box score for every game on a date.
+FETCH_CONCURRENCY = 8
+
+# Per host token bucket rate limiting for everything that goes through the fetch client.
+# Rates are requests/second: (initial, min, max). The rate creeps up while responses stay
+# fast, and gets cut whenever we get throttled or latency climbs.
+RATE_LIMIT_DEFAULT_RATES = (4.0, 0.25, 20.0)
+RATE_LIMIT_HOST_RATES = {'www.basketball-reference.com': (1.0, 0.1, 2.0)}
+RATE_LIMIT_BURST = 4
+RATE_LIMIT_INCREASE_STEP = 0.25
+RATE_LIMIT_DECREASE_FACTOR = 0.5
+# Back off once the average latency gets this many times worse than the best we've seen
+RATE_LIMIT_LATENCY_FACTOR = 2.5
+RATE_LIMIT_MAX_THROTTLE_RETRIES = 5
+RATE_LIMIT_THROTTLE_CODES = [429, 503]
+# How long to hold off a host that throttled us without saying for how long (Retry-After),
+# doubled for every throttled response in a row
+RATE_LIMIT_THROTTLE_BACKOFF = 2.0
+
+# How many game dates may sit between ingestion stages (fetched but unparsed, parsed but
+# unwritten) in update_leaguewide_stats. Bounds memory no matter how long the date range is.
+INGESTION_QUEUE_SIZE = 2
+
+# Rows per INSERT ... ON CONFLICT statement in nba_stats.bulk.bulk_upsert
+BULK_UPSERT_BATCH_SIZE = 500
+# Load box scores and play by play with COPY FROM STDIN rather than bulk_create on Postgres
+BULK_LOAD_WITH_COPY = True
+
+# Rows pulled off a streamed result set per DataFrame chunk (see nba_stats.frames)
+FRAME_CHUNK_SIZE = 5000
+
+# Games deleted per transaction by game_scrubber.py
+GAME_SCRUB_CHUNK_SIZE = 50
+
+# Player list columns that, if unchanged since the last run, mean update_player_stats doesn't
+# need to refetch a player's summary or transactions (see nba_stats.fingerprints)
+PLAYER_LIST_CHANGE_FIELDS = ["ROSTERSTATUS", "TEAM_ID"]
+
+# On disk cache of stats.nba.com json responses. TTLs are in seconds, keyed on the lowercased
+# endpoint name. None means keep forever, 0 means never cache. Responses for finished seasons
+# and completed games are always kept forever, regardless of what's in here.
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_PATH = "~/.nbapex/response_cache.sqlite3"
+RESPONSE_CACHE_MAX_BYTES = 2 * 1024 ** 3
+RESPONSE_CACHE_DEFAULT_TTL = 6 * 60 * 60
+# A hit only moves an entry's last_access (its place in the LRU order) once it's this stale,
+# so reads don't each turn into a write
+RESPONSE_CACHE_TOUCH_SECONDS = 60 * 60
+RESPONSE_CACHE_TTLS = {'scoreboardv2': 15 * 60,
+                       'commonplayerinfo': 24 * 60 * 60,
+                       'teaminfocommon': 24 * 60 * 60,
+                       'teamyearbyyearstats': 24 * 60 * 60,
+                       'playercareerstats': 24 * 60 * 60,
+                       'nba_player_movement.json': 60 * 60}
+# Endpoints whose responses are fully determined by a GameID
+GAME_ENDPOINTS = ['boxscoresummaryv2', 'boxscoretraditionalv2', 'boxscoreadvancedv2',
+                  'boxscoremiscv2', 'boxscorescoringv2', 'boxscoreusagev2',
+                  'boxscoreplayertrackv2', 'boxscorefourfactorsv2', 'hustlestatsboxscore',
+                  'playbyplayv2']
+
 MONTHS = {'jan': 1,
           'feb': 2,
           'mar': 3,
@@ -332,6 +438,19 @@ PER_100_POSSESSIONS = "Per100Possessions"
 PER_100_PLAYS = "Per100Plays"
 PER_MODES = [TOTALS, PER_GAME, MINUTES_PER, PER_48, PER_40, PER_36, PER_MINUTE,
              PER_POSSESSION, PER_PLAY, PER_100_POSSESSIONS, PER_100_PLAYS]
+# Worked out from the Totals splits (see nba_stats.derived_splits), never fetched
+DERIVED_PER_MODES = [PER_GAME, PER_36, PER_48, PER_MINUTE]
+# Per mode -> (the Totals column it's divided by, and what by that's scaled up to)
+PER_MODE_DIVISORS = {PER_GAME: ("gp", 1),
+                     PER_36: ("min", 36),
+                     PER_48: ("min", 48),
+                     PER_MINUTE: ("min", 1)}
+# Split fields that add up over games, and so change with the per mode. Also applies to the
+# opp_ version of each. Everything else (percentages, ratings, gp, etc.) is the same in
+# every per mode.
+COUNTING_STATS = ["fgm", "fga", "fg3m", "fg3a", "ftm", "fta", "oreb", "dreb", "reb", "ast",
+                  "stl", "blk", "blka", "tov", "pf", "pfd", "pts", "plus_minus",
+                  "pts_off_tov", "pts_second_chance", "pts_2nd_chance", "pts_fb", "pts_paint"]
 
 BASE = "Base"
 ADVANCED = "Advanced"
@@ -384,6 +503,14 @@ REVERSE_MONTH_MAP = {'1': 'October',
                      '8': 'May'}
 GROUP_VALUES.update(REVERSE_MONTH_MAP)
 
+# Traditional (Base) Totals splits for these group sets are rebuilt from our own box scores
+# (see nba_stats.aggregated_splits) rather than fetched. Days Rest isn't one we've ever fetched.
+AGGREGATED_GROUP_SETS = ["Overall", "Location", "Month", "Pre/Post All-Star", "Wins/Losses",
+                         "Days Rest"]
+# Rest days at or above this are lumped together, e.g. "6+ Days Rest"
+MAX_DAYS_REST = 6
+PLAYERS_ON_COURT = 5
+
 ON_OFF_PARAMS = {'TeamID': None,
                  'Season': None,
                  'SeasonType': None,
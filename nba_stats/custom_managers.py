@@ -6,4 +6,35 @@ from nba_stats.utils import determine_season_for_date
 class ActivePlayersManager(models.Manager):
     def get_queryset(self):
         current_season = determine_season_for_date(date.today())
-        return super(ActivePlayersManager, self).get_queryset().filter(to_year=current_season)
\ No newline at end of file
+        return super(ActivePlayersManager, self).get_queryset().filter(to_year=current_season)
+
+def _season_year(season):
+    # A LeagueSeason, or just its year
+    return getattr(season, 'year', season)
+
+
+class SeasonPartitionedQuerySet(models.QuerySet):
+    # For the box score and play by play tables, which are partitioned by season_year on
+    # Postgres (see nba_stats/partitioning.py). Filtering on season_year as well as the game
+    # lets the planner skip every other season's partition.
+
+    def for_season(self, season):
+        return self.filter(season_year=_season_year(season))
+
+    def for_date(self, game_date):
+        return self.filter(season_year=determine_season_for_date(game_date),
+                           game__game_date_est=game_date)
+
+    def for_date_range(self, start_date, end_date):
+        return self.filter(season_year__range=(determine_season_for_date(start_date),
+                                               determine_season_for_date(end_date)),
+                           game__game_date_est__range=(start_date, end_date))
+
+    def for_games(self, games):
+        # games is a list or QuerySet of Games
+        if isinstance(games, models.QuerySet):
+            game_dates = games.values_list('game_date_est', flat=True).distinct()
+        else:
+            game_dates = [game.game_date_est for game in games]
+        season_years = {determine_season_for_date(gdate) for gdate in game_dates}
+        return self.filter(season_year__in=season_years, game__in=games)
@@ -0,0 +1,102 @@
+import logging
+import pandas as pd
+from django.db import models
+from nba_stats.bulk import bulk_upsert
+from nba_stats.frames import map_column, iter_frame_rows
+from nba_stats.model_registry import get_model_registry
+from nba_stats.utils import normalize_season_type
+from nba_stats.constants import (TOTALS, DERIVED_PER_MODES, PER_MODE_DIVISORS, COUNTING_STATS)
+log = logging.getLogger('stats')
+
+# PerGame, Per36, Per48 and PerMinute splits are just the Totals divided through by games or
+# minutes played, so rather than asking stats.nba.com for every one of them we work them out
+# from the Totals rows we already have, a whole column at a time. Counting stats are scaled,
+# everything else (percentages, ratings, gp, w, l) is copied over as is. min becomes minutes
+# per game, which is what the NBA reports it as in every per mode but Totals.
+
+# Fields that are bookkeeping rather than stats, and get filled in fresh
+SKIPPED_FIELDS = {'create_ts', 'create_user', 'mod_ts', 'mod_user', 'per_mode'}
+
+
+def derivable_split_models(entity=None):
+    # Every split model that has gp and min to divide by. Shooting splits don't.
+    # entity is "Player", "Team" or None for both.
+    registry = get_model_registry()
+    registry.build()
+    derivable = []
+    for model in registry.models():
+        name = model.__name__
+        if not name.endswith("Split") or "Shooting" in name:
+            continue
+        if entity is not None and not name.startswith(entity):
+            continue
+        derivable.append(model)
+    return derivable
+
+
+def scaled_fields(model):
+    # field name -> decimal places, for every counting stat on the model
+    scaled = {}
+    for field in model._meta.concrete_fields:
+        stat = field.name[4:] if field.name.startswith("opp_") else field.name
+        if stat in COUNTING_STATS:
+            scaled[field.name] = getattr(field, 'decimal_places', 0)
+    return scaled
+
+
+def derive_frame(totals, per_mode, scaled):
+    # totals has one column per field, one row per Totals split. Returns the same rows
+    # in per_mode.
+    divisor_field, scale = PER_MODE_DIVISORS[per_mode]
+    divisor = totals[divisor_field].astype(float)
+    # Nobody who didn't play gets infinite points per game
+    factor = (scale / divisor).where(divisor > 0, 0)
+    derived = totals.copy()
+    for name, places in scaled.items():
+        derived[name] = (totals[name].astype(float) * factor).round(places)
+    games = totals['gp'].astype(float)
+    derived['min'] = (totals['min'].astype(float) / games).where(games > 0, 0).round(1)
+    derived['per_mode'] = per_mode
+    return derived
+
+
+def _totals_frame(model, filters):
+    fields = [field for field in model._meta.concrete_fields
+              if not field.primary_key and field.name not in SKIPPED_FIELDS]
+    rows = (model.objects.filter(per_mode=TOTALS, **filters)
+            .values_list(*[field.attname for field in fields]))
+    frame = pd.DataFrame.from_records(list(rows), columns=[field.name for field in fields])
+    # Swap foreign key ids for instances, one query per related model
+    for field in fields:
+        if isinstance(field, models.ForeignKey) and not frame.empty:
+            ids = [pk for pk in frame[field.name].unique().tolist() if pd.notnull(pk)]
+            related = field.related_model.objects.in_bulk(ids)
+            frame[field.name] = map_column(frame[field.name], related.get).astype(object)
+    return frame
+
+
+def derive_splits(model, per_modes=DERIVED_PER_MODES, **filters):
+    # filters narrow down the Totals rows derived from, e.g. season=season or player=player
+    if 'season_type' in filters:
+        filters['season_type'] = normalize_season_type(filters['season_type'])
+    totals = _totals_frame(model, filters)
+    if totals.empty:
+        return []
+    scaled = scaled_fields(model)
+    splits = []
+    for per_mode in per_modes:
+        derived = derive_frame(totals, per_mode, scaled)
+        result = bulk_upsert(model, list(iter_frame_rows(derived,
+                                                         {'create_user': "derive_splits"})))
+        log.debug(("Derived ", result.created, " new and ", result.updated, " existing ",
+                   per_mode, " ", model.__name__, "s"))
+        splits += result.objects
+    return splits
+
+
+def derive_all_splits(entity=None, per_modes=DERIVED_PER_MODES, **filters):
+    # Returns {model: number of splits derived}
+    counts = {}
+    for model in derivable_split_models(entity):
+        counts[model] = len(derive_splits(model, per_modes=per_modes, **filters))
+    return counts
@@ -0,0 +1,131 @@
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+from requests import Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from nba_stats.constants import (FETCH_POOL_CONNECTIONS, FETCH_POOL_MAXSIZE, FETCH_MAX_RETRIES,
+                                 FETCH_DEFAULT_TIMEOUT, FETCH_HOST_TIMEOUTS,
+                                 FETCH_SESSION_HEADERS, RATE_LIMIT_MAX_THROTTLE_RETRIES,
+                                 RATE_LIMIT_THROTTLE_CODES)
+from nba_stats.rate_limiter import RateLimiter, parse_retry_after
+log = logging.getLogger('stats')
+
+
+class FetchClient:
+    # Keeps one pooled, keep-alive requests.Session per host so the thousands of calls made
+    # during an update reuse their TCP/TLS connections instead of opening a new one each time.
+
+    def __init__(self, pool_connections=FETCH_POOL_CONNECTIONS, pool_maxsize=FETCH_POOL_MAXSIZE,
+                 max_retries=FETCH_MAX_RETRIES, default_timeout=FETCH_DEFAULT_TIMEOUT,
+                 host_timeouts=None, rate_limiter=None,
+                 max_throttle_retries=RATE_LIMIT_MAX_THROTTLE_RETRIES):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.default_timeout = default_timeout
+        self.host_timeouts = dict(FETCH_HOST_TIMEOUTS)
+        if host_timeouts is not None:
+            self.host_timeouts.update(host_timeouts)
+        # Shared by every thread using this client, so concurrent fetches all draw on the
+        # same per host budget.
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_throttle_retries = max_throttle_retries
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _make_session(self):
+        session = Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              max_retries=self.max_retries)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(FETCH_SESSION_HEADERS)
+        return session
+
+    def session_for(self, url):
+        host = urlsplit(url).netloc.lower()
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    log.debug(("Opening pooled session for ", host))
+                    session = self._make_session()
+                    self._sessions[host] = session
+        return session
+
+    def timeout_for(self, url):
+        host = urlsplit(url).netloc.lower()
+        return self.host_timeouts.get(host, self.default_timeout)
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        kwargs.setdefault('timeout', self.timeout_for(url))
+        session = self.session_for(url)
+        limiter = self.rate_limiter.for_url(url)
+        attempt = 0
+        while True:
+            limiter.acquire()
+            start = time.monotonic()
+            try:
+                response = session.get(url, params=params, headers=headers, **kwargs)
+            except RequestException:
+                limiter.record_failure()
+                raise
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            limiter.record_response(response.status_code, time.monotonic() - start,
+                                    retry_after)
+            if (response.status_code not in RATE_LIMIT_THROTTLE_CODES or
+                    attempt >= self.max_throttle_retries):
+                return response
+            attempt += 1
+            log.debug(("Throttled by ", url, " status ", response.status_code,
+                       " retry after ", retry_after, " attempt ", attempt))
+            # Give the connection back to the pool; with stream=True nothing else will
+            response.close()
+
+    def metrics(self):
+        return self.rate_limiter.metrics()
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_fetch_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = FetchClient()
+    return _client
+
+
+def configure_fetch_client(**kwargs):
+    # Replaces the process wide client, e.g. to bump pool sizes for a concurrent update.
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = FetchClient(**kwargs)
+    return _client
+
+
+def fetch(url, params=None, headers=None, **kwargs):
+    return get_fetch_client().get(url, params=params, headers=headers, **kwargs)
+
+
+def install_nba_py_transport():
+    # nba_py does a bare `requests.get` inside nba_py._get_json, looking `get` up in its
+    # module globals at call time. Pointing that name at the shared client means
+    # PlayerStats, TeamStats, Lineups, GameLog, etc. all reuse our pooled connections.
+    import nba_py
+    nba_py.get = fetch
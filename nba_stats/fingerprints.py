@@ -0,0 +1,54 @@
+import hashlib
+import logging
+import simplejson
+from nba_stats.models import PlayerFingerprint
+from nba_stats.constants import PLAYER_LIST_CHANGE_FIELDS
+log = logging.getLogger('stats')
+
+
+def content_hash(payload):
+    # sha1 of a canonical dump of payload, so equal contents always hash the same no matter
+    # the key order. Anything json can't handle (dates, Decimals, numpy ints) goes in as str.
+    dumped = simplejson.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha1(dumped.encode("utf-8")).hexdigest()
+
+
+def player_list_hash(row):
+    # row is a row of the league wide player list (nba_py's PlayerList().info())
+    return content_hash({field: str(row[field]) for field in PLAYER_LIST_CHANGE_FIELDS})
+
+
+class PlayerFingerprintStore:
+    # What update_player_stats uses to decide what to skip:
+    #   - a player whose roster status and team haven't moved in the player list isn't
+    #     fetched at all
+    #   - a player whose summary or transactions page hashes the same as last time isn't
+    #     written to the db
+    # New hashes are only saved with save(), once a player has been completely updated, so a
+    # failed run never leaves a player marked as up to date when he isn't.
+
+    def __init__(self):
+        self.fingerprints = {fp.player_nba_id: fp for fp in PlayerFingerprint.objects.all()}
+        self.pending = {}
+
+    def _current(self, player_nba_id, kind):
+        fingerprint = self.fingerprints.get(player_nba_id)
+        return getattr(fingerprint, kind + "_hash", "") if fingerprint is not None else ""
+
+    def changed(self, player_nba_id, kind, new_hash):
+        # kind is one of "list", "summary" or "transactions"
+        self.pending.setdefault(player_nba_id, {})[kind + "_hash"] = new_hash
+        return self._current(player_nba_id, kind) != new_hash
+
+    def save(self, player_nba_id, create_user="update_player_stats"):
+        hashes = self.pending.pop(player_nba_id, {})
+        fingerprint = self.fingerprints.get(player_nba_id)
+        if fingerprint is None:
+            fingerprint = PlayerFingerprint(player_nba_id=player_nba_id, create_user=create_user)
+        elif all(getattr(fingerprint, name) == value for name, value in hashes.items()):
+            return fingerprint
+        for name, value in hashes.items():
+            setattr(fingerprint, name, value)
+        fingerprint.save()
+        self.fingerprints[player_nba_id] = fingerprint
+        return fingerprint
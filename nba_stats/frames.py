@@ -0,0 +1,83 @@
+import logging
+from itertools import islice
+import pandas as pd
+from nba_stats.constants import FRAME_CHUNK_SIZE
+from nba_stats.row_mapper import compile_row_mapper
+log = logging.getLogger('stats')
+
+
+# Columnar counterparts to dictify/convert_dict_keys_to_lowercase/auto_strip_and_convert_fields
+# for the big league wide result sets (game logs, shot charts). A result set becomes one
+# DataFrame column per header, conversions and filters are done a column at a time, and the
+# model rows themselves aren't built until something actually iterates over them to save.
+
+
+def result_set_to_frame(result_set, chunk_size=FRAME_CHUNK_SIZE):
+    rows = result_set['rowSet']
+    if isinstance(rows, list):
+        return pd.DataFrame.from_records(rows, columns=result_set['headers'])
+    # A streamed result set (see get_json_response). Only a chunk of rows is ever held as
+    # python lists at once, the rest already live in the frame.
+    chunks = []
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        chunks.append(pd.DataFrame.from_records(chunk, columns=result_set['headers']))
+    if not chunks:
+        return pd.DataFrame(columns=result_set['headers'])
+    return pd.concat(chunks, ignore_index=True)
+
+
+def min_sec_to_float(column):
+    # Vectorized convert_min_sec_to_float: "24:36" -> 24.6, plain numbers pass through,
+    # anything empty is 0
+    text = column.where(column.notnull() & (column != ""), "0").astype(str)
+    parts = text.str.partition(":")
+    minutes = pd.to_numeric(parts[0])
+    seconds = pd.to_numeric(parts[2].where(parts[2] != "", "0"))
+    return minutes + seconds / 60
+
+
+def datetime_string_to_date(column):
+    # Vectorized convert_datetime_string_to_date_instance, '2016-10-25T00:00:00' -> date
+    return pd.to_datetime(column.str[:10], format="%Y-%m-%d").dt.date
+
+
+def map_column(column, lookup):
+    # Resolves every distinct value in the column once (e.g. TEAM_ID -> Team) rather than once
+    # per row. lookup should raise for values it can't resolve, same as an objects.get would.
+    resolved = {value: lookup(value) for value in column.unique().tolist()}
+    return column.map(resolved)
+
+
+def frame_for_model(frame, model, aliases=None, override_list=(), aux_list=(), isgame=False):
+    # Same renames and model field filtering as the row mapper, just applied to whole columns
+    mapper = compile_row_mapper(frame.columns, model, aliases=aliases,
+                                override_list=override_list, aux_list=aux_list, isgame=isgame)
+    selected = frame.iloc[:, [idx for idx, key, converter in mapper.plan]].copy()
+    selected.columns = [key for idx, key, converter in mapper.plan]
+    return selected
+
+
+def _python_values(column):
+    # tolist hands back python ints/floats rather than numpy scalars, which the db adapter
+    # doesn't know what to do with. NaN is how pandas spells a null in a numeric column.
+    if column.hasnans:
+        column = column.astype(object).where(column.notnull(), None)
+    return column.tolist()
+
+
+def iter_frame_rows(frame, constants=None):
+    columns = list(frame.columns)
+    values = [_python_values(frame[col]) for col in columns]
+    for row in zip(*values):
+        data = dict(zip(columns, row))
+        if constants:
+            data.update(constants)
+        yield data
+
+
+def iter_model_instances(frame, model, constants=None):
+    for data in iter_frame_rows(frame, constants):
+        yield model(**data)
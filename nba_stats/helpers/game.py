@@ -1,80 +1,90 @@
 import logging
+from itertools import groupby
+from django.db import connection, transaction
 from nba_stats.models import (PlayerTraditionalBoxScore, PlayerAdvancedBoxScore, PlayerMiscBoxScore,
                               PlayerScoringBoxScore, PlayerUsageBoxScore, PlayerTrackingBoxScore,
                               PlayerFourFactorsBoxScore, PlayerHustleStatsBoxScore,
                               TeamTraditionalBoxScore, TeamAdvancedBoxScore, TeamMiscBoxScore,
                               TeamScoringBoxScore, TeamUsageBoxScore, TeamTrackingBoxScore,
-                              TeamFourFactorsBoxScore, TeamHustleStatsBoxScore, Player, Team,
+                              TeamFourFactorsBoxScore, TeamHustleStatsBoxScore,
                               Game, GameOfficialXref, GameOtherStats, PlayByPlayEvent,
                               LineScore, Official)
-from nba_stats.utils import (get_json_response, convert_min_sec_to_float,
+from nba_stats.identity_map import get_identity_map
+from nba_stats.bulk import bulk_load
+from nba_stats.model_registry import get_model_registry
+from nba_stats.utils import (get_json_response,
                              convert_dict_keys_to_lowercase, make_season_str,
+                             fetch_json_concurrently, dictify,
                              convert_datetime_string_to_date_instance,
-                             convert_colon_tstamp_to_duration)
+                             convert_colon_tstamp_to_duration,
+                             convert_pctimestring_to_elapsed_seconds, parse_play_by_play_score)
 from nba_stats.constants import (NBA_BASE_URL, TRADITIONAL_BOX_URL, ADVANCED_BOX_URL,
                                  MISC_BOX_URL, SCORING_BOX_URL, USAGE_BOX_URL, PLAYER_TRACK_BOX_URL,
-                                 FOUR_FACTORS_BOX_URL, HUSTLE_STATS_BOX_URL, PBP_URL, SUMMARY_URL)
+                                 FOUR_FACTORS_BOX_URL, HUSTLE_STATS_BOX_URL, PBP_URL, SUMMARY_URL,
+                                 FETCH_CONCURRENCY, PBP_BACKFILL_GAME_CHUNK_SIZE)
 log = logging.getLogger('stats')
 
 
 def create_correct_type_of_player_box_score(p_box_data, box_type):
-    if box_type == 'Traditional':
-        return PlayerTraditionalBoxScore(**p_box_data)
-    elif box_type == 'Advanced':
-        return PlayerAdvancedBoxScore(**p_box_data)
-    elif box_type == 'Misc':
-        return PlayerMiscBoxScore(**p_box_data)
-    elif box_type == 'Scoring':
-        return PlayerScoringBoxScore(**p_box_data)
-    elif box_type == 'Usage':
-        return PlayerUsageBoxScore(**p_box_data)
-    elif box_type == 'Tracking':
-        return PlayerTrackingBoxScore(**p_box_data)
-    elif box_type == 'FourFactors':
-        return PlayerFourFactorsBoxScore(**p_box_data)
-    elif box_type == 'Hustle':
-        return PlayerHustleStatsBoxScore(**p_box_data)
+    registry = get_model_registry()
+    model = registry.lookup("Player", box_type, "BoxScore").model
+    return model(**registry.convert(model, p_box_data))
 
 
 def create_correct_type_of_team_box_score(t_box_data, box_type):
-    if box_type == 'Traditional':
-        return TeamTraditionalBoxScore(**t_box_data)
-    elif box_type == 'Advanced':
-        return TeamAdvancedBoxScore(**t_box_data)
-    elif box_type == 'Misc':
-        return TeamMiscBoxScore(**t_box_data)
-    elif box_type == 'Scoring':
-        return TeamScoringBoxScore(**t_box_data)
-    elif box_type == 'Usage':
-        return TeamUsageBoxScore(**t_box_data)
-    elif box_type == 'Tracking':
-        return TeamTrackingBoxScore(**t_box_data)
-    elif box_type == 'FourFactors':
-        return TeamFourFactorsBoxScore(**t_box_data)
-    elif box_type == 'Hustle':
-        return TeamHustleStatsBoxScore(**t_box_data)
+    registry = get_model_registry()
+    model = registry.lookup("Team", box_type, "BoxScore").model
+    return model(**registry.convert(model, t_box_data))
 
 
-def create_box_scores_for_game(game, url_suffix, season_type="Regular+Season",
-                               box_type="Traditional"):
-
-    player_box_scores = []
-    team_box_scores = []
-
+def make_box_score_url(game, url_suffix, season_type="Regular+Season"):
     url = (NBA_BASE_URL + url_suffix).format(game_id=game.game_id,
                                              season=make_season_str(game.season),
                                              season_type=season_type)
-    data = get_json_response(url)
+    return url
+
+
+def get_box_score_player_stats(data, box_type):
+    # Hustle box scores lead with a result set saying whether there are any stats at all
     if box_type == "Hustle":
         hustle_status = data['resultSets'][0]['rowSet'][0][1]
         if not hustle_status:
-            player_stats = None
-        else:
-            player_stats = data['resultSets'][1]
-    else:
-        player_stats = data['resultSets'][0]
+            return None
+        return data['resultSets'][1]
+    return data['resultSets'][0]
+
+
+def players_in_box_score(player_stats):
+    # (player_id, name, team) for everyone in a box score's player result set
+    identity_map = get_identity_map()
+    for row in dictify(player_stats):
+        yield row['PLAYER_ID'], row['PLAYER_NAME'], identity_map.find_team(row['TEAM_ID'])
+
+
+def players_in_play_by_play(pbp_data):
+    # (player_id, name, team) for everyone involved in any event of a play by play result set
+    for row in dictify(pbp_data):
+        for num in ["1", "2", "3"]:
+            if row['PLAYER' + num + '_NAME']:
+                yield row['PLAYER' + num + '_ID'], row['PLAYER' + num + '_NAME'], None
+
+
+def create_box_scores_for_game(game, url_suffix, season_type="Regular+Season",
+                               box_type="Traditional", data=None):
+
+    player_box_scores = []
+    team_box_scores = []
+
+    # data can be handed in if it was already fetched, e.g. by fetch_box_score_data
+    if data is None:
+        data = get_json_response(make_box_score_url(game, url_suffix, season_type))
+    player_stats = get_box_score_player_stats(data, box_type)
 
     if player_stats:
+        identity_map = get_identity_map()
+        # Anyone we've never heard of gets a placeholder up front, all in one insert.
+        # backfill_placeholder_players fills in the rest of their bio later on.
+        identity_map.ensure_players(players_in_box_score(player_stats))
         player_headers = player_stats['headers']
 
         if box_type == "Hustle":
@@ -88,22 +98,9 @@ def create_box_scores_for_game(game, url_suffix, season_type="Regular+Season",
             temp_dict = dict(zip(player_headers, p))
 
             temp_dict['GAME'] = game
-            temp_dict['TEAM'] = Team.objects.filter(team_id=temp_dict['TEAM_ID']).first()
-
-            player = Player.objects.filter(player_id=temp_dict['PLAYER_ID']).first()
-            if not player:
-                # TODO: Properly handle the situation where the given player doesn't exist yet
-                log.debug("Player id and name about to look up: %s %s" % (temp_dict['PLAYER_ID'],
-                                                                          temp_dict['PLAYER_NAME']))
-                # Laziest possible player creation...
-                # should probably write a script that goes through the db and
-                # attempts to fill in missing player data
-
-                player = Player(display_first_last=temp_dict['PLAYER_NAME'],
-                                player_id=temp_dict['PLAYER_ID'],
-                                team=temp_dict['TEAM'])
-                player.save()
-            temp_dict['PLAYER'] = player
+            temp_dict['TEAM'] = get_identity_map().find_team(temp_dict['TEAM_ID'])
+
+            temp_dict['PLAYER'] = identity_map.player(temp_dict['PLAYER_ID'])
 
             if box_type == "Tracking":
                 converted_dict = convert_tracking_dict_to_nbapex_fields(temp_dict,
@@ -112,18 +109,13 @@ def create_box_scores_for_game(game, url_suffix, season_type="Regular+Season",
                 converted_dict = temp_dict
             p_box_data = convert_dict_keys_to_lowercase(converted_dict)
 
-            if box_type == 'Hustle':
-                p_box_data['minutes'] = convert_min_sec_to_float(p_box_data['minutes'])
-            else:
-                p_box_data['min'] = convert_min_sec_to_float(p_box_data['min'])
-
             pbox = create_correct_type_of_player_box_score(p_box_data, box_type)
             player_box_scores.append(pbox)
 
         for t in team_stats['rowSet']:
             temp_dict = dict(zip(team_headers, t))
             temp_dict['GAME'] = game
-            temp_dict['TEAM'] = Team.objects.filter(team_id=temp_dict['TEAM_ID']).first()
+            temp_dict['TEAM'] = get_identity_map().find_team(temp_dict['TEAM_ID'])
 
             if box_type == 'Tracking':
                 converted_dict = convert_tracking_dict_to_nbapex_fields(temp_dict,
@@ -132,11 +124,6 @@ def create_box_scores_for_game(game, url_suffix, season_type="Regular+Season",
                 converted_dict = temp_dict
             t_box_data = convert_dict_keys_to_lowercase(converted_dict)
 
-            if box_type == "Hustle":
-                t_box_data['minutes'] = convert_min_sec_to_float(t_box_data['minutes'])
-            else:
-                t_box_data['min'] = convert_min_sec_to_float(t_box_data['min'])
-
             tbox = create_correct_type_of_team_box_score(t_box_data, box_type)
             team_box_scores.append(tbox)
     else:
@@ -188,29 +175,29 @@ def handle_bulk_create_box_scores(games):
         team_hustle += box_scores_dict['hustle']['teams']
 
     log.debug("Creating Traditional Box Scores")
-    PlayerTraditionalBoxScore.objects.bulk_create(plr_trad)
-    TeamTraditionalBoxScore.objects.bulk_create(team_trad)
+    bulk_load(PlayerTraditionalBoxScore, plr_trad)
+    bulk_load(TeamTraditionalBoxScore, team_trad)
     log.debug("Creating Advanced Box Scores")
-    PlayerAdvancedBoxScore.objects.bulk_create(plr_adv)
-    TeamAdvancedBoxScore.objects.bulk_create(team_adv)
+    bulk_load(PlayerAdvancedBoxScore, plr_adv)
+    bulk_load(TeamAdvancedBoxScore, team_adv)
     log.debug("Creating Misc Box Scores")
-    PlayerMiscBoxScore.objects.bulk_create(plr_misc)
-    TeamMiscBoxScore.objects.bulk_create(team_misc)
+    bulk_load(PlayerMiscBoxScore, plr_misc)
+    bulk_load(TeamMiscBoxScore, team_misc)
     log.debug("Creating Scoring Box Scores")
-    PlayerScoringBoxScore.objects.bulk_create(plr_scoring)
-    TeamScoringBoxScore.objects.bulk_create(team_scoring)
+    bulk_load(PlayerScoringBoxScore, plr_scoring)
+    bulk_load(TeamScoringBoxScore, team_scoring)
     log.debug("Creating Usage Box Scores")
-    PlayerUsageBoxScore.objects.bulk_create(plr_usg)
-    TeamUsageBoxScore.objects.bulk_create(team_usg)
+    bulk_load(PlayerUsageBoxScore, plr_usg)
+    bulk_load(TeamUsageBoxScore, team_usg)
     log.debug("Creating Tracking Box Scores")
-    PlayerTrackingBoxScore.objects.bulk_create(plr_tracking)
-    TeamTrackingBoxScore.objects.bulk_create(team_tracking)
+    bulk_load(PlayerTrackingBoxScore, plr_tracking)
+    bulk_load(TeamTrackingBoxScore, team_tracking)
     log.debug("Creating Four Factors Box Scores")
-    PlayerFourFactorsBoxScore.objects.bulk_create(plr_four_factors)
-    TeamFourFactorsBoxScore.objects.bulk_create(team_four_factors)
+    bulk_load(PlayerFourFactorsBoxScore, plr_four_factors)
+    bulk_load(TeamFourFactorsBoxScore, team_four_factors)
     log.debug("Creating Hustle Box Scores")
-    PlayerHustleStatsBoxScore.objects.bulk_create(plr_hustle)
-    TeamHustleStatsBoxScore.objects.bulk_create(team_hustle)
+    bulk_load(PlayerHustleStatsBoxScore, plr_hustle)
+    bulk_load(TeamHustleStatsBoxScore, team_hustle)
 
 
 def convert_tracking_dict_to_nbapex_fields(data_dict, player_flg=True):
@@ -243,33 +230,58 @@ def convert_tracking_dict_to_nbapex_fields(data_dict, player_flg=True):
     return converted_dict
 
 
-def create_all_box_scores_for_game(game):
+# (key in the returned dict, url, box_type) for each of the box scores we pull for a game
+BOX_SCORE_TYPES = [('traditional', TRADITIONAL_BOX_URL, "Traditional"),
+                   ('advanced', ADVANCED_BOX_URL, "Advanced"),
+                   ('misc', MISC_BOX_URL, "Misc"),
+                   ('scoring', SCORING_BOX_URL, "Scoring"),
+                   ('usage', USAGE_BOX_URL, "Usage"),
+                   ('tracking', PLAYER_TRACK_BOX_URL, "Tracking"),
+                   ('four', FOUR_FACTORS_BOX_URL, "FourFactors"),
+                   ('hustle', HUSTLE_STATS_BOX_URL, "Hustle")]
+
+
+def fetch_box_score_data(games, season_type="Regular+Season", max_workers=FETCH_CONCURRENCY):
+    # Fires off every box score request for every game at once (capped at max_workers)
+    # Returns {game_id: {key: json}}
+    requests_dict = {}
+    for game in games:
+        for key, url_suffix, box_type in BOX_SCORE_TYPES:
+            url = make_box_score_url(game, url_suffix, season_type)
+            requests_dict[(game.game_id, key)] = (url, {})
+    responses = fetch_json_concurrently(requests_dict, max_workers=max_workers)
+
+    box_score_data = {game.game_id: {} for game in games}
+    for (game_id, key), data in responses.items():
+        box_score_data[game_id][key] = data
+    return box_score_data
+
+
+def create_all_box_scores_for_game(game, raw_data=None):
     log.debug("Begin creating box scores for game " + str(game.game_id))
     # for season_type in ['PreSeason', 'Regular+Season', 'Playoffs']:
     # It seems that it doesn't matter what season_type gets passed,
     # it will pick up the data regardless
 
     season_type = "Regular+Season"
-    trad_box_scores = create_box_scores_for_game(game, TRADITIONAL_BOX_URL,
-                                                 season_type, "Traditional")
-    adv_box_scores = create_box_scores_for_game(game, ADVANCED_BOX_URL, season_type, "Advanced")
-    misc_box_scores = create_box_scores_for_game(game, MISC_BOX_URL, season_type, "Misc")
-    scoring_box_scores = create_box_scores_for_game(game, SCORING_BOX_URL, season_type, "Scoring")
-    usg_box_scores = create_box_scores_for_game(game, USAGE_BOX_URL, season_type, "Usage")
-    tracking_box_scores = create_box_scores_for_game(game, PLAYER_TRACK_BOX_URL,
-                                                     season_type, "Tracking")
-    four_factors_box_scores = create_box_scores_for_game(game, FOUR_FACTORS_BOX_URL,
-                                                         season_type, "FourFactors")
-    hustle_box_scores = create_box_scores_for_game(game, HUSTLE_STATS_BOX_URL,
-                                                   season_type, "Hustle")
-
-    ret_dict = {'traditional': trad_box_scores, 'advanced': adv_box_scores,
-                'misc': misc_box_scores, 'scoring': scoring_box_scores,
-                'usage': usg_box_scores, 'tracking': tracking_box_scores,
-                'four': four_factors_box_scores, 'hustle': hustle_box_scores}
+    if raw_data is None:
+        raw_data = fetch_box_score_data([game], season_type)[game.game_id]
+
+    ret_dict = {}
+    for key, url_suffix, box_type in BOX_SCORE_TYPES:
+        ret_dict[key] = create_box_scores_for_game(game, url_suffix, season_type, box_type,
+                                                   data=raw_data[key])
     return ret_dict
 
 
+def create_all_box_scores_for_games(games, max_workers=FETCH_CONCURRENCY):
+    # Same as create_all_box_scores_for_game, but all of the network calls for all of the
+    # games are made concurrently up front. Model construction still happens serially.
+    box_score_data = fetch_box_score_data(games, max_workers=max_workers)
+    return [create_all_box_scores_for_game(game, raw_data=box_score_data[game.game_id])
+            for game in games]
+
+
 def create_play_by_play_for_game(game):
     log.debug("Creating Play By Play Events for Game " + str(game.game_id))
     pbp_events = []
@@ -278,38 +290,25 @@ def create_play_by_play_for_game(game):
     json_data = get_json_response(url)
     pbp_data = json_data['resultSets'][0]
     headers = pbp_data['headers']
+    identity_map = get_identity_map()
+    identity_map.ensure_players(players_in_play_by_play(pbp_data))
     for pbp_event in pbp_data['rowSet']:
         temp_dict = dict(zip(headers, pbp_event))
         temp_dict['GAME'] = game
-        # TODO: Write a method that will look for a player and if it doesn't find, creates it.
-        # TODO: The method should then return the player object
-
         if temp_dict['PLAYER1_NAME']:
-            player1 = Player.objects.filter(player_id=temp_dict['PLAYER1_ID']).first()
-            if not player1:
-                player1 = Player(player_id=temp_dict['PLAYER1_ID'], display_first_last=temp_dict['PLAYER1_NAME'])
-                player1.save()
-            temp_dict['PLAYER1'] = player1
+            temp_dict['PLAYER1'] = identity_map.player(temp_dict['PLAYER1_ID'])
         if temp_dict['PLAYER1_TEAM_ID']:
-            temp_dict['PLAYER1_TEAM'] = Team.objects.filter(team_id=temp_dict['PLAYER1_TEAM_ID']).first()
+            temp_dict['PLAYER1_TEAM'] = identity_map.find_team(temp_dict['PLAYER1_TEAM_ID'])
 
         if temp_dict['PLAYER2_NAME']:
-            player2 = Player.objects.filter(player_id=temp_dict['PLAYER2_ID']).first()
-            if not player2:
-                player2 = Player(player_id=temp_dict['PLAYER2_ID'], display_first_last=temp_dict['PLAYER2_NAME'])
-                player2.save()
-            temp_dict['PLAYER2'] = player2
+            temp_dict['PLAYER2'] = identity_map.player(temp_dict['PLAYER2_ID'])
         if temp_dict['PLAYER2_TEAM_ID']:
-            temp_dict['PLAYER2_TEAM'] = Team.objects.filter(team_id=temp_dict['PLAYER2_TEAM_ID']).first()
+            temp_dict['PLAYER2_TEAM'] = identity_map.find_team(temp_dict['PLAYER2_TEAM_ID'])
 
         if temp_dict['PLAYER3_NAME']:
-            player3 = Player.objects.filter(player_id=temp_dict['PLAYER3_ID']).first()
-            if not player3:
-                player3 = Player(player_id=temp_dict['PLAYER3_ID'], display_first_last=temp_dict['PLAYER1_NAME'])
-                player3.save()
-            temp_dict['PLAYER3'] = player3
+            temp_dict['PLAYER3'] = identity_map.player(temp_dict['PLAYER3_ID'])
         if temp_dict['PLAYER3_TEAM_ID']:
-            temp_dict['PLAYER3_TEAM'] = Team.objects.filter(team_id=temp_dict['PLAYER3_TEAM_ID']).first()
+            temp_dict['PLAYER3_TEAM'] = identity_map.find_team(temp_dict['PLAYER3_TEAM_ID'])
 
         if temp_dict['SCOREMARGIN'] == 'TIE':
             temp_dict['SCOREMARGIN'] = 0
@@ -317,9 +316,78 @@ def create_play_by_play_for_game(game):
         pbp_create_data = convert_dict_keys_to_lowercase(temp_dict)
         pbp_obj = PlayByPlayEvent(**pbp_create_data)
         pbp_events.append(pbp_obj)
+    set_play_by_play_numbers(pbp_events)
     return pbp_events
 
 
+def play_by_play_numbers(rows):
+    # rows are one game's (period, pctimestring, score, scoremargin) in order. Yields
+    # (elapsed_seconds, home_score, away_score) for each; the NBA only fills in score on
+    # scoring plays, so everything else gets the last score (0 - 0 before the first basket).
+    home_score, away_score = 0, 0
+    for period, pctimestring, score, scoremargin in rows:
+        elapsed_seconds = None
+        if period is not None:
+            elapsed_seconds = convert_pctimestring_to_elapsed_seconds(period, pctimestring)
+        home, away = parse_play_by_play_score(score, scoremargin)
+        if home is not None:
+            home_score, away_score = home, away
+        yield elapsed_seconds, home_score, away_score
+
+
+def set_play_by_play_numbers(pbp_events):
+    # Fills in elapsed_seconds, home_score and away_score on one game's PlayByPlayEvents
+    rows = [(event.period, event.pctimestring, event.score, event.scoremargin)
+            for event in pbp_events]
+    for event, numbers in zip(pbp_events, play_by_play_numbers(rows)):
+        event.elapsed_seconds, event.home_score, event.away_score = numbers
+
+
+def _backfill_play_by_play_chunk(games):
+    rows = (PlayByPlayEvent.objects.for_games(games).filter(elapsed_seconds=None)
+            .order_by('game_id', 'period', 'eventnum')
+            .values_list('game_id', 'id', 'season_year', 'period', 'pctimestring', 'score',
+                         'scoremargin'))
+    updates = []
+    for game_id, game_rows in groupby(rows.iterator(), key=lambda row: row[0]):
+        game_rows = list(game_rows)
+        numbers = play_by_play_numbers(row[3:] for row in game_rows)
+        for row, (elapsed_seconds, home_score, away_score) in zip(game_rows, numbers):
+            updates.append((elapsed_seconds, home_score, away_score, row[1], row[2]))
+    if not updates:
+        return 0
+
+    qn = connection.ops.quote_name
+    table = qn(PlayByPlayEvent._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # One statement per chunk; season_year lets Postgres go straight to the partition
+            values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(updates))
+            cursor.execute(
+                "UPDATE {t} SET elapsed_seconds = v.elapsed_seconds, home_score = v.home_score, "
+                "away_score = v.away_score FROM (VALUES {values}) AS v(elapsed_seconds, "
+                "home_score, away_score, id, season_year) WHERE {t}.id = v.id "
+                "AND {t}.season_year = v.season_year".format(t=table, values=values),
+                [value for update in updates for value in update])
+        else:
+            cursor.executemany(
+                "UPDATE {t} SET elapsed_seconds = %s, home_score = %s, away_score = %s "
+                "WHERE id = %s AND season_year = %s".format(t=table), updates)
+    return len(updates)
+
+
+def backfill_play_by_play_numbers(games, chunk_size=PBP_BACKFILL_GAME_CHUNK_SIZE):
+    # Parses elapsed_seconds, home_score and away_score for play by play stored before they
+    # were filled in at ingestion. games is a list or QuerySet of Games. Returns rows updated.
+    games = list(games)
+    total = 0
+    for idx in range(0, len(games), chunk_size):
+        total += _backfill_play_by_play_chunk(games[idx:idx + chunk_size])
+        log.debug(("Backfilled play by play for ", min(idx + chunk_size, len(games)), " of ",
+                   len(games), " games"))
+    return total
+
+
 def create_line_scores_for_game(game, line_score_data):
     line_scores = []
     headers = line_score_data['headers']
@@ -328,7 +396,7 @@ def create_line_scores_for_game(game, line_score_data):
     for line_score in details:
         line_score[0] = convert_datetime_string_to_date_instance(line_score[0])
         temp_dict = dict(zip(headers, line_score))
-        temp_dict['TEAM'] = Team.objects.get(team_id=temp_dict['TEAM_ID'])
+        temp_dict['TEAM'] = get_identity_map().team(temp_dict['TEAM_ID'])
         temp_dict['GAME'] = game
         ls_data = convert_dict_keys_to_lowercase(temp_dict)
         ls = LineScore(**ls_data)
@@ -381,7 +449,6 @@ def create_games(game_info):
     list_game_info = game_info['resultSets'][0]['rowSet']
     games = []
     line_scores = []
-    all_box_scores = []
     pbp_events = []
     other_stats = []
     official_xrefs = []
@@ -395,8 +462,8 @@ def create_games(game_info):
             log.debug("Avoided creating a new one. Moving on...")
 
         else:
-            temp_dict['HOME_TEAM'] = Team.objects.get(team_id=temp_dict['HOME_TEAM_ID'])
-            temp_dict['VISITOR_TEAM'] = Team.objects.get(team_id=temp_dict['VISITOR_TEAM_ID'])
+            temp_dict['HOME_TEAM'] = get_identity_map().team(temp_dict['HOME_TEAM_ID'])
+            temp_dict['VISITOR_TEAM'] = get_identity_map().team(temp_dict['VISITOR_TEAM_ID'])
 
             url = (NBA_BASE_URL + SUMMARY_URL).format(game_id=temp_dict['GAME_ID'])
             ancillary_game_data = get_json_response(url)
@@ -418,14 +485,14 @@ def create_games(game_info):
             game.save()
             games.append(game)
             line_scores += create_line_scores_for_game(game, line_score_data)
-            # This is a dict of dicts containing a dictionary for each type of box score.
-            # Each of those 5 dicts contains team and player box scores.
-            all_box_scores_dict = create_all_box_scores_for_game(game)
-            all_box_scores.append(all_box_scores_dict)
             pbp_events += create_play_by_play_for_game(game)
             other_stats += create_other_stats_for_game(game, other_stats_data)
             official_xrefs += create_game_official_xrefs(game, officials_data)
 
+    # This is a list of dicts containing a dictionary for each type of box score.
+    # Each of those 8 dicts contains team and player box scores.
+    all_box_scores = create_all_box_scores_for_games(games)
+
     ret_dict = {'games': games, 'line_scores': line_scores,
                 'box_scores': all_box_scores, 'pbp_events': pbp_events,
                 'other_stats': other_stats, 'official_xrefs': official_xrefs}
@@ -433,19 +500,14 @@ def create_games(game_info):
 
 
 def instantiate_correct_boxscore_type(data, btype):
-    from nba_stats import models as nba_stats_models
     if "player" in data:
         entity = "Player"
     else:
         entity = "Team"
 
-    if btype == "Hustle":
-        btype += "Stats"
-    class_name = entity + btype + "BoxScore"
-    class_name = class_name.replace(" ", "")
-    model = getattr(nba_stats_models, class_name)
-    final_data = {field.name: data[field.name] for field in
-                  model._meta.get_fields() if (field.name != 'id' and field.name in data)}
+    registry = get_model_registry()
+    model = registry.lookup(entity, btype, "BoxScore").model
+    final_data = registry.convert(model, registry.strip(model, data))
     bscore = model(**final_data)
     return bscore
 
@@ -1,5 +1,6 @@
 import logging
 from nba_stats.models import (Team, Player, Game, PlayerShotChartDetail, PlayerSeason)
+from nba_stats.identity_map import get_identity_map
 from nba_stats.utils import (convert_datetime_string_to_date_instance,
                              convert_height_to_int, convert_dict_keys_to_lowercase,
                              make_season_int, get_json_response, make_season_str,
@@ -72,7 +73,7 @@ def standardize_player_data(data, player=None, adv_flag=False, season_type='regu
             team_id = d.get('Team_ID', None)
             if team_id is None:
                 team_id = d.get("TEAM_ID", None)
-            team = Team.objects.get(team_id=team_id)
+            team = get_identity_map().team(team_id)
             if "Career" in data['name']:
                 d['SEASON_ID'] = 0
                 d['TEAM_ABBREVIATION'] = team.team_abbreviation
@@ -91,7 +92,7 @@ def standardize_player_data(data, player=None, adv_flag=False, season_type='regu
                 d['SEASON_TYPE'] = "post"
             elif "AllStar" in data['name']:
                 d['SEASON_TYPE'] = "all_star"
-            d['PLAYER'] = Player.objects.get(player_id=d['PLAYER_ID'])
+            d['PLAYER'] = get_identity_map().player(d['PLAYER_ID'])
             if team:
                 d['TEAM'] = team
             # Another temporary hack <--- Wtf was I doing here?
@@ -143,7 +144,7 @@ def create_player_shotchart_details_from_json(player, raw_json):
         data_dict = dict(zip(headers, row))
         data_dict['PLAYER'] = player
         if team is None or data_dict['TEAM_ID'] != team.team_id:
-            team = Team.objects.get(team_id=data_dict['TEAM_ID'])
+            team = get_identity_map().team(data_dict['TEAM_ID'])
             data_dict['TEAM'] = team
         if game is None or data_dict['GAME_ID'] != game.game_id:
             game = Game.objects.get(game_id=data_dict['GAME_ID'])
@@ -194,7 +195,7 @@ def create_update_all_seasons_for_player(player, year=None):
                 dteam_key = "TEAM_ID" if "TEAM_ID" in data else "Team_ID"
                 if team is None or data[dteam_key] != team.team_id:
                     try:
-                        team = Team.objects.get(team_id=data[dteam_key])
+                        team = get_identity_map().team(data[dteam_key])
                     except Exception as e:
                         log.debug(("ELEPHANT", data))
                         raise e
@@ -5,6 +5,9 @@ from nba_stats.models import (Player, Team, TraditionalSplit, AdvancedSplit, Mis
                               FourFactorsBoxScore, HustleStatsBoxScore)
 from nba_stats.utils import (dictify, convert_dict_keys_to_lowercase, make_season_int,
                              get_json_response, make_season_str, make_unique_filter_dict)
+from nba_stats.bulk import bulk_upsert
+from nba_stats.derived_splits import derive_all_splits
+from nba_stats.model_registry import get_model_registry
 from nba_stats.constants import (NBA_BASE_URL, GENERAL_SPLITS_PARMS, PLAYER_GENERAL_SPLITS_ENDPOINT,
                                  PLAYER_SHOOTING_SPLITS_ENDPOINT, TEAM_GEN_SPLITS_ENDPOINT,
                                  TEAM_SHOOTING_SPLITS_ENDPOINT)
@@ -12,8 +15,7 @@ log = logging.getLogger('stats')
 
 
 # This is a beaut, if I do say so myself
-def instantiate_correct_split_type(data):
-    from nba_stats import models as nba_stats_models
+def get_split_model_and_data(data):
     if "player" in data:
         entity_type = "Player"
     elif "team" in data:
@@ -21,32 +23,32 @@ def instantiate_correct_split_type(data):
     else:
         raise Exception("Neither team nor player found in data")
 
-    split_type = "Traditional" if data['measure_type'] == "Base" else data['measure_type']
-
-    class_name = entity_type + split_type + "Split"
-    model = getattr(nba_stats_models, class_name)
+    registry = get_model_registry()
+    model = registry.lookup(entity_type, data['measure_type'], "Split").model
     # This removes all fields in the data dict that aren't actually in the model.
     # This is to account for differences in naming, cruft, etc. This may unintentionally cover up
     # Some mistakes.
-    final_data = {field.name: data[field.name] for field in
-                  model._meta.get_fields() if (field.name != 'id' and field.name in data)}
+    final_data = registry.strip(model, data)
 
     try:
-        find_args = make_unique_filter_dict(model, final_data)
+        # Blows up now, with the data logged, rather than somewhere inside the upsert
+        make_unique_filter_dict(model, final_data)
     except Exception as e:
         log.debug(("INITIAL DATA", data))
         log.debug(("FINAL DATA ", final_data))
-        log.debug(("CLASS NAME", class_name, "MODEL", model))
+        log.debug(("MODEL", model))
         log.exception(e)
         raise e
+
+    return model, final_data
+
+
+def instantiate_correct_split_type(data):
+    model, final_data = get_split_model_and_data(data)
     try:
-        split, created = model.objects.update_or_create(**find_args, defaults=final_data)
-        if created:
-            log.debug("Created a nwew split with the following params:")
-            log.debug(find_args)
+        split = bulk_upsert(model, [final_data]).objects[0]
     except Exception as e:
         log.debug(("INITIAL DATA", data))
-        log.debug(("FIND ARGS", find_args))
         log.debug(("MODEL", model))
         log.debug(("FINAL DATA", final_data))
         log.exception(e)
@@ -56,7 +58,8 @@ def instantiate_correct_split_type(data):
 
 
 def create_update_split_from_raw_json(entity, raw_json):
-    splits = []
+    # model -> list of data dicts, upserted in bulk once every result set has been processed
+    split_rows = {}
     if "Message" in raw_json.keys():
         # For whatever reason, certain combinations of measure/permode/year aren't available
         return []
@@ -96,7 +99,7 @@ def create_update_split_from_raw_json(entity, raw_json):
             if conv_data['group_value'] is None:
                 continue
             try:
-                split = instantiate_correct_split_type(conv_data)
+                model, final_data = get_split_model_and_data(conv_data)
             except Exception as e:
                 log.debug(("RAW PARMS", raw_json['parameters']))
                 log.debug(("RAW RESOURCE ", raw_json['resource']))
@@ -104,7 +107,21 @@ def create_update_split_from_raw_json(entity, raw_json):
                 log.debug(("CONV DATA", conv_data))
                 log.exception(e)
                 raise e
-            splits.append(split)
+            split_rows.setdefault(model, []).append(final_data)
+
+    splits = []
+    for model, rows in split_rows.items():
+        try:
+            result = bulk_upsert(model, rows)
+        except Exception as e:
+            log.debug(("RAW PARMS", raw_json['parameters']))
+            log.debug(("RAW RESOURCE ", raw_json['resource']))
+            log.debug(("MODEL", model))
+            log.exception(e)
+            raise e
+        log.debug(("Created ", result.created, " and updated ", result.updated, " ",
+                   model.__name__, "s"))
+        splits += result.objects
 
     return splits
 
@@ -141,8 +158,8 @@ def create_update_all_splits_for_entity(entity, year=None, season_type="Regular
             final_year = year + 1
 
     # Need to loop over every measure_type, per_mode, season, season_type
-    # Could cut this down to Totals & Per100, then calculate everything else.
-    # That cuts the requests in half. Could also jut get box scores, but I think that would
+    # Only Totals & Per100 are fetched, PerGame, Per36 etc. are derived from the Totals below.
+    # Could also jut get box scores, but I think that would
     # Make it tough (impossible) to get/do per possession data.
     for per_mode in ['Totals', 'Per100Possessions']:
         parms['PerMode'] = per_mode
@@ -172,6 +189,9 @@ def create_update_all_splits_for_entity(entity, year=None, season_type="Regular
             shooting_splits = create_update_split_from_raw_json(entity, data)
             splits['Shooting'] += shooting_splits
 
+    entity_type = "Player" if isinstance(entity, Player) else "Team"
+    derive_all_splits(entity_type, season_id__gte=first_year, season_id__lt=final_year,
+                      season_type=season_type, **{entity_type.lower(): entity})
     return splits
 
 # Normally I'd like this to be in utils, but it creates a circular import
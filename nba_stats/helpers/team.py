@@ -1,10 +1,12 @@
 import logging
 from datetime import date
-from nba_stats.models import (Team, TeamSeason, Player, TeamHof,
+from nba_stats.models import (Team, TeamSeason, TeamHof,
                               TeamHistory, TeamRetired, PlayerTeamRosterXref,
                               TeamAward, Coach)
+from nba_stats.identity_map import get_identity_map
 from nba_stats.utils import (convert_dict_keys_to_lowercase, get_json_response,
-                             dictify, make_season_int, make_unique_filter_dict)
+                             dictify, make_season_int)
+from nba_stats.bulk import bulk_upsert
 from nba_stats.constants import (NBA_BASE_URL, TEAM_INFO_BASE_URL,
                                  TEAM_SEASONS_ENDPOINT, TEAM_SEASONS_PARMS, PER_MODES)
 log = logging.getLogger('stats')
@@ -26,7 +28,7 @@ def standardize_team_data(data, season_type, year):
                 d = dict(zip(hdrs, s))
                 d['SEASON_TYPE'] = season_type
                 d['SEASON_ID'] = year
-                d['TEAM'] = Team.objects.get(team_id=d['TEAM_ID'])
+                d['TEAM'] = get_identity_map().team(d['TEAM_ID'])
                 seasons_list.append(convert_dict_keys_to_lowercase(d))
     except Exception as e:
         log.debug("Exception: " + str(e))
@@ -58,6 +60,7 @@ def create_team_from_web(team_id):
 
 def process_team_season_json(team, jdata, season):
     season_dicts = dictify(jdata['resultSets'][0])
+    rows = []
     for sdict in season_dicts:
         sdict['SEASON_ID'] = make_season_int(sdict['YEAR'])
         if sdict['SEASON_ID'] == season.year:
@@ -77,10 +80,11 @@ def process_team_season_json(team, jdata, season):
                                                    aux_list=["YEAR", "WINS", "LOSSES", "WIN_PCT",
                                                              "PO_WINS", "PO_LOSSES"])
 
-            filter_dict = make_unique_filter_dict(TeamSeason, sdict)
-            season, created = TeamSeason.objects.update_or_create(**filter_dict, defaults=sdict)
-            if created:
-                log.debug(("Created team season ", filter_dict))
+            rows.append(sdict)
+
+    result = bulk_upsert(TeamSeason, rows)
+    log.debug(("Created ", result.created, " and updated ", result.updated, " team seasons"))
+    return result.objects
 
 
 def create_update_team_seasons(team, season):
@@ -149,7 +153,7 @@ def create_misc_team_history_info(team, result_sets):
     log.debug("Creating TeamHofs")
     for hof in team_hofs:
         # I am positive this will blow up at some point
-        player = Player.objects.get(player_id=hof['PLAYERID'])
+        player = get_identity_map().player(hof['PLAYERID'])
         tm_hof = TeamHof(team=team, position=hof['POSITION'], player=player,
                          seasons_with_team=hof['SEASONSWITHTEAM'], year_elected=hof['YEAR'])
         obj_dict['hofs'].append(tm_hof)
@@ -159,7 +163,7 @@ def create_misc_team_history_info(team, result_sets):
         if ret['PLAYERID'] is None:
             player = None
         else:
-            player = Player.objects.get(player_id=ret['PLAYERID'])
+            player = get_identity_map().player(ret['PLAYERID'])
 
         tm_ret = TeamRetired(player=player, player_name=ret['PLAYER'], position=ret['POSITION'],
                              seasons_with_team=ret['SEASONSWITHTEAM'], year_retired=ret['YEAR'],
@@ -176,7 +180,7 @@ def create_team_roster_xrefs(team, result_sets):
     coaches = dictify(result_sets[1])
 
     for plr in common_team_roster:
-        player = Player.objects.filter(player_id=plr['PLAYER_ID']).first()
+        player = get_identity_map().find_player(plr['PLAYER_ID'])
         if player is None:
             log.debug("Missing player: {id}/{name}".format(id=plr['PLAYER_ID'],
                                                            name=plr['PLAYER']))
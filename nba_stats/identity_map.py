@@ -0,0 +1,140 @@
+import logging
+import threading
+from django.db import IntegrityError, transaction
+from nba_stats.models import Player, Team
+log = logging.getLogger('stats')
+
+
+def _nba_id(value):
+    # The same id shows up as 1610612737, "1610612737" or None/"" depending on the endpoint
+    if value is None or value == "":
+        return None
+    return int(value)
+
+
+class IdentityMap:
+    # NBA id -> model instance for Teams and Players. Everything is loaded with one query per
+    # model the first time it's needed; after that a lookup only goes to the db for an id we
+    # haven't seen (e.g. a player created since the preload), and the answer is remembered.
+
+    def __init__(self):
+        self._teams = None
+        self._players = None
+        self._lock = threading.RLock()
+
+    def _load(self):
+        with self._lock:
+            if self._teams is None:
+                self._teams = {}
+                for team in Team.objects.order_by('id'):
+                    self._teams.setdefault(team.team_id, team)
+                self._players = {player.player_id: player for player in Player.objects.all()}
+                log.debug(("Identity map loaded ", len(self._teams), " teams and ",
+                           len(self._players), " players"))
+
+    def refresh(self):
+        with self._lock:
+            self._teams = None
+            self._players = None
+
+    def find_team(self, team_id):
+        team_id = _nba_id(team_id)
+        if team_id is None:
+            return None
+        self._load()
+        team = self._teams.get(team_id)
+        if team is None:
+            team = Team.objects.filter(team_id=team_id).order_by('id').first()
+            if team is not None:
+                self._teams[team_id] = team
+        return team
+
+    def team(self, team_id):
+        # Like Team.objects.get, raises if the team doesn't exist
+        team = self.find_team(team_id)
+        if team is None:
+            raise Team.DoesNotExist("Team with team_id {t} does not exist".format(t=team_id))
+        return team
+
+    def find_player(self, player_id):
+        player_id = _nba_id(player_id)
+        if player_id is None:
+            return None
+        self._load()
+        player = self._players.get(player_id)
+        if player is None:
+            player = Player.objects.filter(player_id=player_id).first()
+            if player is not None:
+                self._players[player_id] = player
+        return player
+
+    def player(self, player_id):
+        # Like Player.objects.get, raises if the player doesn't exist
+        player = self.find_player(player_id)
+        if player is None:
+            raise Player.DoesNotExist("Player with player_id {p} does not exist".format(
+                p=player_id))
+        return player
+
+    def get_or_create_player(self, player_id, display_first_last, team=None):
+        # Bare bones player for ids we've never seen; the rest of the bio can be filled in later
+        with self._lock:
+            player = self.find_player(player_id)
+            if player is None:
+                log.debug(("Creating placeholder player ", player_id, display_first_last))
+                player, created = Player.objects.get_or_create(
+                    player_id=_nba_id(player_id),
+                    defaults={'display_first_last': display_first_last, 'team': team})
+                self._players[player.player_id] = player
+            return player
+
+    def ensure_players(self, candidates):
+        # candidates are (player_id, display_first_last, team) tuples, e.g. every player that
+        # appears in a day's worth of box scores and play by play. Any we don't know about are
+        # created as bare bones placeholders in a single insert. Returns the new player ids.
+        self._load()
+        missing = {}
+        for player_id, display_first_last, team in candidates:
+            player_id = _nba_id(player_id)
+            if player_id is None or player_id in self._players or player_id in missing:
+                continue
+            missing[player_id] = Player(player_id=player_id,
+                                        display_first_last=display_first_last, team=team)
+        if not missing:
+            return []
+
+        with self._lock:
+            # Somebody may have created a few of them since we preloaded
+            for player in Player.objects.filter(player_id__in=list(missing)):
+                self._players[player.player_id] = player
+                del missing[player.player_id]
+            if missing:
+                log.debug(("Creating ", len(missing), " placeholder players: ", list(missing)))
+                try:
+                    with transaction.atomic():
+                        Player.objects.bulk_create(list(missing.values()))
+                    for player in Player.objects.filter(player_id__in=list(missing)):
+                        self._players[player.player_id] = player
+                except IntegrityError:
+                    # Lost a race with a concurrent ingest for at least one of them, so fall
+                    # back to creating whatever is still missing one at a time.
+                    log.debug("Placeholder players were created concurrently, retrying singly")
+                    for player in missing.values():
+                        self.get_or_create_player(player.player_id, player.display_first_last,
+                                                  team=player.team)
+        return list(missing)
+
+    def add_player(self, player):
+        self._load()
+        self._players[player.player_id] = player
+
+    def add_team(self, team):
+        self._load()
+        self._teams[team.team_id] = team
+
+
+_identity_map = IdentityMap()
+
+
+def get_identity_map():
+    return _identity_map
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.db import connections, transaction
+from nba_stats.bulk import bulk_load
+from nba_stats.constants import FETCH_CONCURRENCY, INGESTION_QUEUE_SIZE
+from nba_stats.helpers.game import (get_box_score_player_stats, players_in_box_score,
+                                    players_in_play_by_play)
+from nba_stats.identity_map import get_identity_map
+from nba_stats.models import Game, GameOtherStats, GameOfficialXref, LineScore, PlayByPlayEvent
+from nba_stats.utils import fetch_json_concurrently
+from nba_stats.web_handlers.game_handler import (GameHandler, GameSummaryHandler,
+                                                 BoxScoreHandler, PlayByPlayHandler)
+log = logging.getLogger('stats')
+
+BOX_SCORE_TYPES = ['Traditional', 'Advanced', 'Misc', 'Scoring',
+                   'Usage', 'Tracking', 'Four Factors', 'Hustle']
+
+
+class GameDateBatch:
+    # Everything we know about the games on a single date as it moves through the pipeline.
+    # Raw json is dropped once it has been parsed so only the queued dates are held in memory.
+
+    def __init__(self, game_date):
+        self.game_date = game_date
+        self.scoreboard_handler = GameHandler()
+        self.games = []
+        self.raw_data = {}
+        self.other_stats = []
+        self.official_xrefs = []
+        self.line_scores = []
+        self.box_scores = {btype: {'players': [], 'teams': []} for btype in BOX_SCORE_TYPES}
+        self.pbp_events = []
+
+    def child_objects(self):
+        yield GameOtherStats, self.other_stats
+        yield GameOfficialXref, self.official_xrefs
+        yield LineScore, self.line_scores
+        for btype in BOX_SCORE_TYPES:
+            for boxes in [self.box_scores[btype]['players'], self.box_scores[btype]['teams']]:
+                if boxes:
+                    yield boxes[0].__class__, boxes
+        yield PlayByPlayEvent, self.pbp_events
+
+
+class GameIngestionPipeline:
+    # Streams a range of game dates through three stages connected by bounded queues:
+    #   fetch: every request for a date (scoreboard, summaries, box scores, play by play),
+    #          made concurrently through the shared, rate limited fetch client.
+    #   parse: turns the raw json into unsaved model instances.
+    #   write: bulk creates everything for the date inside a single transaction.
+    # While one date is being written the next is being parsed and the one after that fetched,
+    # and the queue sizes cap how far ahead of the database the network can get.
+
+    def __init__(self, season, queue_size=INGESTION_QUEUE_SIZE, max_workers=FETCH_CONCURRENCY,
+                 checkpoints=None):
+        self.season = season
+        self.checkpoints = checkpoints
+        self.queue_size = queue_size
+        self.max_workers = max_workers
+        # The ORM is synchronous, so parsing and writing each get a dedicated thread (and with
+        # it a dedicated db connection). Using one thread apiece also keeps dates in order.
+        self._fetch_executor = ThreadPoolExecutor(max_workers=1)
+        self._parse_executor = ThreadPoolExecutor(max_workers=1)
+        self._write_executor = ThreadPoolExecutor(max_workers=1)
+        self.games = []
+
+    def fetch(self, game_date):
+        batch = GameDateBatch(game_date)
+        batch.scoreboard_handler._fetch_raw_data(game_date)
+        scoreboard = batch.scoreboard_handler.raw_data['resultSets'][0]
+        game_ids = [dict(zip(scoreboard['headers'], row))['GAME_ID']
+                    for row in scoreboard['rowSet']]
+
+        requests_dict = {}
+        for game_id in game_ids:
+            game = Game(game_id=game_id)
+            requests_dict[(game_id, 'summary')] = (GameSummaryHandler(game).full_url,
+                                                   {'GameID': game_id})
+            pbp_handler = PlayByPlayHandler(game)
+            requests_dict[(game_id, 'pbp')] = (pbp_handler.full_url, pbp_handler.params)
+            for btype, request in BoxScoreHandler(game).box_score_requests().items():
+                requests_dict[(game_id, btype)] = request
+        batch.raw_data = fetch_json_concurrently(requests_dict, max_workers=self.max_workers)
+        log.debug(("Fetched ", len(requests_dict), " responses for ", game_date))
+        return batch
+
+    def parse(self, batch):
+        # The scoreboard was already fetched, don't hit the endpoint again
+        batch.games = batch.scoreboard_handler.create_games(batch.game_date, self.season,
+                                                            fetch=False)
+        self.create_placeholder_players(batch)
+
+        for game in batch.games:
+            game_id = str(game.game_id).rjust(10, "0")
+
+            summary_handler = GameSummaryHandler(game)
+            summary_handler.raw_data = batch.raw_data.pop((game_id, 'summary'))
+            sup_game_info = summary_handler.game_info()
+            for fld in sup_game_info:
+                if fld == "game_time":
+                    # The NBA is utterly moronic, so we have to do this to handle the case
+                    # Where they sent us a timestamp such as 1:60; i.e. 1 hour 60 minutes.
+                    hours, minutes = [int(p) for p in sup_game_info[fld].split(":")]
+                    setattr(game, fld, timedelta(hours=hours, minutes=minutes))
+                    continue
+                setattr(game, fld, sup_game_info[fld])
+            batch.other_stats += summary_handler.other_stats()
+            batch.official_xrefs += summary_handler.official_xrefs()
+            batch.line_scores += summary_handler.line_scores()
+
+            box_handler = BoxScoreHandler(game)
+            for btype in box_handler.box_score_requests():
+                box_handler.raw_data[btype] = batch.raw_data.pop((game_id, btype))
+            for btype in BOX_SCORE_TYPES:
+                boxes = box_handler.boxscore(btype)
+                batch.box_scores[btype]['players'] += boxes['players']
+                batch.box_scores[btype]['teams'] += boxes['teams']
+
+            pbp_handler = PlayByPlayHandler(game)
+            pbp_handler.raw_data = batch.raw_data.pop((game_id, 'pbp'))
+            batch.pbp_events += pbp_handler.play_by_play()
+
+        batch.raw_data = {}
+        return batch
+
+    def create_placeholder_players(self, batch):
+        # One insert for every player on this date that we've never seen, before any of the
+        # rows that point at them are built
+        candidates = []
+        for (game_id, key), raw_data in batch.raw_data.items():
+            if key == 'pbp':
+                candidates += players_in_play_by_play(raw_data['resultSets'][0])
+            elif key != 'summary':
+                box_type = "Hustle" if key == 'hustle' else key
+                player_stats = get_box_score_player_stats(raw_data, box_type)
+                if player_stats:
+                    candidates += players_in_box_score(player_stats)
+        get_identity_map().ensure_players(candidates)
+
+    def write(self, batch):
+        with transaction.atomic():
+            Game.objects.bulk_create(batch.games)
+            if any(game.pk is None for game in batch.games):
+                # Only Postgres hands back the new pks from bulk_create
+                # so read them back by game_id (the ones just written being the newest)
+                pks = dict(Game.objects.filter(game_id__in=[game.game_id for game in batch.games])
+                           .order_by('id').values_list('game_id', 'id'))
+                for game in batch.games:
+                    game.pk = pks[game.game_id]
+            for model, objs in batch.child_objects():
+                # The children were built against unsaved games, so pick up the new pks
+                for obj in objs:
+                    obj.game = obj.game
+                bulk_load(model, objs)
+            if self.checkpoints is not None:
+                self.checkpoints.mark_done("game_date", batch.game_date)
+        log.debug(("Finished updates for all games on ", batch.game_date))
+        return batch
+
+    async def _fetcher(self, loop, dates, parse_queue):
+        for game_date in dates:
+            batch = await loop.run_in_executor(self._fetch_executor, self.fetch, game_date)
+            await parse_queue.put(batch)
+        await parse_queue.put(None)
+
+    async def _parser(self, loop, parse_queue, write_queue):
+        while True:
+            batch = await parse_queue.get()
+            if batch is None:
+                break
+            batch = await loop.run_in_executor(self._parse_executor, self.parse, batch)
+            await write_queue.put(batch)
+        await write_queue.put(None)
+
+    async def _writer(self, loop, write_queue):
+        while True:
+            batch = await write_queue.get()
+            if batch is None:
+                break
+            await loop.run_in_executor(self._write_executor, self.write, batch)
+            # Every game written by this run, not just the last date's
+            self.games += batch.games
+
+    async def _run(self, loop, dates):
+        parse_queue = asyncio.Queue(maxsize=self.queue_size)
+        write_queue = asyncio.Queue(maxsize=self.queue_size)
+        tasks = [asyncio.ensure_future(self._fetcher(loop, dates, parse_queue)),
+                 asyncio.ensure_future(self._parser(loop, parse_queue, write_queue)),
+                 asyncio.ensure_future(self._writer(loop, write_queue))]
+        try:
+            await asyncio.gather(*tasks)
+        except Exception:
+            # Don't leave the other stages blocked on a queue that will never drain
+            for task in tasks:
+                task.cancel()
+            raise
+
+    def run(self, dates):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self._run(loop, list(dates)))
+        finally:
+            for executor in [self._parse_executor, self._write_executor]:
+                executor.submit(connections.close_all).result()
+            for executor in [self._fetch_executor, self._parse_executor, self._write_executor]:
+                executor.shutdown()
+            loop.close()
+        return self.games
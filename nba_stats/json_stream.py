@@ -0,0 +1,69 @@
+import logging
+import ijson
+log = logging.getLogger('stats')
+
+# Where the result sets live in a stats.nba.com response. Most endpoints send a list of them
+# under 'resultSets', a handful send a single one under 'resultSet'.
+RESULT_SET_PREFIXES = ('resultSets.item', 'resultSet')
+
+
+def _build(events, event, value):
+    # Assembles the value that starts with (event, value) out of the following events
+    builder = ijson.ObjectBuilder()
+    builder.event(event, value)
+    depth = 1 if event in ('start_map', 'start_array') else 0
+    while depth:
+        prefix, event, value = next(events)
+        builder.event(event, value)
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+    return builder.value
+
+
+def _iter_rows(events, prefix):
+    # events is positioned just after the rowSet's start_array
+    row_prefix = prefix + '.rowSet.item'
+    for event_prefix, event, value in events:
+        if event == 'end_array' and event_prefix == prefix + '.rowSet':
+            return
+        if event_prefix == row_prefix:
+            yield _build(events, event, value)
+
+
+def _read_result_set(events, prefix):
+    # Reads the keys ahead of rowSet (name, headers) and returns a dict shaped like the one
+    # response.json() would give us, except that 'rowSet' is a generator pulling rows off
+    # the wire as they're asked for.
+    result_set = {}
+    for event_prefix, event, value in events:
+        if event_prefix == prefix and event == 'end_map':
+            # e.g. a null rowSet
+            result_set['rowSet'] = iter(result_set.get('rowSet') or ())
+            return result_set
+        if event_prefix == prefix and event == 'map_key':
+            key = value
+            _, event, value = next(events)
+            if key == 'rowSet' and event == 'start_array':
+                if 'headers' not in result_set:
+                    raise ValueError("Can't stream a result set whose rows come before its headers")
+                result_set['rowSet'] = _iter_rows(events, prefix)
+                return result_set
+            result_set[key] = _build(events, event, value)
+    raise ValueError("Response ended in the middle of a result set")
+
+
+def iter_result_sets(stream):
+    # stream is anything ijson can read bytes from, e.g. a requests response's raw stream.
+    # Result sets come out in order; moving on to the next one discards whatever rows of
+    # the current one haven't been read yet.
+    events = iter(ijson.parse(stream, use_float=True))
+    current = None
+    for prefix, event, value in events:
+        if prefix in RESULT_SET_PREFIXES and event == 'start_map':
+            current = _read_result_set(events, prefix)
+            yield current
+            # Drain anything the caller left behind so the event stream lines up again
+            for _ in current['rowSet']:
+                pass
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nba_stats', '0009_game_season_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UpdateCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_ts', models.DateTimeField(default=django.utils.timezone.now)),
+                ('create_user', models.CharField(max_length=255)),
+                ('mod_ts', models.DateTimeField(null=True)),
+                ('mod_user', models.CharField(max_length=255, null=True)),
+                ('command', models.CharField(max_length=50)),
+                ('season_type', models.CharField(max_length=50)),
+                ('unit', models.CharField(max_length=255)),
+                ('season', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='nba_stats.LeagueSeason')),
+            ],
+            options={
+                'db_table': 'update_checkpoint',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='updatecheckpoint',
+            unique_together=set([('command', 'season', 'season_type', 'unit')]),
+        ),
+    ]
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+from django.db import migrations, models
+from django.db.models import Case, When, Value
+
+LINEUP_MODELS = ['AdvancedLineup', 'BaseLineup', 'FourFactorsLineup', 'MiscLineup', 'OpponentLineup', 'ScoringLineup', 'UsageLineup']
+
+
+def make_lineup_player_key(player_ids):
+    # Frozen copy of nba_stats.models.make_lineup_player_key
+    canonical = "-".join(str(pid) for pid in sorted(set(int(pid) for pid in player_ids)))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+UNIQUE_FIELDS = ('season_id', 'season_type', 'measure_type', 'per_mode', 'team_id',
+                 'group_quantity')
+BATCH_SIZE = 500
+
+
+def _batches(items):
+    for idx in range(0, len(items), BATCH_SIZE):
+        yield items[idx:idx + BATCH_SIZE]
+
+
+def set_player_keys(apps, schema_editor):
+    for model_name in LINEUP_MODELS:
+        model = apps.get_model('nba_stats', model_name)
+        through = model.players.through
+        player_ids = {}
+        for lineup_id, player_id in through.objects.values_list('%s_id' % model_name.lower(),
+                                                                'player__player_id'):
+            player_ids.setdefault(lineup_id, []).append(player_id)
+
+        keys = {}
+        doomed = []
+        seen = set()
+        for row in model.objects.order_by('id').values('id', *UNIQUE_FIELDS):
+            pids = player_ids.get(row['id'], [])
+            quantity = row['group_quantity']
+            if not pids or (quantity is not None and len(set(pids)) != quantity):
+                # Players the old code couldn't find were left out of the m2m, so there's no
+                # way to tell who these are. They'd all share (or clash on) a key, and wouldn't
+                # match the key LineupHandler makes from the full GROUP_ID; the next lineup
+                # update fetches them again.
+                doomed.append(row['id'])
+                continue
+            key = make_lineup_player_key(pids)
+            unique = tuple(row[field] for field in UNIQUE_FIELDS) + (key,)
+            if unique in seen:
+                # Same lineup saved twice, keep the first
+                doomed.append(row['id'])
+                continue
+            seen.add(unique)
+            keys[row['id']] = key
+
+        for ids in _batches(doomed):
+            through.objects.filter(**{'%s_id__in' % model_name.lower(): ids}).delete()
+            model.objects.filter(id__in=ids).delete()
+        lineup_ids = sorted(keys)
+        for ids in _batches(lineup_ids):
+            model.objects.filter(id__in=ids).update(
+                player_key=Case(*[When(id=lineup_id, then=Value(keys[lineup_id]))
+                                  for lineup_id in ids], output_field=models.CharField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nba_stats', '0010_updatecheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='advancedlineup',
+            name='player_key',
+            field=models.CharField(db_index=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='baselineup',
+            name='player_key',
+            field=models.CharField(db_index=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='fourfactorslineup',
+            name='player_key',
+            field=models.CharField(db_index=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='misclineup',
+            name='player_key',
+            field=models.CharField(db_index=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='opponentlineup',
+            name='player_key',
+            field=models.CharField(db_index=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='scoringlineup',
+            name='player_key',
+            field=models.CharField(db_index=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='usagelineup',
+            name='player_key',
+            field=models.CharField(db_index=True, default='', max_length=40),
+        ),
+        migrations.RunPython(set_player_keys, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='advancedlineup',
+            unique_together=set([('season', 'season_type', 'measure_type', 'per_mode', 'team', 'group_quantity', 'player_key')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='baselineup',
+            unique_together=set([('season', 'season_type', 'measure_type', 'per_mode', 'team', 'group_quantity', 'player_key')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='fourfactorslineup',
+            unique_together=set([('season', 'season_type', 'measure_type', 'per_mode', 'team', 'group_quantity', 'player_key')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='misclineup',
+            unique_together=set([('season', 'season_type', 'measure_type', 'per_mode', 'team', 'group_quantity', 'player_key')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='opponentlineup',
+            unique_together=set([('season', 'season_type', 'measure_type', 'per_mode', 'team', 'group_quantity', 'player_key')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='scoringlineup',
+            unique_together=set([('season', 'season_type', 'measure_type', 'per_mode', 'team', 'group_quantity', 'player_key')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='usagelineup',
+            unique_together=set([('season', 'season_type', 'measure_type', 'per_mode', 'team', 'group_quantity', 'player_key')]),
+        ),
+    ]
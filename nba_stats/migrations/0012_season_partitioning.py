@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from datetime import date
+from django.db import migrations, models
+from nba_stats.partitioning import partition_table
+
+PARTITIONED_MODELS = ['PlayByPlayEvent',
+                      'PlayerTraditionalBoxScore',
+                      'TeamTraditionalBoxScore',
+                      'PlayerAdvancedBoxScore',
+                      'TeamAdvancedBoxScore',
+                      'PlayerMiscBoxScore',
+                      'TeamMiscBoxScore',
+                      'PlayerScoringBoxScore',
+                      'TeamScoringBoxScore',
+                      'PlayerUsageBoxScore',
+                      'TeamUsageBoxScore',
+                      'PlayerTrackingBoxScore',
+                      'TeamTrackingBoxScore',
+                      'PlayerFourFactorsBoxScore',
+                      'TeamFourFactorsBoxScore',
+                      'PlayerHustleStatsBoxScore',
+                      'TeamHustleStatsBoxScore']
+
+
+def season_year_for_date(game_date):
+    # Frozen copy of nba_stats.utils.determine_season_for_date
+    return game_date.year - 1 if game_date.month < 7 else game_date.year
+
+
+def set_season_years(apps, schema_editor):
+    Game = apps.get_model('nba_stats', 'Game')
+    games_by_season = {}
+    for game_id, game_date in Game.objects.exclude(game_date_est=None).values_list('id',
+                                                                                 'game_date_est'):
+        games_by_season.setdefault(season_year_for_date(game_date), []).append(game_id)
+    for model_name in PARTITIONED_MODELS:
+        model = apps.get_model('nba_stats', model_name)
+        for season_year, game_ids in games_by_season.items():
+            model.objects.filter(game_id__in=game_ids).update(season_year=season_year)
+
+
+def partition_tables(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    Game = apps.get_model('nba_stats', 'Game')
+    season_years = {season_year_for_date(game_date) for game_date in
+                    Game.objects.exclude(game_date_est=None)
+                    .values_list('game_date_est', flat=True).distinct()}
+    # And the season in progress, which may not have any games yet
+    season_years.add(season_year_for_date(date.today()))
+    for model_name in PARTITIONED_MODELS:
+        model = apps.get_model('nba_stats', model_name)
+        partition_table(connection, model._meta.db_table, sorted(season_years))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nba_stats', '0011_lineup_player_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playbyplayevent',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='playertraditionalboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teamtraditionalboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='playeradvancedboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teamadvancedboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='playermiscboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teammiscboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='playerscoringboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teamscoringboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='playerusageboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teamusageboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='playertrackingboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teamtrackingboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='playerfourfactorsboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teamfourfactorsboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='playerhustlestatsboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teamhustlestatsboxscore',
+            name='season_year',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(set_season_years, migrations.RunPython.noop),
+        migrations.RunPython(partition_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# Composite indexes for the queries the site and the fantasy scoring run all the time.
+# Written by hand because the split and box score ones go on every concrete table of an
+# abstract model, and Django 1.11 can't inherit Meta.indexes. Names are the ones
+# nba_stats/query_plans.py looks for in the query plans. Shot charts by player are already
+# covered by the (player, game, game_event_id) unique index.
+
+SPLIT_FILTER_COLUMNS = ["season_id", "season_type", "per_mode", "group_set"]
+BOX_SCORE_PLAYER_COLUMNS = ["player_id", "season_year", "game_id"]
+
+
+def split_tables(apps):
+    return [model._meta.db_table for model in apps.get_app_config('nba_stats').get_models()
+            if model.__name__.endswith("Split") and
+            {"season", "season_type", "per_mode", "group_set"} <= {f.name for f in
+                                                                  model._meta.fields}]
+
+
+def player_box_score_tables(apps):
+    return [model._meta.db_table for model in apps.get_app_config('nba_stats').get_models()
+            if model.__name__.startswith("Player") and model.__name__.endswith("BoxScore")]
+
+
+def index_specs(apps):
+    specs = [("roster_entry_team_acquired", "roster_entry",
+              ["team_id", "acquisition_date", "end_date"], None)]
+    for table in split_tables(apps):
+        specs.append((table + "_season_filter", table, SPLIT_FILTER_COLUMNS, None))
+    for table in player_box_score_tables(apps):
+        specs.append((table + "_player_season", table, BOX_SCORE_PLAYER_COLUMNS, None))
+    return specs
+
+
+def create_indexes(apps, schema_editor):
+    qn = schema_editor.quote_name
+    for name, table, columns, where in index_specs(apps):
+        sql = "CREATE INDEX {n} ON {t} ({c})".format(n=qn(name), t=qn(table),
+                                                     c=", ".join(qn(col) for col in columns))
+        if where:
+            sql += " WHERE " + where
+        schema_editor.execute(sql)
+
+
+def drop_indexes(apps, schema_editor):
+    for name, table, columns, where in index_specs(apps):
+        schema_editor.execute("DROP INDEX IF EXISTS {n}".format(n=schema_editor.quote_name(name)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nba_stats', '0012_season_partitioning'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
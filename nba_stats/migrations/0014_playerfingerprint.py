@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nba_stats', '0013_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerFingerprint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_ts', models.DateTimeField(default=django.utils.timezone.now)),
+                ('create_user', models.CharField(max_length=255)),
+                ('mod_ts', models.DateTimeField(null=True)),
+                ('mod_user', models.CharField(max_length=255, null=True)),
+                ('player_nba_id', models.IntegerField(unique=True)),
+                ('list_hash', models.CharField(default='', max_length=40)),
+                ('summary_hash', models.CharField(default='', max_length=40)),
+                ('transactions_hash', models.CharField(default='', max_length=40)),
+            ],
+            options={
+                'db_table': 'player_fingerprint',
+            },
+        ),
+    ]
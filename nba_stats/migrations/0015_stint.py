@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from datetime import date
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from nba_stats.partitioning import partition_table
+
+
+def season_year_for_date(game_date):
+    # Frozen copy of nba_stats.utils.determine_season_for_date
+    return game_date.year - 1 if game_date.month < 7 else game_date.year
+
+
+def partition_stints(apps, schema_editor):
+    # Stints are partitioned by season like the box scores and play by play they come from
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    Game = apps.get_model('nba_stats', 'Game')
+    season_years = {season_year_for_date(game_date) for game_date in
+                    Game.objects.exclude(game_date_est=None)
+                    .values_list('game_date_est', flat=True).distinct()}
+    season_years.add(season_year_for_date(date.today()))
+    partition_table(connection, 'stint', sorted(season_years))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nba_stats', '0014_playerfingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Stint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_ts', models.DateTimeField(default=django.utils.timezone.now)),
+                ('create_user', models.CharField(max_length=255)),
+                ('mod_ts', models.DateTimeField(null=True)),
+                ('mod_user', models.CharField(max_length=255, null=True)),
+                ('season_year', models.IntegerField(default=0)),
+                ('sequence', models.IntegerField()),
+                ('period', models.IntegerField()),
+                ('start_seconds', models.IntegerField()),
+                ('end_seconds', models.IntegerField()),
+                ('player_key', models.CharField(db_index=True, max_length=40)),
+                ('pts_for', models.IntegerField(default=0)),
+                ('pts_against', models.IntegerField(default=0)),
+                ('poss_for', models.IntegerField(default=0)),
+                ('poss_against', models.IntegerField(default=0)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='nba_stats.Game')),
+                ('opponent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opponent_stints', to='nba_stats.Team')),
+                ('player_one', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='nba_stats.Player')),
+                ('player_two', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='nba_stats.Player')),
+                ('player_three', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='nba_stats.Player')),
+                ('player_four', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='nba_stats.Player')),
+                ('player_five', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='nba_stats.Player')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stints', to='nba_stats.Team')),
+            ],
+            options={
+                'db_table': 'stint',
+            },
+        ),
+        migrations.RunPython(partition_stints, migrations.RunPython.noop),
+    ]
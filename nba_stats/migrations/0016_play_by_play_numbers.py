@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+# Existing rows are filled in by the backfill_pbp_numbers command
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nba_stats', '0015_stint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playbyplayevent',
+            name='elapsed_seconds',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='playbyplayevent',
+            name='home_score',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='playbyplayevent',
+            name='away_score',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX play_by_play_event_season_elapsed "
+            "ON play_by_play_event (season_year, elapsed_seconds)",
+            "DROP INDEX IF EXISTS play_by_play_event_season_elapsed"),
+    ]
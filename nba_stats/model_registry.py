@@ -0,0 +1,124 @@
+import logging
+import threading
+from collections import namedtuple
+from django.apps import apps
+log = logging.getLogger('stats')
+
+# Everything the parsing code needs to know about a model, worked out once per process
+# instead of calling _meta.get_fields() for every row.
+#   field_names: what auto_strip_and_convert_fields keeps (every field name but 'id')
+#   unique_fields: what make_unique_filter_dict filters on
+#   converters: field name -> function applied to raw values for that field
+ModelInfo = namedtuple('ModelInfo', ['model', 'field_names', 'unique_fields', 'converters'])
+
+# The NBA's name for a measure type -> the one in our class names, per model suffix
+MEASURE_ALIASES = {'Split': {'Base': "Traditional"},
+                   'BoxScore': {'Base': "Traditional", 'Hustle': "HustleStats"}}
+
+
+def _unique_fields(model):
+    if hasattr(model, "unique_together"):
+        # In the case of Lineup and its children, we've had to use a hack
+        # To get around the uniqueness constraint, and just made unique_together
+        # a class attribute
+        return tuple(model.unique_together)
+    if model._meta.unique_together:
+        return tuple(model._meta.unique_together[0])
+    return ()
+
+
+def _field_names(model):
+    return frozenset(field.name for field in model._meta.get_fields() if field.name != 'id')
+
+
+def _converters(model, field_names):
+    from nba_stats.utils import convert_min_sec_to_float
+    converters = {}
+    if model.__name__.endswith("BoxScore"):
+        # Box scores report minutes played as "MM:SS"
+        for name in ["min", "minutes"]:
+            if name in field_names:
+                converters[name] = convert_min_sec_to_float
+    return converters
+
+
+def _make_info(model):
+    field_names = _field_names(model)
+    return ModelInfo(model=model, field_names=field_names, unique_fields=_unique_fields(model),
+                     converters=_converters(model, field_names))
+
+
+class ModelRegistry:
+
+    def __init__(self, app_label="nba_stats"):
+        self.app_label = app_label
+        self._by_model = {}
+        self._by_name = {}
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def build(self):
+        with self._lock:
+            if self._by_name:
+                return
+            for model in apps.get_app_config(self.app_label).get_models():
+                info = _make_info(model)
+                self._by_model[model] = info
+                self._by_name[model.__name__] = info
+            log.debug(("Registered ", len(self._by_name), " models"))
+
+    def models(self):
+        self.build()
+        return [info.model for info in self._by_name.values()]
+
+    def info(self, model):
+        info = self._by_model.get(model)
+        if info is None:
+            self.build()
+            info = self._by_model.get(model)
+        if info is None:
+            # Abstract models (e.g. TraditionalSplit) aren't registered with the app
+            info = _make_info(model)
+            self._by_model[model] = info
+        return info
+
+    def by_name(self, class_name):
+        class_name = class_name.replace(" ", "")
+        self.build()
+        info = self._by_name.get(class_name)
+        if info is None:
+            models_module = apps.get_app_config(self.app_label).models_module
+            info = self.info(getattr(models_module, class_name))
+            self._by_name[class_name] = info
+        return info
+
+    def lookup(self, entity, measure_type, suffix):
+        # e.g. ("Player", "Base", "Split") -> PlayerTraditionalSplit
+        key = (entity, measure_type, suffix)
+        info = self._by_key.get(key)
+        if info is None:
+            middle = MEASURE_ALIASES.get(suffix, {}).get(measure_type, measure_type)
+            info = self.by_name(entity + middle + suffix)
+            self._by_key[key] = info
+        return info
+
+    def strip(self, model, data, uppercase=False):
+        # Drops everything in data that isn't a field on the model. With uppercase, data is
+        # keyed on the upper cased field names, like the raw NBA headers.
+        field_names = self.info(model).field_names
+        if uppercase:
+            return {name: data[name.upper()] for name in field_names if name.upper() in data}
+        return {k: v for k, v in data.items() if k in field_names}
+
+    def convert(self, model, data):
+        for name, converter in self.info(model).converters.items():
+            if name in data:
+                data[name] = converter(data[name])
+        return data
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry():
+    return _registry
@@ -1,8 +1,10 @@
+import hashlib
 from django.db import models
 from django.core.validators import validate_comma_separated_integer_list
-from django.db.models import Count, QuerySet
+from django.db.models import QuerySet
 from django.utils import timezone
-from nba_stats.custom_managers import ActivePlayersManager
+from nba_stats.custom_managers import ActivePlayersManager, SeasonPartitionedQuerySet
+from nba_stats.utils import determine_season_for_date, normalize_season_type
 from nba_stats.constants import REGULAR_SEASON, PLAYOFFS
 
 
@@ -20,17 +22,16 @@ class BaseModel(models.Model):
         else:
             self.mod_ts = timezone.now()
 
+        self.normalize_season_type()
+        super(BaseModel, self).save(*args, **kwargs)
+
+    def normalize_season_type(self):
+        # Also used by nba_stats.bulk, which writes rows without going through save()
         if hasattr(self, "season_type"):
             if hasattr(self, "career_flag") and "career" in self.season_type.lower():
                 self.career_flag = True
 
-            new_season_type = self.season_type
-            for junk_str in [" ", "Career", "Totals", "Season"]:
-                new_season_type = new_season_type.replace(junk_str, "")
-
-            self.season_type = new_season_type
-
-        super(BaseModel, self).save(*args, **kwargs)
+            self.season_type = normalize_season_type(self.season_type)
 
     @classmethod
     def get_related_models(cls, app_names=None):
@@ -47,6 +48,28 @@ class BaseModel(models.Model):
         abstract = True
 
 
+class SeasonPartitionedModel(BaseModel):
+    # Box scores and play by play. On Postgres these tables are partitioned by season_year,
+    # so old seasons can be detached and queries that filter on it only touch one partition.
+    # See nba_stats/partitioning.py and SeasonPartitionedQuerySet.
+    season_year = models.IntegerField(default=0)
+
+    objects = SeasonPartitionedQuerySet.as_manager()
+
+    def set_partition_key(self):
+        # Also used by nba_stats.bulk, which writes rows without going through save()
+        game = getattr(self, 'game', None)
+        if game is not None and game.game_date_est is not None:
+            self.season_year = determine_season_for_date(game.game_date_est)
+
+    def save(self, *args, **kwargs):
+        self.set_partition_key()
+        super(SeasonPartitionedModel, self).save(*args, **kwargs)
+
+    class Meta:
+        abstract = True
+
+
 # For now, this is a silly stub class, but I'm going to create it
 # Because I think there is going to be more stuff I want to add.
 class UserExposedModel(BaseModel):
@@ -583,7 +606,7 @@ class GameOfficialXref(BaseModel):
         db_table = 'game_official_xref'
 
 
-class TeamBoxScore(BaseModel):
+class TeamBoxScore(SeasonPartitionedModel):
     game = models.ForeignKey(Game)
     team = models.ForeignKey(Team, null=True)
     team_name = models.CharField(max_length=50)
@@ -597,7 +620,7 @@ class TeamBoxScore(BaseModel):
         abstract = True
 
 
-class PlayerBoxScore(BaseModel):
+class PlayerBoxScore(SeasonPartitionedModel):
     game = models.ForeignKey(Game)
     player = models.ForeignKey(Player, null=True)
     team = models.ForeignKey(Team, null=True)
@@ -865,7 +888,7 @@ class TeamHustleStatsBoxScore(TeamBoxScore, HustleStatsBoxScore):
         db_table = 'team_hustle_stats_box_score'
 
 
-class PlayByPlayEvent(BaseModel):
+class PlayByPlayEvent(SeasonPartitionedModel):
     # PBP events will be distinct by game and eventnum
     game = models.ForeignKey(Game)
     eventnum = models.IntegerField(default=0, null=True)
@@ -880,6 +903,12 @@ class PlayByPlayEvent(BaseModel):
     # This should be max_lenght=7, but the NBA likes to randomly include spaces...
     score = models.CharField(max_length=75, null=True)
     scoremargin = models.IntegerField(default=0, null=True)
+    # pctimestring and score parsed once at ingestion (see set_play_by_play_numbers)
+    # Seconds since tip off
+    elapsed_seconds = models.IntegerField(null=True)
+    # Score after the event, carried forward from the last scoring play
+    home_score = models.IntegerField(null=True)
+    away_score = models.IntegerField(null=True)
 
     # Very poor design, but alas...
     person1type = models.IntegerField(null=True)
@@ -919,6 +948,53 @@ class PlayByPlayEvent(BaseModel):
                                                                           visitor=self.visitordescription)
 
 
+class Stint(SeasonPartitionedModel):
+    # A stretch of a game during which neither team made a substitution, seen from one team's
+    # side (each stretch has a row for both teams). Rebuilt from the play by play by
+    # nba_stats.stints; lineup and on/off numbers can be added up from these for any games.
+    game = models.ForeignKey(Game)
+    # Order of the stretch within the game
+    sequence = models.IntegerField()
+    team = models.ForeignKey(Team, related_name='stints')
+    opponent = models.ForeignKey(Team, related_name='opponent_stints')
+    period = models.IntegerField()
+    # Seconds since tip off
+    start_seconds = models.IntegerField()
+    end_seconds = models.IntegerField()
+    # make_lineup_player_key of the five players, same as on Lineup
+    player_key = models.CharField(max_length=40, db_index=True)
+    # The players on the court for team, in id order. Null past however many of them we
+    # could work out.
+    player_one = models.ForeignKey(Player, related_name='+', null=True, db_index=False,
+                                   db_constraint=False)
+    player_two = models.ForeignKey(Player, related_name='+', null=True, db_index=False,
+                                   db_constraint=False)
+    player_three = models.ForeignKey(Player, related_name='+', null=True, db_index=False,
+                                     db_constraint=False)
+    player_four = models.ForeignKey(Player, related_name='+', null=True, db_index=False,
+                                    db_constraint=False)
+    player_five = models.ForeignKey(Player, related_name='+', null=True, db_index=False,
+                                    db_constraint=False)
+    pts_for = models.IntegerField(default=0)
+    pts_against = models.IntegerField(default=0)
+    poss_for = models.IntegerField(default=0)
+    poss_against = models.IntegerField(default=0)
+
+    class Meta:
+        # No unique_together, Postgres won't have one on a partitioned table that doesn't
+        # include season_year. Stints are only ever replaced a whole game at a time.
+        db_table = 'stint'
+
+    def player_ids(self):
+        return [pid for pid in [self.player_one_id, self.player_two_id, self.player_three_id,
+                                self.player_four_id, self.player_five_id] if pid is not None]
+
+    def __str__(self):
+        return "<Stint>: {g} {t} #{s} ({st}-{e})".format(g=self.game_id, t=self.team_id,
+                                                         s=self.sequence, st=self.start_seconds,
+                                                         e=self.end_seconds)
+
+
 class PlayerShotChartDetail(BaseModel):
     grid_type = models.CharField(max_length=100, default="")
     # This is only temporary because we haven't seeded all games. eventually this will be req'd
@@ -1306,14 +1382,24 @@ class TeamDefenseSplit(TeamSplit, DefenseSplit):
         unique_together = TeamSplit._meta.unique_together
 
 
+def make_lineup_player_key(player_ids):
+    # Canonical key for a set of players: their NBA player ids, sorted and hashed.
+    # The same five guys always get the same key, whatever order the NBA lists them in.
+    canonical = "-".join(str(pid) for pid in sorted(set(int(pid) for pid in player_ids)))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
 class Lineup(BaseModel):
     unique_together = ('season', 'season_type', 'measure_type',
-                       'per_mode', 'team', 'group_quantity')
+                       'per_mode', 'team', 'group_quantity', 'player_key')
     season = models.ForeignKey(LeagueSeason, null=True)
     season_type = models.CharField(max_length=50)
     measure_type = models.CharField(max_length=50, default="")
     per_mode = models.CharField(max_length=50)
     players = models.ManyToManyField(Player)
+    # See make_lineup_player_key. Lets us find a lineup by its players with a single indexed
+    # equality rather than a join per player.
+    player_key = models.CharField(max_length=40, db_index=True, default="")
     team = models.ForeignKey(Team)
     team_abbreviation = models.CharField(max_length=5)
     gp = models.IntegerField(null=True)
@@ -1325,24 +1411,19 @@ class Lineup(BaseModel):
 
     @classmethod
     def filter_on_players(cls, players, filter_dict=None):
+        # players is a QuerySet of Players, or a list of Player pks
         if filter_dict is None:
             filter_dict = {}
         elif "player" in filter_dict or "players" in filter_dict:
             raise ValueError("Don't pass the player(s) you want to filter on "
                              "in filter_dict.")
-        if isinstance(players, QuerySet):
-            players = list(players.values_list('id', flat=True).distinct())
-        elif not isinstance(players, list):
+        if isinstance(players, list):
+            players = Player.objects.filter(id__in=players)
+        elif not isinstance(players, QuerySet):
             raise ValueError("You must pass a QuerySet or list to this function."
                              " You passed a {t}".format(t=type(players)))
-        num_players = len(players)
-        lineup_query = cls.objects.annotate(count=Count('players')).filter(count=num_players)
-        lineup_query = lineup_query.filter(**filter_dict)
-
-        for player in players:
-            lineup_query = lineup_query.filter(players__id=player)
-
-        return lineup_query
+        player_key = make_lineup_player_key(players.values_list('player_id', flat=True))
+        return cls.objects.filter(player_key=player_key, **filter_dict)
 
     def __str__(self):
         return "-".join(map(str, [self.season, self.season_type,
@@ -1357,18 +1438,21 @@ class BaseLineup(Lineup, TraditionalSplit):
 
     class Meta:
         db_table = 'base_lineup'
+        unique_together = Lineup.unique_together
 
 
 class AdvancedLineup(Lineup, AdvancedSplit):
 
     class Meta:
         db_table = 'advanced_lineup'
+        unique_together = Lineup.unique_together
 
 
 class MiscLineup(Lineup, MiscSplit):
 
     class Meta:
         db_table = 'misc_lineup'
+        unique_together = Lineup.unique_together
 
 
 class FourFactorsLineup(Lineup):
@@ -1383,24 +1467,28 @@ class FourFactorsLineup(Lineup):
 
     class Meta:
         db_table = 'four_factors_lineup'
+        unique_together = Lineup.unique_together
 
 
 class ScoringLineup(Lineup, ScoringSplit):
 
     class Meta:
         db_table = 'scoring_lineup'
+        unique_together = Lineup.unique_together
 
 
 class OpponentLineup(Lineup, OpponentSplit):
 
     class Meta:
         db_table = 'opponent_lineup'
+        unique_together = Lineup.unique_together
 
 
 class UsageLineup(Lineup, UsageSplit):
 
     class Meta:
         db_table = 'usage_lineup'
+        unique_together = Lineup.unique_together
 
 
 class PlayerOnOff(BaseModel):
@@ -1706,3 +1794,37 @@ class PlayerTouchTracking(PlayerTracking):
         unique_together = ('player', 'season', 'season_type',
                            'pt_measure_type', 'per_mode', 'group_set',
                            'group_value', 'touch_type')
+
+
+class UpdateCheckpoint(BaseModel):
+    # One row per unit of work (a player, a game date, a measure/per mode/group combo, etc.)
+    # that an update_* command has finished, so a failed run can pick up where it left off.
+    command = models.CharField(max_length=50)
+    season = models.ForeignKey(LeagueSeason)
+    season_type = models.CharField(max_length=50)
+    unit = models.CharField(max_length=255)
+
+    class Meta:
+        db_table = 'update_checkpoint'
+        unique_together = ('command', 'season', 'season_type', 'unit')
+
+    def __str__(self):
+        return "<UpdateCheckpoint>: {c} {s} {st}; {u}".format(c=self.command, s=self.season,
+                                                              st=self.season_type, u=self.unit)
+
+
+class PlayerFingerprint(BaseModel):
+    # Content hashes of what we last fetched for a player, so update_player_stats can skip
+    # players that haven't changed. See nba_stats/fingerprints.py.
+    # player_nba_id rather than a foreign key, since we fingerprint players we may not have yet
+    player_nba_id = models.IntegerField(unique=True)
+    # Roster status and team from the league wide player list
+    list_hash = models.CharField(max_length=40, default="")
+    summary_hash = models.CharField(max_length=40, default="")
+    transactions_hash = models.CharField(max_length=40, default="")
+
+    class Meta:
+        db_table = 'player_fingerprint'
+
+    def __str__(self):
+        return "<PlayerFingerprint>: {p}".format(p=self.player_nba_id)
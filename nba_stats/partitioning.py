@@ -0,0 +1,107 @@
+import logging
+from django.apps import apps
+from django.db import connections
+log = logging.getLogger('stats')
+
+# Postgres declarative partitioning (11+) of the box score and play by play tables by
+# season_year, one LIST partition per season plus a default partition for anything else.
+# Everywhere else these are plain tables and everything in here is a no-op.
+
+DEFAULT_PARTITION_SUFFIX = "default"
+
+
+def partitioned_models():
+    from nba_stats.models import SeasonPartitionedModel
+    return [model for model in apps.get_app_config('nba_stats').get_models()
+            if issubclass(model, SeasonPartitionedModel)]
+
+
+def partition_name(table, season_year):
+    return "{t}_{y}".format(t=table, y=season_year)
+
+
+def _is_partitioned(cursor, table):
+    cursor.execute("SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+                   "WHERE c.relname = %s", [table])
+    return cursor.fetchone() is not None
+
+
+def _create_partition(cursor, qn, table, season_year):
+    cursor.execute("CREATE TABLE IF NOT EXISTS {part} PARTITION OF {table} "
+                   "FOR VALUES IN (%s)".format(part=qn(partition_name(table, season_year)),
+                                               table=qn(table)), [season_year])
+
+
+def partition_table(connection, table, season_years):
+    # Swaps a plain table for a partitioned one with the same columns, data, indexes and
+    # foreign keys. The primary key becomes (id, season_year), since Postgres requires the
+    # partition key in every unique constraint; the id sequence carries on as before.
+    qn = connection.ops.quote_name
+    old_table = table + "_unpartitioned"
+    with connection.cursor() as cursor:
+        if _is_partitioned(cursor, table):
+            return
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+        cursor.execute("SELECT indexdef FROM pg_indexes WHERE tablename = %s "
+                       "AND indexname NOT IN (SELECT conname FROM pg_constraint "
+                       "WHERE conrelid = %s::regclass AND contype = 'p')", [table, table])
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                       "WHERE conrelid = %s::regclass AND contype = 'f'", [table])
+        foreign_keys = cursor.fetchall()
+
+        log.debug(("Partitioning ", table, " by season_year"))
+        cursor.execute("ALTER TABLE {t} RENAME TO {o}".format(t=qn(table), o=qn(old_table)))
+        cursor.execute("ALTER SEQUENCE {s} OWNED BY NONE".format(s=sequence))
+        cursor.execute("CREATE TABLE {t} (LIKE {o} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+                       "PARTITION BY LIST (season_year)".format(t=qn(table), o=qn(old_table)))
+        cursor.execute("ALTER TABLE {t} ADD PRIMARY KEY (id, season_year)".format(t=qn(table)))
+        cursor.execute("CREATE TABLE {part} PARTITION OF {t} DEFAULT".format(
+            part=qn(partition_name(table, DEFAULT_PARTITION_SUFFIX)), t=qn(table)))
+        for season_year in season_years:
+            _create_partition(cursor, qn, table, season_year)
+
+        cursor.execute("INSERT INTO {t} SELECT * FROM {o}".format(t=qn(table), o=qn(old_table)))
+        cursor.execute("DROP TABLE {o}".format(o=qn(old_table)))
+        cursor.execute("ALTER SEQUENCE {s} OWNED BY {t}.id".format(s=sequence, t=qn(table)))
+
+        # Indexes on the parent are created on every partition too
+        for index_def in index_defs:
+            cursor.execute(index_def)
+        for name, definition in foreign_keys:
+            cursor.execute("ALTER TABLE {t} ADD CONSTRAINT {n} {d}".format(t=qn(table),
+                                                                         n=qn(name),
+                                                                         d=definition))
+
+
+def ensure_season_partitions(season_year, using="default"):
+    # Call before loading a new season, otherwise its rows land in the default partition
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for model in partitioned_models():
+            table = model._meta.db_table
+            if _is_partitioned(cursor, table):
+                _create_partition(cursor, qn, table, season_year)
+
+
+def detach_season_partition(season_year, using="default"):
+    # Takes a season out of the box score and play by play tables without deleting anything.
+    # The detached tables can be archived (pg_dump) and dropped, or attached again later.
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        raise ValueError("Season partitions only exist on Postgres")
+    qn = connection.ops.quote_name
+    detached = []
+    with connection.cursor() as cursor:
+        for model in partitioned_models():
+            table = model._meta.db_table
+            part = partition_name(table, season_year)
+            cursor.execute("ALTER TABLE {t} DETACH PARTITION {p}".format(t=qn(table),
+                                                                       p=qn(part)))
+            detached.append(part)
+    log.debug(("Detached ", detached))
+    return detached
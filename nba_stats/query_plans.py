@@ -0,0 +1,133 @@
+import logging
+from collections import namedtuple
+from datetime import date
+from django.apps import apps
+from django.db import connections, transaction
+log = logging.getLogger('stats')
+
+# EXPLAINs the queries we run all the time and checks each one's plan uses the index that was
+# added for it (see nba_stats/migrations/0013_hot_query_indexes.py and
+# nba_fantasy/migrations/0002_hot_query_indexes.py). A missing index, or a change to one of
+# these queries that stops it from using its index, shows up as a failure here rather than
+# as a slow page.
+#   build: takes nothing, returns the queryset. The values filtered on don't matter.
+#   index: takes nothing, returns the name of the index that should show up in the plan
+HotQuery = namedtuple('HotQuery', ['label', 'build', 'index'])
+
+PLACEHOLDER_ID = 1
+PLACEHOLDER_DATE = date(2017, 1, 1)
+
+
+def _table_index(app_label, model_name, suffix):
+    # Index named after the model's table, the way the migrations name them
+    def index():
+        return apps.get_model(app_label, model_name)._meta.db_table + suffix
+    return index
+
+
+def _named_index(name):
+    return lambda: name
+
+
+def _split_query(model_name):
+    def build():
+        model = apps.get_model('nba_stats', model_name)
+        return model.objects.filter(season_id=PLACEHOLDER_ID, season_type="Regular Season",
+                                    per_mode="PerGame", group_set="Overall")
+    return build
+
+
+def _roster_on_date():
+    from nba_stats.helpers.roster import get_roster_on_date
+    return get_roster_on_date(PLACEHOLDER_ID, PLACEHOLDER_DATE)
+
+
+def _box_score_for_date():
+    model = apps.get_model('nba_stats', 'PlayerTraditionalBoxScore')
+    return model.objects.for_date(PLACEHOLDER_DATE).filter(player_id=PLACEHOLDER_ID)
+
+
+def _lineup_for_dates():
+    model = apps.get_model('nba_fantasy', 'FantasyLineupEntry')
+    return model.objects.filter(team_id=PLACEHOLDER_ID, lineup_date__gte=PLACEHOLDER_DATE,
+                                lineup_date__lte=PLACEHOLDER_DATE)
+
+
+def _current_fantasy_roster():
+    model = apps.get_model('nba_fantasy', 'FantasyTeamRosterEntry')
+    return model.objects.filter(team_id=PLACEHOLDER_ID, end_date__isnull=True)
+
+
+def _shot_chart():
+    model = apps.get_model('nba_stats', 'PlayerShotChartDetail')
+    return model.objects.filter(player__id=PLACEHOLDER_ID)
+
+
+HOT_QUERIES = [
+    HotQuery("player splits", _split_query('PlayerTraditionalSplit'),
+             _table_index('nba_stats', 'PlayerTraditionalSplit', "_season_filter")),
+    HotQuery("team splits", _split_query('TeamTraditionalSplit'),
+             _table_index('nba_stats', 'TeamTraditionalSplit', "_season_filter")),
+    HotQuery("roster on date", _roster_on_date, _named_index("roster_entry_team_acquired")),
+    HotQuery("fantasy box score", _box_score_for_date,
+             _table_index('nba_stats', 'PlayerTraditionalBoxScore', "_player_season")),
+    HotQuery("fantasy lineup", _lineup_for_dates,
+             _named_index("fantasy_lineup_entry_team_date")),
+    HotQuery("fantasy roster", _current_fantasy_roster,
+             _named_index("fantasy_team_roster_entry_current")),
+    # Served by the unique (player, game, game_event_id) index or the player foreign key one,
+    # both of which Django names starting with this
+    HotQuery("shot chart", _shot_chart,
+             _table_index('nba_stats', 'PlayerShotChartDetail', "_player_id")),
+]
+
+
+def explain(queryset, using="default"):
+    # The query plan as a list of lines
+    connection = connections[using]
+    sql, params = queryset.query.sql_with_params()
+    if connection.vendor == 'postgresql':
+        prefix = "EXPLAIN "
+    elif connection.vendor == 'sqlite':
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        raise ValueError("Don't know how to EXPLAIN on " + connection.vendor)
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        return [" ".join(str(col) for col in row) for row in cursor.fetchall()]
+
+
+def index_names(index, using="default"):
+    # index plus, on Postgres, the indexes attached to it on each partition of a partitioned
+    # table. Plans for those name the partition's index (e.g.
+    # player_traditional_box_score_2016_player_id_season_year_game_id_idx), never the parent's.
+    names = {index}
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT child.relname FROM pg_inherits i "
+                           "JOIN pg_class child ON child.oid = i.inhrelid "
+                           "JOIN pg_class parent ON parent.oid = i.inhparent "
+                           "WHERE parent.relname = %s AND parent.relkind = 'I'", [index])
+            names.update(row[0] for row in cursor.fetchall())
+    return names
+
+
+def check_hot_queries(using="default"):
+    # Returns {label: plan} for every hot query whose plan doesn't use its index.
+    # Sequential scans are switched off while explaining; on a small or empty database
+    # Postgres would rightly prefer them, and what we're after is whether the index can be used.
+    connection = connections[using]
+    failures = {}
+    with transaction.atomic(using=using):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        for hot_query in HOT_QUERIES:
+            index = hot_query.index()
+            names = index_names(index, using=using)
+            plan = explain(hot_query.build(), using=using)
+            if not any(name in line for name in names for line in plan):
+                failures[hot_query.label] = plan
+                log.debug(("No ", index, " in plan for ", hot_query.label, plan))
+    return failures
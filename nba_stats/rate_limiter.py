@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from nba_stats.constants import (RATE_LIMIT_DEFAULT_RATES, RATE_LIMIT_HOST_RATES,
+                                 RATE_LIMIT_BURST, RATE_LIMIT_INCREASE_STEP,
+                                 RATE_LIMIT_DECREASE_FACTOR, RATE_LIMIT_LATENCY_FACTOR,
+                                 RATE_LIMIT_THROTTLE_CODES, RATE_LIMIT_THROTTLE_BACKOFF)
+log = logging.getLogger('stats')
+
+
+def parse_retry_after(value):
+    # Retry-After is either a number of seconds or an http date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class HostRateLimiter:
+    # Token bucket for a single host with AIMD rate control: the rate goes up a little with
+    # every healthy response and gets cut in half when we're throttled or latency spikes.
+
+    def __init__(self, host, rate, min_rate, max_rate, burst=RATE_LIMIT_BURST,
+                 increase_step=RATE_LIMIT_INCREASE_STEP,
+                 decrease_factor=RATE_LIMIT_DECREASE_FACTOR,
+                 latency_factor=RATE_LIMIT_LATENCY_FACTOR,
+                 throttle_backoff=RATE_LIMIT_THROTTLE_BACKOFF, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.host = host
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_factor = latency_factor
+        self.throttle_backoff = throttle_backoff
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.tokens = float(burst)
+        self.last_refill = clock()
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.queue_depth = 0
+        self.latency_ewma = None
+        self.best_latency = None
+        self.requests = 0
+        self.throttled = 0
+        self.consecutive_throttles = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self):
+        with self._lock:
+            self.queue_depth += 1
+        try:
+            while True:
+                with self._lock:
+                    now = self._clock()
+                    self._refill(now)
+                    if now >= self.blocked_until and self.tokens >= 1:
+                        self.tokens -= 1
+                        self.requests += 1
+                        return
+                    wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+                self._sleep(wait)
+        finally:
+            with self._lock:
+                self.queue_depth -= 1
+
+    def _decrease(self, now):
+        # Don't keep slashing the rate for every in flight response from the same bad patch
+        if now - self.last_decrease < 1.0:
+            return
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        self.last_decrease = now
+        log.debug(("Backing off requests to ", self.host, " rate is now ", self.rate))
+
+    def record_response(self, status_code, latency, retry_after=None):
+        with self._lock:
+            now = self._clock()
+            if status_code in RATE_LIMIT_THROTTLE_CODES or retry_after is not None:
+                self.throttled += 1
+                self.consecutive_throttles += 1
+                if retry_after is None:
+                    retry_after = self.throttle_backoff * 2 ** (self.consecutive_throttles - 1)
+                # Nobody goes again until the wait is up, however many tokens were left
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+                self.tokens = 0.0
+                self._decrease(now)
+                return
+            self.consecutive_throttles = 0
+
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma = 0.8 * self.latency_ewma + 0.2 * latency
+            if self.best_latency is None or self.latency_ewma < self.best_latency:
+                self.best_latency = self.latency_ewma
+            else:
+                # Let the baseline drift up slowly so one lucky response doesn't pin it forever
+                self.best_latency *= 1.001
+
+            if self.latency_ewma > self.latency_factor * self.best_latency:
+                self._decrease(now)
+            else:
+                # Additive increase of roughly increase_step per second
+                self.rate = min(self.max_rate, self.rate + self.increase_step / self.rate)
+
+    def record_failure(self):
+        with self._lock:
+            self._decrease(self._clock())
+
+    def metrics(self):
+        with self._lock:
+            return {'rate': round(self.rate, 3),
+                    'queue_depth': self.queue_depth,
+                    'latency_ewma': self.latency_ewma,
+                    'requests': self.requests,
+                    'throttled': self.throttled}
+
+
+class RateLimiter:
+    # Process wide collection of HostRateLimiters, one per host.
+
+    def __init__(self, default_rates=RATE_LIMIT_DEFAULT_RATES, host_rates=None, **kwargs):
+        self.default_rates = default_rates
+        self.host_rates = dict(RATE_LIMIT_HOST_RATES)
+        if host_rates is not None:
+            self.host_rates.update(host_rates)
+        self.limiter_kwargs = kwargs
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url):
+        host = urlsplit(url).netloc.lower()
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(host)
+                if limiter is None:
+                    rate, min_rate, max_rate = self.host_rates.get(host, self.default_rates)
+                    limiter = HostRateLimiter(host, rate, min_rate, max_rate,
+                                              **self.limiter_kwargs)
+                    self._limiters[host] = limiter
+        return limiter
+
+    def metrics(self):
+        return {host: limiter.metrics() for host, limiter in self._limiters.items()}
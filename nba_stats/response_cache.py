@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date
+from urllib.parse import urlsplit, urlunsplit, parse_qsl
+from nba_stats.constants import (RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_PATH,
+                                 RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_DEFAULT_TTL,
+                                 RESPONSE_CACHE_TTLS, RESPONSE_CACHE_TOUCH_SECONDS,
+                                 GAME_ENDPOINTS)
+log = logging.getLogger('stats')
+
+FOREVER = None
+
+
+def normalize_request(url, params=None):
+    # A lot of our urls have the params baked into the query string (see constants.py),
+    # others pass a params dict. Fold both into one sorted list so they key identically.
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query += [(str(k), "" if v is None else str(v)) for k, v in params.items()]
+    query = sorted(set(query))
+    base_url = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"),
+                           "", ""))
+    return base_url, query
+
+
+def make_cache_key(url, params=None):
+    base_url, query = normalize_request(url, params)
+    raw = base_url + "?" + "&".join(k + "=" + v for k, v in query)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get_endpoint(url):
+    return urlsplit(url).path.rstrip("/").split("/")[-1].lower()
+
+
+def _season_is_finished(season_str):
+    from nba_stats.utils import make_season_int, determine_season_for_date
+    try:
+        season_year = make_season_int(season_str)
+    except ValueError:
+        return False
+    return season_year < determine_season_for_date(date.today())
+
+
+def _game_season_is_finished(game_id):
+    # GameIDs look like 0021600001, where 16 is the season the game was played in.
+    game_id = str(game_id).rjust(10, "0")
+    try:
+        season_year = 2000 + int(game_id[3:5])
+    except ValueError:
+        return False
+    if season_year > date.today().year:
+        season_year -= 100
+    return _season_is_finished(str(season_year))
+
+
+class CachePolicy:
+    # Decides how long a given response gets to live in the cache.
+
+    def __init__(self, ttls=None, default_ttl=RESPONSE_CACHE_DEFAULT_TTL):
+        self.ttls = dict(RESPONSE_CACHE_TTLS)
+        if ttls is not None:
+            self.ttls.update(ttls)
+        self.default_ttl = default_ttl
+        self._completed_games = set()
+
+    def _game_is_complete(self, game_id):
+        if game_id in self._completed_games:
+            return True
+        if _game_season_is_finished(game_id):
+            complete = True
+        else:
+            from nba_stats.models import Game
+            # game_status_id of 3 is what the scoreboard gives us for a Final
+            complete = Game.objects.filter(game_id=int(game_id), game_status_id=3).exists()
+        if complete:
+            self._completed_games.add(game_id)
+        return complete
+
+    def ttl_for(self, url, params=None):
+        endpoint = get_endpoint(url)
+        query = dict(normalize_request(url, params)[1])
+        game_id = query.get('GameID')
+        if game_id and endpoint in GAME_ENDPOINTS and self._game_is_complete(game_id):
+            return FOREVER
+        season = query.get('Season')
+        if season and endpoint not in ['scoreboardv2'] and _season_is_finished(season):
+            return FOREVER
+        return self.ttls.get(endpoint, self.default_ttl)
+
+
+class ResponseCache:
+    # Content addressed store of zlib compressed json documents in a single sqlite file.
+    # Eviction is LRU on last access time, bounded by the total compressed size.
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                 policy=None, touch_seconds=RESPONSE_CACHE_TOUCH_SECONDS):
+        self.path = os.path.expanduser(path)
+        self.max_bytes = max_bytes
+        self.touch_seconds = touch_seconds
+        self.policy = policy or CachePolicy()
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS response ("
+                     "key TEXT PRIMARY KEY, "
+                     "endpoint TEXT, "
+                     "body BLOB NOT NULL, "
+                     "size INTEGER NOT NULL, "
+                     "expires_at REAL, "
+                     "last_access REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS response_last_access "
+                     "ON response (last_access)")
+        conn.commit()
+        self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) "
+                                         "FROM response").fetchone()[0]
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, url, params=None):
+        key = make_cache_key(url, params)
+        conn = self._connection()
+        row = conn.execute("SELECT body, expires_at, last_access FROM response WHERE key = ?",
+                           (key,)).fetchone()
+        now = time.time()
+        if row is None or (row[1] is not None and row[1] < now):
+            self.misses += 1
+            return None
+        if now - row[2] >= self.touch_seconds:
+            # Eviction only needs a rough LRU order, so most hits are read only
+            with self._write_lock:
+                conn.execute("UPDATE response SET last_access = ? WHERE key = ?", (now, key))
+                conn.commit()
+        self.hits += 1
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def set(self, url, params, json_data):
+        ttl = self.policy.ttl_for(url, params)
+        if ttl == 0:
+            return
+        now = time.time()
+        expires_at = None if ttl is FOREVER else now + ttl
+        body = zlib.compress(json.dumps(json_data).encode("utf-8"))
+        key = make_cache_key(url, params)
+        with self._write_lock:
+            conn = self._connection()
+            old = conn.execute("SELECT size FROM response WHERE key = ?", (key,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO response "
+                         "(key, endpoint, body, size, expires_at, last_access) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         (key, get_endpoint(url), body, len(body), expires_at, now))
+            conn.commit()
+            self._total_bytes += len(body) - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict(conn)
+
+    def _evict(self, conn):
+        # Expired rows go first, then least recently used until we're at 90% of the limit.
+        conn.execute("DELETE FROM response WHERE expires_at IS NOT NULL AND expires_at < ?",
+                     (time.time(),))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM response").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        if total > target:
+            rows = conn.execute("SELECT key, size FROM response ORDER BY last_access")
+            doomed = []
+            for key, size in rows:
+                if total <= target:
+                    break
+                doomed.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM response WHERE key = ?", doomed)
+        conn.commit()
+        log.debug(("Evicted response cache down to ", total, " bytes"))
+        self._total_bytes = total
+
+    def clear(self):
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM response")
+            conn.commit()
+            self._total_bytes = 0
+
+
+_cache = None
+_cache_enabled = RESPONSE_CACHE_ENABLED
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    global _cache
+    if not _cache_enabled:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def configure_response_cache(enabled=True, **kwargs):
+    global _cache, _cache_enabled
+    with _cache_lock:
+        _cache_enabled = enabled
+        _cache = ResponseCache(**kwargs) if enabled else None
+    return _cache
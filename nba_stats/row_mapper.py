@@ -0,0 +1,68 @@
+import logging
+from functools import lru_cache
+from nba_stats.model_registry import get_model_registry
+from nba_stats.utils import convert_key_to_lowercase
+log = logging.getLogger('stats')
+
+
+class RowMapper:
+    # Turns raw rowSet lists straight into model field dicts. Everything dictify,
+    # convert_dict_keys_to_lowercase and auto_strip_and_convert_fields work out per row
+    # (which headers survive, what they're renamed to, whether the model has such a field)
+    # only depends on the headers and the model, so it's worked out once up front here.
+
+    def __init__(self, headers, model, aliases=(), override_list=(), aux_list=(), isgame=False,
+                 converters=()):
+        self.headers = list(headers)
+        self.model = model
+        self.field_names = get_model_registry().info(model).field_names
+        converters = dict(converters)
+
+        # aliases are (new header, existing header) pairs, e.g. the Misc endpoints call it
+        # PTS_2ND_CHANCE but our models call it pts_second_chance
+        columns = [(header, idx) for idx, header in enumerate(self.headers)]
+        columns += [(alias, self.headers.index(source)) for alias, source in aliases]
+
+        plan = {}
+        for header, idx in columns:
+            key = convert_key_to_lowercase(header, isgame, override_list, aux_list)
+            if key is None or key not in self.field_names:
+                continue
+            # Later columns win, same as assigning into the row dict would
+            plan.pop(key, None)
+            plan[key] = (idx, converters.get(key))
+        self.plan = [(idx, key, converter) for key, (idx, converter) in plan.items()]
+
+    def index(self, header):
+        return self.headers.index(header)
+
+    def map(self, row, constants=None):
+        data = {}
+        for idx, key, converter in self.plan:
+            value = row[idx]
+            data[key] = converter(value) if converter is not None else value
+        if constants:
+            data.update(constants)
+        return data
+
+    def map_rows(self, rows, constants=None):
+        # constants (season, per_mode, etc.) are the same for every row, and get the same
+        # treatment as the headers: anything that isn't a field on the model is dropped
+        if constants:
+            constants = {k: v for k, v in constants.items() if k in self.field_names}
+        return [self.map(row, constants) for row in rows]
+
+
+@lru_cache(maxsize=256)
+def _compile(headers, model, aliases, override_list, aux_list, isgame, converters):
+    log.debug(("Compiling row mapper for ", model.__name__))
+    return RowMapper(headers, model, aliases=aliases, override_list=override_list,
+                     aux_list=aux_list, isgame=isgame, converters=converters)
+
+
+def compile_row_mapper(headers, model, aliases=None, override_list=(), aux_list=(),
+                       isgame=False, converters=None):
+    # Mappers are cached, so calling this for every response from the same endpoint is cheap
+    return _compile(tuple(headers), model, tuple(sorted((aliases or {}).items())),
+                    tuple(override_list), tuple(aux_list), isgame,
+                    tuple(sorted((converters or {}).items())))
@@ -0,0 +1,129 @@
+import logging
+from collections import namedtuple
+from django.db import connections, models, transaction
+from nba_stats.constants import GAME_SCRUB_CHUNK_SIZE
+from nba_stats.models import Game, SeasonPartitionedModel
+from nba_stats.utils import determine_season_for_date
+log = logging.getLogger('stats')
+
+# One DELETE (or UPDATE ... SET NULL) in the cascade. pk_select is SQL selecting the pks of the
+# parent rows being deleted, with a single {root} slot for the games being scrubbed.
+# partitioned steps are for tables partitioned by season_year (see nba_stats/partitioning.py).
+ScrubStep = namedtuple('ScrubStep', ['label', 'table', 'column', 'pk_select', 'set_null',
+                                     'partitioned'])
+
+MAX_CASCADE_DEPTH = 5
+
+
+def _cascade_steps(model, pk_select, qn, depth=0):
+    # Works out, from the model metadata, everything Django's delete() would have cascaded
+    # to, deepest first. No rows are loaded to do it.
+    if depth > MAX_CASCADE_DEPTH:
+        raise ValueError("Cascade from {m} is too deep to scrub".format(m=model.__name__))
+    steps = []
+    opts = model._meta
+
+    for field in opts.many_to_many:
+        # Our own m2m rows go with us
+        through = field.remote_field.through
+        steps.append(ScrubStep(through.__name__, qn(through._meta.db_table),
+                               qn(field.m2m_column_name()), pk_select, False, False))
+
+    for rel in opts.related_objects:
+        related = rel.related_model
+        if rel.many_to_many:
+            # Somebody else's m2m to us, e.g. Lineup.players when scrubbing Players
+            through = rel.through
+            steps.append(ScrubStep(through.__name__, qn(through._meta.db_table),
+                                   qn(rel.field.m2m_reverse_name()), pk_select, False, False))
+            continue
+
+        column = qn(rel.field.column)
+        partitioned = issubclass(related, SeasonPartitionedModel)
+        on_delete = rel.on_delete
+        if on_delete == models.DO_NOTHING:
+            continue
+        if on_delete == models.SET_NULL:
+            steps.append(ScrubStep(related.__name__, qn(related._meta.db_table), column,
+                                   pk_select, True, partitioned))
+        elif on_delete == models.CASCADE:
+            child_select = "SELECT {pk} FROM {table} WHERE {column} IN ({parent})".format(
+                pk=qn(related._meta.pk.column), table=qn(related._meta.db_table),
+                column=column, parent=pk_select)
+            steps += _cascade_steps(related, child_select, qn, depth + 1)
+            steps.append(ScrubStep(related.__name__, qn(related._meta.db_table), column,
+                                   pk_select, False, partitioned))
+        else:
+            raise ValueError("Can't scrub {m}, {r} is {o}".format(m=model.__name__,
+                                                                 r=related.__name__,
+                                                                 o=on_delete.__name__))
+    return steps
+
+
+class GameScrubber:
+    # Deletes games and everything hanging off of them (box scores, play by play, line scores,
+    # game logs, shot charts...) with set based DELETE ... WHERE game_id IN (...) statements,
+    # a chunk of games per transaction. Unlike QuerySet.delete() no rows are pulled into
+    # memory first, and no delete signals are sent.
+
+    def __init__(self, games, chunk_size=GAME_SCRUB_CHUNK_SIZE, using="default"):
+        self.games = games
+        self.chunk_size = chunk_size
+        self.using = using
+        self.connection = connections[using]
+        qn = self.connection.ops.quote_name
+        opts = Game._meta
+        root_select = "SELECT {pk} FROM {table} WHERE {pk} IN {{root}}".format(
+            pk=qn(opts.pk.column), table=qn(opts.db_table))
+        self.steps = _cascade_steps(Game, root_select, qn)
+        self.steps.append(ScrubStep(Game.__name__, qn(opts.db_table), qn(opts.pk.column),
+                                    root_select, False, False))
+
+    def _step_sql(self, step, action, season_years=None):
+        where = "{column} IN ({pk_select})".format(column=step.column, pk_select=step.pk_select)
+        if step.partitioned and season_years:
+            # So Postgres only has to look in these seasons' partitions
+            where += " AND season_year IN ({years})".format(
+                years=", ".join(str(int(year)) for year in season_years))
+        if action == "count":
+            return "SELECT COUNT(*) FROM {table} WHERE {where}".format(table=step.table,
+                                                                        where=where)
+        if step.set_null:
+            return "UPDATE {table} SET {column} = NULL WHERE {where}".format(
+                table=step.table, column=step.column, where=where)
+        return "DELETE FROM {table} WHERE {where}".format(table=step.table, where=where)
+
+    def counts(self):
+        # Exact number of rows each step would touch, all from one aggregate query
+        games_sql, games_params = self.games.values('pk').query.sql_with_params()
+        root = "(" + games_sql + ")"
+        selects = []
+        params = []
+        for step in self.steps:
+            selects.append("(" + self._step_sql(step, "count").format(root=root) + ")")
+            params += list(games_params)
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT " + ", ".join(selects), params)
+            row = cursor.fetchone()
+        totals = {}
+        for step, count in zip(self.steps, row):
+            totals[step.label] = totals.get(step.label, 0) + count
+        return totals
+
+    def delete(self):
+        games = list(self.games.values_list('pk', 'game_date_est'))
+        totals = {}
+        for idx in range(0, len(games), self.chunk_size):
+            chunk = [pk for pk, game_date in games[idx:idx + self.chunk_size]]
+            game_dates = [game_date for pk, game_date in games[idx:idx + self.chunk_size]]
+            season_years = None
+            if None not in game_dates:
+                season_years = {determine_season_for_date(game_date) for game_date in game_dates}
+            root = "(" + ", ".join(["%s"] * len(chunk)) + ")"
+            with transaction.atomic(using=self.using), self.connection.cursor() as cursor:
+                for step in self.steps:
+                    sql = self._step_sql(step, "delete", season_years).format(root=root)
+                    cursor.execute(sql, chunk)
+                    totals[step.label] = totals.get(step.label, 0) + cursor.rowcount
+            log.debug(("Scrubbed ", idx + len(chunk), " of ", len(games), " games"))
+        return totals
@@ -1,23 +1,33 @@
 import logging
 from django.db import IntegrityError
 from django.db.models.signals import m2m_changed
-from nba_stats.models import Lineup
+from nba_stats.models import Lineup, Player, make_lineup_player_key
 from nba_stats.utils import make_unique_filter_dict
 log = logging.getLogger('stats')
 
 
 def lineup_players_changed(sender, **kwargs):
+    # Keeps Lineup.player_key in step with the players when they're changed one lineup at a
+    # time, and refuses to turn a lineup into a duplicate of another one.
+    # Lineups loaded through LineupHandler set the key themselves and never come through here.
     instance = kwargs.get('instance')
     if isinstance(instance, Lineup):
-        if kwargs.get('action') == 'pre_remove':
+        action = kwargs.get('action')
+        if action == 'pre_add':
+            cur_pids = list(instance.players.all().values_list('player_id', flat=True))
+            new_pids = list(Player.objects.filter(id__in=kwargs.get('pk_set') or set())
+                            .values_list('player_id', flat=True))
+            player_key = make_lineup_player_key(cur_pids + new_pids)
             filter_dict = make_unique_filter_dict(instance.__class__, instance=instance)
-            cur_pids = list(instance.players.all().values_list('id', flat=True).distinct())
-            new_pids = list(kwargs.get('pk_set', set()))
-            # TODO: Deal with cur_pids & new_pids having players in common
-            all_pids = cur_pids + new_pids
-            cur_lineups = instance.__class__.filter_on_players(all_pids, filter_dict)
+            filter_dict['player_key'] = player_key
+            cur_lineups = instance.__class__.objects.filter(**filter_dict).exclude(id=instance.id)
             if cur_lineups.exists():
                 raise IntegrityError("This lineup already exists!")
 
+        elif action in ['post_add', 'post_remove', 'post_clear']:
+            pids = instance.players.all().values_list('player_id', flat=True)
+            instance.player_key = make_lineup_player_key(pids)
+            instance.__class__.objects.filter(id=instance.id).update(player_key=instance.player_key)
+
 
 m2m_changed.connect(lineup_players_changed)
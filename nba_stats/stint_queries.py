@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+import numpy as np
+import pandas as pd
+from nba_stats.models import Stint
+from nba_stats.constants import STINT_CACHE_SECONDS
+log = logging.getLogger('stats')
+
+# Lineup and on/off numbers for any slice of a season (a date range, an opponent, home or
+# road, a team's last N games), added up from the stints built by nba_stats.stints rather
+# than fetched. A season's stints are small enough to hold in memory as one DataFrame, so
+# each season is read from the db once (then again every STINT_CACHE_SECONDS, or when
+# build_stints replaces some) and every query after that is a filter and a groupby.
+#
+#   lineup_stats(team, season, last_n_games=10)
+#   on_off_stats(team, season, start_date=date(2017, 1, 1), location="Road")
+
+PLAYER_COLUMNS = ['player_one', 'player_two', 'player_three', 'player_four', 'player_five']
+STAT_COLUMNS = ['seconds', 'pts_for', 'pts_against', 'poss_for', 'poss_against']
+
+_STINT_FIELDS = (['game_id', 'game__game_date_est', 'game__home_team_id', 'team_id',
+                  'opponent_id', 'start_seconds', 'end_seconds', 'player_key'] +
+                 [col + "_id" for col in PLAYER_COLUMNS] +
+                 ['pts_for', 'pts_against', 'poss_for', 'poss_against'])
+_FRAME_COLUMNS = (['game_id', 'game_date', 'home_team_id', 'team_id', 'opponent_id',
+                   'start_seconds', 'end_seconds', 'player_key'] + PLAYER_COLUMNS +
+                  ['pts_for', 'pts_against', 'poss_for', 'poss_against'])
+
+
+def _season_year(season):
+    # A LeagueSeason, or just its year
+    return getattr(season, 'year', season)
+
+
+def _pk(obj):
+    return getattr(obj, 'pk', obj)
+
+
+class StintCache:
+
+    def __init__(self, max_age=STINT_CACHE_SECONDS):
+        self.max_age = max_age
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _load(self, season_year):
+        rows = Stint.objects.for_season(season_year).values_list(*_STINT_FIELDS)
+        frame = pd.DataFrame.from_records(list(rows.iterator()), columns=_FRAME_COLUMNS)
+        frame['seconds'] = frame['end_seconds'] - frame['start_seconds']
+        frame['home'] = frame['team_id'] == frame['home_team_id']
+        log.debug(("Loaded ", len(frame), " stints for ", season_year))
+        return frame
+
+    def frame(self, season):
+        season_year = _season_year(season)
+        with self._lock:
+            loaded_at, frame = self._frames.get(season_year, (None, None))
+            if frame is None or time.time() - loaded_at > self.max_age:
+                frame = self._load(season_year)
+                self._frames[season_year] = (time.time(), frame)
+            return frame
+
+    def seed(self, season, frame):
+        # Stands in a frame for season's stints (with the columns _load gives it) until it ages out
+        with self._lock:
+            self._frames[_season_year(season)] = (time.time(), frame)
+
+    def invalidate(self, season_years=None):
+        with self._lock:
+            if season_years is None:
+                self._frames.clear()
+            for season_year in season_years or []:
+                self._frames.pop(season_year, None)
+
+
+_cache = StintCache()
+
+
+def get_stint_cache():
+    return _cache
+
+
+def filter_stints(team, season, start_date=None, end_date=None, opponent=None,
+                  location=None, last_n_games=None):
+    # team's stints for the season narrowed down by any combination of the filters.
+    # location is "Home" or "Road". last_n_games applies after everything else, e.g. the
+    # last 5 road games against a team.
+    frame = get_stint_cache().frame(season)
+    mask = frame['team_id'] == _pk(team)
+    if start_date is not None:
+        mask &= frame['game_date'] >= start_date
+    if end_date is not None:
+        mask &= frame['game_date'] <= end_date
+    if opponent is not None:
+        mask &= frame['opponent_id'] == _pk(opponent)
+    if location is not None:
+        mask &= frame['home'] == (location == "Home")
+    stints = frame[mask]
+    if last_n_games is not None:
+        games = (stints[['game_id', 'game_date']].drop_duplicates()
+                 .sort_values('game_date').tail(last_n_games))
+        stints = stints[stints['game_id'].isin(games['game_id'])]
+    return stints
+
+
+def add_ratings(totals):
+    # Points per 100 possessions each way, from summed up stints
+    totals['off_rating'] = (100 * totals['pts_for'] / totals['poss_for'].replace(0, np.nan)).round(1)
+    totals['def_rating'] = (100 * totals['pts_against'] /
+                            totals['poss_against'].replace(0, np.nan)).round(1)
+    totals['net_rating'] = (totals['off_rating'] - totals['def_rating']).round(1)
+    totals['minutes'] = (totals['seconds'] / 60).round(1)
+    return totals
+
+
+def lineup_stats(team, season, **filters):
+    # One row per five man unit (by player_key), most minutes first
+    stints = filter_stints(team, season, **filters)
+    grouped = stints.groupby('player_key')
+    lineups = grouped[STAT_COLUMNS].sum()
+    lineups[PLAYER_COLUMNS] = grouped[PLAYER_COLUMNS].first()
+    lineups['gp'] = grouped['game_id'].nunique()
+    return add_ratings(lineups.reset_index()).sort_values('seconds', ascending=False)
+
+
+def on_off_stats(team, season, **filters):
+    # One row per player who got on the court: the team's numbers with him on (on_*),
+    # without him (off_*) and on_net_rating - off_net_rating as on_off
+    stints = filter_stints(team, season, **filters)
+    team_totals = stints[STAT_COLUMNS].sum()
+    # A row per player per stint, so one groupby adds up every player's time on the court
+    on_court = stints.melt(id_vars=STAT_COLUMNS, value_vars=PLAYER_COLUMNS,
+                           value_name='player_id').dropna(subset=['player_id'])
+    on = on_court.groupby('player_id')[STAT_COLUMNS].sum()
+    off = on.rsub(team_totals, axis=1)
+    players = pd.concat([add_ratings(on).add_prefix("on_"), add_ratings(off).add_prefix("off_")],
+                        axis=1)
+    players['on_off'] = (players['on_net_rating'] - players['off_net_rating']).round(1)
+    players.index = players.index.astype(int)
+    return players.reset_index().sort_values('on_seconds', ascending=False)
@@ -0,0 +1,266 @@
+import logging
+import re
+from collections import namedtuple
+from itertools import groupby
+from django.db import transaction
+from nba_stats.bulk import bulk_load
+from nba_stats.stint_queries import get_stint_cache
+from nba_stats.utils import (period_start_seconds, period_length,
+                             convert_pctimestring_to_elapsed_seconds)
+from nba_stats.models import (Game, Player, PlayByPlayEvent, PlayerTraditionalBoxScore, Stint,
+                              make_lineup_player_key)
+from nba_stats.constants import (EVENT_FIELD_GOAL_MADE, EVENT_FIELD_GOAL_MISSED,
+                                 EVENT_FREE_THROW, EVENT_REBOUND, EVENT_TURNOVER,
+                                 EVENT_SUBSTITUTION, ON_COURT_EVENT_TYPES, HOME_PERSON_TYPES,
+                                 VISITOR_PERSON_TYPES, STINT_GAME_CHUNK_SIZE)
+log = logging.getLogger('stats')
+
+# Works out who was on the court from the play by play, one pass over each game's events.
+# Period 1 starts with the box score starters. Later periods start with whoever shows up in
+# the period before being subbed in (or gets subbed out first), topped up with anyone from
+# the end of the last period who went the whole period without doing anything.
+# Every substitution closes the current stint and opens a new one; points and possessions
+# are credited to whichever stint the event falls in.
+#
+# Possessions are counted where they end: made field goals, turnovers, defensive rebounds
+# and the last of a trip's made free throws.
+
+# Just the play by play columns the engine needs
+PbpRow = namedtuple('PbpRow', ['eventnum', 'eventmsgtype', 'period', 'pctimestring',
+                               'homedescription', 'visitordescription', 'person1type',
+                               'player1_id', 'player1_team_id', 'player2_id', 'player2_team_id',
+                               'player3_id', 'player3_team_id', 'elapsed_seconds'])
+
+HOME = 0
+VISITOR = 1
+
+FREE_THROW_NUMBER = re.compile(r"(\d) of (\d)")
+
+
+def _side(event, team_ids):
+    # HOME or VISITOR, whoever the event belongs to
+    if event.player1_team_id in team_ids:
+        return team_ids.index(event.player1_team_id)
+    if event.person1type in HOME_PERSON_TYPES:
+        return HOME
+    if event.person1type in VISITOR_PERSON_TYPES:
+        return VISITOR
+    if event.homedescription and not event.visitordescription:
+        return HOME
+    if event.visitordescription and not event.homedescription:
+        return VISITOR
+    return None
+
+
+def _description(event, side):
+    desc = event.homedescription if side == HOME else event.visitordescription
+    return (desc or event.homedescription or event.visitordescription or "").upper()
+
+
+def _free_throw(desc):
+    # (made, last of the trip, counts for possessions)
+    made = "MISS" not in desc
+    match = FREE_THROW_NUMBER.search(desc)
+    last = match is None or match.group(1) == match.group(2)
+    # Technicals don't change possession; an and one's free throw ends the possession its
+    # field goal already ended
+    counts = "TECHNICAL" not in desc and not (match and match.group(2) == "1")
+    return made, last, counts
+
+
+def _period_starters(period_events, team_id, side, team_ids, previous):
+    starters = []
+    subbed_in = set()
+    for event in period_events:
+        if event.eventmsgtype == EVENT_SUBSTITUTION:
+            if _side(event, team_ids) != side:
+                continue
+            out_id, in_id = event.player1_id, event.player2_id
+            if out_id and out_id not in subbed_in and out_id not in starters:
+                starters.append(out_id)
+            subbed_in.add(in_id)
+            continue
+        if event.eventmsgtype not in ON_COURT_EVENT_TYPES:
+            continue
+        for player_id, player_team_id in [(event.player1_id, event.player1_team_id),
+                                          (event.player2_id, event.player2_team_id),
+                                          (event.player3_id, event.player3_team_id)]:
+            if (player_id and player_team_id == team_id and player_id not in subbed_in and
+                    player_id not in starters):
+                starters.append(player_id)
+    for player_id in previous:
+        if len(starters) >= 5:
+            break
+        if player_id not in starters and player_id not in subbed_in:
+            starters.append(player_id)
+    return starters[:5]
+
+
+class _Segment:
+    # Both teams' lineups for a stretch, and what happened during it
+
+    def __init__(self, period, start, lineups):
+        self.period = period
+        self.start = start
+        self.end = start
+        self.lineups = [list(lineup) for lineup in lineups]
+        self.pts = [0, 0]
+        self.poss = [0, 0]
+
+    def is_empty(self):
+        return self.start == self.end and not any(self.pts) and not any(self.poss)
+
+
+def game_segments(team_ids, events, starters):
+    # team_ids is (home team pk, visitor team pk), events the game's PbpRows in order and
+    # starters {team pk: [player pks]} from the box score. Returns _Segments in order.
+    segments = []
+    lineups = [[], []]
+    for period, period_events in groupby(events, key=lambda event: event.period):
+        period_events = list(period_events)
+        for side, team_id in enumerate(team_ids):
+            if period == 1 and len(starters.get(team_id, [])) == 5:
+                lineups[side] = list(starters[team_id])
+            else:
+                lineups[side] = _period_starters(period_events, team_id, side, team_ids,
+                                                 lineups[side])
+        current = _Segment(period, period_start_seconds(period), lineups)
+        last_miss = None
+        for event in period_events:
+            seconds = event.elapsed_seconds
+            if seconds is None:
+                # Not backfilled yet
+                seconds = convert_pctimestring_to_elapsed_seconds(period, event.pctimestring)
+            side = _side(event, team_ids)
+            if side is None:
+                continue
+            event_type = event.eventmsgtype
+
+            if event_type == EVENT_SUBSTITUTION:
+                out_id, in_id = event.player1_id, event.player2_id
+                lineup = lineups[side]
+                if in_id in lineup:
+                    continue
+                if out_id in lineup:
+                    lineup[lineup.index(out_id)] = in_id
+                elif len(lineup) < 5:
+                    # We didn't know who was on the floor, but now we know one more of them
+                    lineup.append(in_id)
+                else:
+                    log.debug(("Substitution doesn't fit the lineup ", team_ids, event.eventnum))
+                    continue
+                current.end = seconds
+                if not current.is_empty():
+                    segments.append(current)
+                current = _Segment(period, seconds, lineups)
+                continue
+
+            desc = _description(event, side)
+            if event_type == EVENT_FIELD_GOAL_MADE:
+                current.pts[side] += 3 if "3PT" in desc else 2
+                current.poss[side] += 1
+            elif event_type == EVENT_FIELD_GOAL_MISSED:
+                last_miss = side
+            elif event_type == EVENT_FREE_THROW:
+                made, last, counts = _free_throw(desc)
+                if made:
+                    current.pts[side] += 1
+                    if last and counts:
+                        current.poss[side] += 1
+                elif last:
+                    last_miss = side
+            elif event_type == EVENT_REBOUND:
+                if last_miss is not None and side != last_miss:
+                    current.poss[last_miss] += 1
+                last_miss = None
+            elif event_type == EVENT_TURNOVER:
+                current.poss[side] += 1
+        current.end = period_start_seconds(period) + period_length(period)
+        if not current.is_empty():
+            segments.append(current)
+    return segments
+
+
+def game_stints(game, team_ids, events, starters, nba_ids):
+    # Unsaved Stints for a game, two per segment. nba_ids maps player pks to NBA player ids,
+    # which is what player_key is made of.
+    stints = []
+    for sequence, segment in enumerate(game_segments(team_ids, events, starters)):
+        for side, team_id in enumerate(team_ids):
+            other = 1 - side
+            player_ids = sorted(segment.lineups[side])
+            player_ids += [None] * (5 - len(player_ids))
+            stints.append(Stint(game=game, sequence=sequence, team_id=team_id,
+                                opponent_id=team_ids[other], period=segment.period,
+                                start_seconds=segment.start, end_seconds=segment.end,
+                                player_key=make_lineup_player_key(
+                                    nba_ids[pid] for pid in segment.lineups[side]),
+                                player_one_id=player_ids[0], player_two_id=player_ids[1],
+                                player_three_id=player_ids[2], player_four_id=player_ids[3],
+                                player_five_id=player_ids[4],
+                                pts_for=segment.pts[side], pts_against=segment.pts[other],
+                                poss_for=segment.poss[side], poss_against=segment.poss[other],
+                                create_user="build_stints"))
+    return stints
+
+
+class _DefaultToSelf(dict):
+    def __missing__(self, key):
+        return key
+
+
+def _build_chunk(games):
+    events_by_game = {}
+    rows = (PlayByPlayEvent.objects.for_games(games)
+            .order_by('game_id', 'period', 'eventnum')
+            .values_list('game_id', *PbpRow._fields))
+    for game_id, game_rows in groupby(rows.iterator(), key=lambda row: row[0]):
+        events_by_game[game_id] = [PbpRow(*row[1:]) for row in game_rows]
+
+    starters_by_game = {}
+    starter_rows = (PlayerTraditionalBoxScore.objects.for_games(games)
+                    .exclude(start_position="").exclude(start_position=None)
+                    .values_list('game_id', 'team_id', 'player_id'))
+    player_pks = set()
+    for game_id, team_id, player_id in starter_rows:
+        starters_by_game.setdefault(game_id, {}).setdefault(team_id, []).append(player_id)
+        player_pks.add(player_id)
+    for events in events_by_game.values():
+        for event in events:
+            player_pks.update([event.player1_id, event.player2_id, event.player3_id])
+    player_pks.discard(None)
+    # The play by play's player foreign keys aren't enforced, anybody we don't have a Player
+    # for keeps his pk in the player key
+    nba_ids = _DefaultToSelf(Player.objects.filter(id__in=player_pks)
+                             .values_list('id', 'player_id'))
+
+    stints = []
+    for game in games:
+        events = events_by_game.get(game.pk)
+        if not events or game.home_team_id is None or game.visitor_team_id is None:
+            continue
+        stints += game_stints(game, (game.home_team_id, game.visitor_team_id), events,
+                              starters_by_game.get(game.pk, {}), nba_ids)
+    with transaction.atomic():
+        Stint.objects.for_games(games).delete()
+        bulk_load(Stint, stints)
+    get_stint_cache().invalidate({stint.season_year for stint in stints})
+    return len(stints)
+
+
+def build_stints(games, chunk_size=STINT_GAME_CHUNK_SIZE):
+    # (Re)builds the stints for games, a list or QuerySet of Games. Returns how many were made.
+    games = list(games)
+    total = 0
+    for idx in range(0, len(games), chunk_size):
+        total += _build_chunk(games[idx:idx + chunk_size])
+        log.debug(("Built stints for ", min(idx + chunk_size, len(games)), " of ", len(games),
+                   " games"))
+    return total
+
+
+def build_stints_for_dates(season, dates):
+    # Stints for every game of the season on any of dates, e.g. all of the dates a
+    # GameIngestionPipeline run just loaded
+    games = Game.objects.filter(season=season, game_date_est__in=list(dates))
+    return build_stints(games.order_by('game_date_est', 'game_sequence'))
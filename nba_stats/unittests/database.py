@@ -0,0 +1,22 @@
+from unittest import SkipTest
+from django.db import connections
+
+
+def using_test_database(using="default"):
+    # Django's test runner (manage.py test) points each connection at a database built from
+    # the migrations just for the run: TEST NAME if it's set, test_<NAME> otherwise
+    settings_dict = connections[using].settings_dict
+    test_name = settings_dict.get('TEST', {}).get('NAME')
+    return settings_dict['NAME'] == test_name or settings_dict['NAME'].startswith("test_")
+
+
+class TestDatabaseOnly:
+    # Mixin for django.test test cases. Run any other way (e.g. nose2 after django.setup())
+    # they'd read from and write to whatever database settings points at, so they skip
+    # themselves instead, before Django gets a chance to touch it.
+
+    @classmethod
+    def setUpClass(cls):
+        if not using_test_database():
+            raise SkipTest("Needs the test database, run with manage.py test")
+        super().setUpClass()
@@ -0,0 +1,30 @@
+import django
+django.setup()
+from datetime import date, timedelta
+import pandas as pd
+from nba_stats.aggregated_splits import SUM_FIELDS, all_star_break, clean_box_score_frame, _aggregate
+from nba_stats.constants import PER_GAME
+from nba_stats.derived_splits import derive_frame
+
+
+def test_team_split_minutes():
+    # A regulation game and an overtime one, as the team box scores store them
+    rows = pd.DataFrame({'game_id': [1, 2], 'team_id': [10, 10]})
+    for field in SUM_FIELDS:
+        rows[field] = [100, 110]
+    rows['min'] = [240.0, 265.0]
+    frame = clean_box_score_frame(rows, "Team")
+    assert frame['min'].tolist() == [48.0, 53.0]
+    frame['win'] = [True, False]
+    splits = _aggregate(frame, "Team", "Overall", pd.Series("2016-17", index=frame.index))
+    assert splits['min'].tolist() == [101.0]
+    assert splits['gp'].tolist() == [2]
+    assert derive_frame(splits, PER_GAME, {'pts': 1})['min'].tolist() == [50.5]
+
+
+def test_all_star_break():
+    dates = [date(2017, 2, 1) + timedelta(days=d) for d in range(16)]
+    dates += [date(2017, 2, 23) + timedelta(days=d) for d in range(5)]
+    games = pd.DataFrame({'game_date': dates + [date(2017, 1, 10), date(2017, 3, 1)]})
+    assert all_star_break(games) == date(2017, 2, 16)
+    assert all_star_break(pd.DataFrame({'game_date': [date(2017, 1, 10)]})) is None
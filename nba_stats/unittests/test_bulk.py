@@ -0,0 +1,59 @@
+import django
+django.setup()
+from datetime import timedelta
+from nba_stats.bulk import _copy_value, _CopyStream, _group_upsert_rows
+from nba_stats.models import TeamSeason
+
+
+def test_copy_value_escapes():
+    assert _copy_value(None) == "\\N"
+    assert _copy_value(True) == "t"
+    assert _copy_value(False) == "f"
+    assert _copy_value(0) == "0"
+    assert _copy_value(timedelta(hours=2, minutes=30)) == "9000.0 seconds"
+    assert _copy_value("a\tb") == "a\\tb"
+    assert _copy_value("a\nb\r") == "a\\nb\\r"
+    assert _copy_value("C:\\temp") == "C:\\\\temp"
+    # The backslash is escaped before the ones the other escapes add
+    assert _copy_value("\\\t") == "\\\\\\t"
+
+
+def test_copy_stream_read_sizes():
+    lines = ["1\tfoo\n", "2\tbar\n", "3\tbaz\n"]
+    expected = "".join(lines)
+    for size in [1, 2, 5, 6, 7, 100, -1]:
+        stream = _CopyStream(lines)
+        chunks = []
+        while True:
+            chunk = stream.read(size)
+            if not chunk:
+                break
+            assert size < 0 or len(chunk) <= size
+            chunks.append(chunk)
+        assert "".join(chunks) == expected
+
+
+def _team_season_row(team, w, season=1):
+    return {'season': season, 'season_type': "Regular Season", 'team': team,
+            'per_mode': "Totals", 'w': w}
+
+
+def test_group_upsert_rows_last_row_wins():
+    rows = [_team_season_row(1, 10), _team_season_row(2, 20), _team_season_row(1, 11)]
+    groups, fallback_rows = _group_upsert_rows(TeamSeason, rows, 'postgresql')
+    assert fallback_rows == []
+    assert len(groups) == 1
+    grouped = list(groups.values())[0]
+    assert sorted(data['w'] for data in grouped.values()) == [11, 20]
+
+
+def test_group_upsert_rows_fallbacks():
+    # Nulls never conflict, so rows with one in their key can't go through ON CONFLICT
+    rows = [_team_season_row(1, 10), _team_season_row(1, 12, season=None)]
+    groups, fallback_rows = _group_upsert_rows(TeamSeason, rows, 'postgresql')
+    assert [data['w'] for data in fallback_rows] == [12]
+    assert sum(len(group) for group in groups.values()) == 1
+    # And everything does anywhere but Postgres
+    groups, fallback_rows = _group_upsert_rows(TeamSeason, rows, 'sqlite')
+    assert groups == {}
+    assert fallback_rows == rows
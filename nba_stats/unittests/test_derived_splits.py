@@ -0,0 +1,15 @@
+import django
+django.setup()
+import pandas as pd
+from nba_stats.constants import PER_GAME, PER_36
+from nba_stats.derived_splits import derive_frame
+
+
+def test_derive_frame():
+    totals = pd.DataFrame({'gp': [4, 0], 'min': [144.0, 0], 'pts': [100, 0],
+                           'fg_pct': [0.5, 0]})
+    per_game = derive_frame(totals, PER_GAME, {'pts': 1})
+    assert per_game['pts'].tolist() == [25.0, 0]
+    assert per_game['min'].tolist() == [36.0, 0]
+    assert per_game['fg_pct'].tolist() == [0.5, 0]
+    assert derive_frame(totals, PER_36, {'pts': 1})['pts'].tolist() == [25.0, 0]
@@ -0,0 +1,65 @@
+from nba_stats.fetch_client import FetchClient
+from nba_stats.rate_limiter import RateLimiter
+
+
+def test_session_reused_per_host():
+    client = FetchClient()
+    first = client.session_for("http://stats.nba.com/stats/scoreboardV2")
+    second = client.session_for("http://stats.nba.com/stats/playbyplayv2")
+    other = client.session_for("http://www.basketball-reference.com/players/j/")
+    assert first is second
+    assert first is not other
+
+
+def test_timeout_for_host():
+    client = FetchClient(default_timeout=(1, 2), host_timeouts={'example.com': (3, 4)})
+    assert client.timeout_for("http://example.com/foo") == (3, 4)
+    assert client.timeout_for("http://unknown.org/foo") == (1, 2)
+    assert client.timeout_for("http://stats.nba.com/stats/") == (5, 60)
+
+
+def test_session_negotiates_compression():
+    client = FetchClient()
+    session = client.session_for("http://stats.nba.com/stats/")
+    assert "gzip" in session.headers['Accept-Encoding']
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, status_codes):
+        self.responses = [FakeResponse(code) for code in status_codes]
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        response = self.responses[self.calls]
+        self.calls += 1
+        return response
+
+
+def test_throttled_responses_are_closed():
+    now = [100.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(clock=lambda: now[0], sleep=sleep)
+    client = FetchClient(rate_limiter=limiter)
+    session = FakeSession([429, 200])
+    client._sessions["stats.nba.com"] = session
+    response = client.get("http://stats.nba.com/stats/scoreboardV2")
+    assert response.status_code == 200
+    assert session.responses[0].closed
+    assert not response.closed
+    # Held off before the retry, even without a Retry-After
+    assert sleeps
@@ -0,0 +1,14 @@
+import django
+django.setup()
+from datetime import date
+from nba_stats.fingerprints import content_hash, player_list_hash
+
+
+def test_content_hash():
+    assert content_hash({'a': 1, 'b': date(2017, 1, 30)}) == content_hash({'b': date(2017, 1, 30),
+                                                                          'a': 1})
+    assert content_hash({'a': 1}) != content_hash({'a': 2})
+    row = {'PERSON_ID': 201939, 'ROSTERSTATUS': 1, 'TEAM_ID': 1610612744, 'GAMES_PLAYED_FLAG': "Y"}
+    moved = dict(row, TEAM_ID=1610612747)
+    assert player_list_hash(row) == player_list_hash(dict(row, GAMES_PLAYED_FLAG="N"))
+    assert player_list_hash(row) != player_list_hash(moved)
@@ -0,0 +1,27 @@
+import django
+django.setup()
+from nba_stats.models import PlayerShotChartDetail
+from nba_stats.frames import (result_set_to_frame, frame_for_model, iter_frame_rows,
+                              min_sec_to_float)
+from nba_stats.utils import (dictify, convert_dict_keys_to_lowercase,
+                             auto_strip_and_convert_fields)
+
+
+def test_frame_path_matches_dict_path():
+    headers = ["GRID_TYPE", "GAME_ID", "GAME_EVENT_ID", "PLAYER_ID", "PLAYER_NAME", "PERIOD",
+               "SHOT_DISTANCE", "SHOT_MADE_FLAG", "GAME_DATE"]
+    rows = [["Shot Chart Detail", "0021600001", 7, 201939, "Stephen Curry", 1, 26, 1, "20161025"],
+            ["Shot Chart Detail", "0021600001", 12, 201939, "Stephen Curry", 1, 2, 0, "20161025"]]
+    rset = {'headers': headers, 'rowSet': rows}
+
+    expected = [auto_strip_and_convert_fields(PlayerShotChartDetail,
+                                              convert_dict_keys_to_lowercase(row),
+                                              make_instance=False)
+                for row in dictify(rset)]
+    frame = frame_for_model(result_set_to_frame(rset), PlayerShotChartDetail)
+    result = list(iter_frame_rows(frame))
+    assert result == expected
+    assert all(type(row['shot_distance']) is int for row in result)
+
+    mins = result_set_to_frame({'headers': ["MIN"], 'rowSet': [["24:36"], [None], [12]]})
+    assert min_sec_to_float(mins['MIN']).tolist() == [24.6, 0, 12]
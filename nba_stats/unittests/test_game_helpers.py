@@ -0,0 +1,9 @@
+import django
+django.setup()
+from nba_stats.helpers.game import play_by_play_numbers
+
+
+def test_play_by_play_numbers():
+    rows = [(1, "12:00", None, None), (1, "11:40", "0 - 2", "2"), (1, "11:20", None, None),
+            (2, "12:00", "3 - 2", "-1")]
+    assert list(play_by_play_numbers(rows)) == [(0, 0, 0), (20, 2, 0), (40, 2, 0), (720, 2, 3)]
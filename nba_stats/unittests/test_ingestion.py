@@ -0,0 +1,69 @@
+import django
+django.setup()
+from datetime import date
+from django.test import TransactionTestCase
+from nba_stats.constants import EVENT_FIELD_GOAL_MADE
+from nba_stats.helpers.game import set_play_by_play_numbers
+from nba_stats.ingestion import GameDateBatch, GameIngestionPipeline
+from nba_stats.models import Game, LeagueSeason, PlayByPlayEvent, Player, Stint, Team
+from nba_stats.stints import build_stints_for_dates
+from nba_stats.unittests.database import TestDatabaseOnly
+
+SEASON_YEAR = 1949
+DATES = [date(1950, 1, 10), date(1950, 1, 11)]
+TEST_ID = 1999900001
+
+
+class CannedPipeline(GameIngestionPipeline):
+    # One game a date, with a basket each way, in place of the NBA's responses
+
+    def __init__(self, season, teams, players):
+        super().__init__(season)
+        self.teams = teams
+        self.players = players
+
+    def fetch(self, game_date):
+        return GameDateBatch(game_date)
+
+    def parse(self, batch):
+        home, visitor = self.teams
+        game = Game(game_id=TEST_ID + DATES.index(batch.game_date), game_date_est=batch.game_date,
+                    game_sequence=1, game_status_id=3, game_status_text="Final", gamecode="TEST",
+                    home_team=home, visitor_team=visitor, season=self.season, live_period=4,
+                    create_user="test")
+        batch.games = [game]
+        for eventnum, (team, player, person_type) in enumerate(zip(self.teams, self.players,
+                                                                   [4, 5])):
+            batch.pbp_events.append(PlayByPlayEvent(game=game, eventnum=eventnum,
+                                                    eventmsgtype=EVENT_FIELD_GOAL_MADE, period=1,
+                                                    pctimestring="11:00",
+                                                    homedescription="Jump Shot",
+                                                    person1type=person_type, player1=player,
+                                                    player1_team=team, create_user="test"))
+        set_play_by_play_numbers(batch.pbp_events)
+        return batch
+
+
+class IngestionStintsTest(TestDatabaseOnly, TransactionTestCase):
+    # Not a TestCase: the pipeline writes on its own threads' connections, which wouldn't see
+    # rows inside the test's transaction. The tables get flushed after each test instead.
+
+    def setUp(self):
+        self.season = LeagueSeason.objects.create(
+            year=SEASON_YEAR, pre_season_start_date=date(1949, 10, 1),
+            regular_season_start_date=date(1949, 10, 15), playoffs_start_date=date(1950, 3, 20),
+            create_user="test")
+        self.teams = [Team.objects.create(team_id=TEST_ID + idx, city="Test", name=str(idx),
+                                          abbreviation="TST", create_user="test")
+                      for idx in range(2)]
+        self.players = [Player.objects.create(player_id=TEST_ID + idx, display_first_last=str(idx),
+                                              create_user="test") for idx in range(2)]
+
+    def test_stints_for_every_ingested_date(self):
+        games = CannedPipeline(self.season, self.teams, self.players).run(DATES)
+        # Every date's games come back, not just the last one's
+        self.assertEqual([game.game_date_est for game in games], DATES)
+        self.assertEqual(build_stints_for_dates(self.season, DATES), 4)
+        stint_dates = set(Stint.objects.for_season(SEASON_YEAR)
+                          .values_list('game__game_date_est', flat=True))
+        self.assertEqual(stint_dates, set(DATES))
@@ -0,0 +1,40 @@
+import io
+import json
+from nba_stats.json_stream import iter_result_sets
+
+RESPONSE = {'resource': "leaguegamelog",
+            'parameters': {'Season': "2016-17", 'SeasonType': "Regular Season"},
+            'resultSets': [{'name': "LeagueGameLog",
+                            'headers': ["GAME_ID", "PLAYER_ID", "MIN", "FG_PCT"],
+                            'rowSet': [["0021600001", 201939, 37, 0.5],
+                                       ["0021600001", 2544, 35, None]]},
+                           {'name': "Other", 'headers': ["FOO"], 'rowSet': [[1], [2]]}]}
+
+
+def stream(response):
+    return io.BytesIO(json.dumps(response).encode("utf-8"))
+
+
+def test_streamed_result_sets_match_decoded_json():
+    result_sets = [dict(rset, rowSet=list(rset['rowSet']))
+                   for rset in iter_result_sets(stream(RESPONSE))]
+    assert result_sets == RESPONSE['resultSets']
+
+
+def test_rows_are_a_generator():
+    result_set = next(iter_result_sets(stream(RESPONSE)))
+    assert result_set['headers'] == ["GAME_ID", "PLAYER_ID", "MIN", "FG_PCT"]
+    assert not isinstance(result_set['rowSet'], list)
+    assert next(result_set['rowSet']) == ["0021600001", 201939, 37, 0.5]
+
+
+def test_unread_rows_are_skipped():
+    names = [(rset['name'], next(rset['rowSet'])) for rset in iter_result_sets(stream(RESPONSE))]
+    assert names == [("LeagueGameLog", ["0021600001", 201939, 37, 0.5]), ("Other", [1])]
+
+
+def test_single_result_set_and_null_rows():
+    response = {'resultSet': {'name': "Only", 'headers': ["FOO"], 'rowSet': None}}
+    result_sets = list(iter_result_sets(stream(response)))
+    assert len(result_sets) == 1
+    assert list(result_sets[0]['rowSet']) == []
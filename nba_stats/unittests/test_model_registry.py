@@ -0,0 +1,18 @@
+import django
+django.setup()
+from nba_stats.models import PlayerTraditionalSplit, TeamHustleStatsBoxScore, BaseLineup
+from nba_stats.model_registry import get_model_registry
+from nba_stats.utils import get_model
+
+
+def test_model_registry_lookup():
+    registry = get_model_registry()
+    assert registry.lookup("Player", "Base", "Split").model is PlayerTraditionalSplit
+    assert registry.lookup("Team", "Hustle", "BoxScore").model is TeamHustleStatsBoxScore
+    assert registry.lookup("", "Base", "Lineup").model is BaseLineup
+    assert get_model(prefix="Team", middle="Hustle Stats", suffix="BoxScore") is TeamHustleStatsBoxScore
+
+    data = {'minutes': "24:36", 'not_a_field': 1}
+    final_data = registry.convert(TeamHustleStatsBoxScore,
+                                  registry.strip(TeamHustleStatsBoxScore, data))
+    assert final_data == {'minutes': 24.6}
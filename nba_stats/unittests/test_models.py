@@ -0,0 +1,10 @@
+import django
+django.setup()
+from nba_stats.models import make_lineup_player_key
+
+
+def test_make_lineup_player_key():
+    key = make_lineup_player_key([201939, 2738, 101106])
+    assert key == make_lineup_player_key(["101106", "201939", "2738"])
+    assert key != make_lineup_player_key([201939, 2738])
+    assert len(key) == 40
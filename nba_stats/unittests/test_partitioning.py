@@ -0,0 +1,16 @@
+import django
+django.setup()
+from nba_stats.models import Game, PlayByPlayEvent, PlayerTraditionalBoxScore, Stint
+from nba_stats.partitioning import partition_name, partitioned_models
+
+
+def test_partitioned_models():
+    models = partitioned_models()
+    for model in [PlayByPlayEvent, PlayerTraditionalBoxScore, Stint]:
+        assert model in models
+    assert Game not in models
+
+
+def test_partition_name():
+    assert partition_name("play_by_play_event", 2016) == "play_by_play_event_2016"
+    assert partition_name("stint", "default") == "stint_default"
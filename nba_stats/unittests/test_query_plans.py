@@ -0,0 +1,20 @@
+import django
+django.setup()
+from django.test import TestCase
+from nba_stats.query_plans import HOT_QUERIES, check_hot_queries
+from nba_stats.unittests.database import TestDatabaseOnly
+
+
+def test_hot_queries_build():
+    # Building a queryset doesn't touch the db, so this just catches queries gone stale
+    for hot_query in HOT_QUERIES:
+        assert str(hot_query.build().query)
+        assert hot_query.index()
+
+
+class HotQueryPlanTest(TestDatabaseOnly, TestCase):
+    # EXPLAINs against the migrated test database, so partitioned tables, their indexes and
+    # all are the real thing
+
+    def test_hot_queries_use_their_indexes(self):
+        self.assertEqual(check_hot_queries(), {})
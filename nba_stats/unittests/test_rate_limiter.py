@@ -0,0 +1,78 @@
+from nba_stats.rate_limiter import HostRateLimiter, RateLimiter, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def make_limiter(rate=2.0, burst=2):
+    clock = FakeClock()
+    limiter = HostRateLimiter("stats.nba.com", rate, 0.25, 10.0, burst=burst,
+                              clock=clock, sleep=clock.sleep)
+    return limiter, clock
+
+
+def test_bucket_spaces_requests_after_burst():
+    limiter, clock = make_limiter(rate=2.0, burst=2)
+    for _ in range(2):
+        limiter.acquire()
+    assert clock.now == 100.0
+    limiter.acquire()
+    assert abs(clock.now - 100.5) < 1e-9
+    assert limiter.metrics()['queue_depth'] == 0
+
+
+def test_throttle_cuts_rate_and_honours_retry_after():
+    limiter, clock = make_limiter(rate=4.0)
+    limiter.record_response(429, 0.1, retry_after=30)
+    assert limiter.rate == 2.0
+    limiter.acquire()
+    assert clock.now >= 130.0
+
+
+def test_throttle_without_retry_after_backs_off():
+    limiter, clock = make_limiter(rate=4.0, burst=4)
+    limiter.record_response(503, 0.1)
+    limiter.acquire()
+    assert clock.now >= 102.0
+    # A second one in a row waits twice as long
+    limiter.record_response(429, 0.1)
+    limiter.acquire()
+    assert clock.now >= 106.0
+
+
+def test_rate_recovers_while_latency_is_healthy():
+    limiter, clock = make_limiter(rate=1.0)
+    for _ in range(20):
+        limiter.record_response(200, 0.2)
+    assert limiter.rate > 1.0
+
+
+def test_latency_spike_backs_off():
+    limiter, clock = make_limiter(rate=4.0)
+    for _ in range(5):
+        limiter.record_response(200, 0.1)
+    before = limiter.rate
+    for _ in range(5):
+        limiter.record_response(200, 2.0)
+    assert limiter.rate < before
+
+
+def test_limiter_per_host():
+    limiter = RateLimiter(host_rates={'example.com': (1.0, 0.5, 2.0)})
+    assert limiter.for_url("http://example.com/a") is limiter.for_url("http://example.com/b")
+    assert limiter.for_url("http://example.com/a").rate == 1.0
+    assert limiter.for_url("http://stats.nba.com/stats/").rate == 4.0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
@@ -0,0 +1,78 @@
+import hashlib
+import os
+import tempfile
+from nba_stats.response_cache import (ResponseCache, CachePolicy, make_cache_key, FOREVER)
+
+
+class FixedPolicy(CachePolicy):
+    def __init__(self, ttl):
+        super().__init__()
+        self.ttl = ttl
+
+    def ttl_for(self, url, params=None):
+        return self.ttl
+
+
+def make_cache(ttl=FOREVER, max_bytes=10 * 1024 ** 2, touch_seconds=0):
+    path = os.path.join(tempfile.mkdtemp(), "cache.sqlite3")
+    return ResponseCache(path=path, max_bytes=max_bytes, policy=FixedPolicy(ttl),
+                         touch_seconds=touch_seconds)
+
+
+def test_cache_key_ignores_param_order_and_placement():
+    key_one = make_cache_key("http://stats.nba.com/stats/boxscoremiscv2?GameID=0021600001",
+                             {'StartPeriod': 1, 'EndPeriod': 10})
+    key_two = make_cache_key("HTTP://Stats.NBA.com/stats/boxscoremiscv2/",
+                             {'EndPeriod': 10, 'GameID': "0021600001", 'StartPeriod': 1})
+    assert key_one == key_two
+
+
+def test_cache_key_differs_on_params():
+    key_one = make_cache_key("http://stats.nba.com/stats/foo", {'Season': "2016-17"})
+    key_two = make_cache_key("http://stats.nba.com/stats/foo", {'Season': "2015-16"})
+    assert key_one != key_two
+
+
+def test_round_trip():
+    cache = make_cache()
+    data = {'resultSets': [{'headers': ["A"], 'rowSet': [[1], [2]]}]}
+    assert cache.get("http://stats.nba.com/stats/foo", {'Season': "2015-16"}) is None
+    cache.set("http://stats.nba.com/stats/foo", {'Season': "2015-16"}, data)
+    assert cache.get("http://stats.nba.com/stats/foo", {'Season': "2015-16"}) == data
+
+
+def test_expired_entries_are_misses():
+    cache = make_cache(ttl=-1)
+    cache.set("http://stats.nba.com/stats/foo", {}, {'a': 1})
+    assert cache.get("http://stats.nba.com/stats/foo", {}) is None
+
+
+def test_zero_ttl_is_not_stored():
+    cache = make_cache(ttl=0)
+    cache.set("http://stats.nba.com/stats/foo", {}, {'a': 1})
+    assert cache.get("http://stats.nba.com/stats/foo", {}) is None
+
+
+def test_lru_eviction():
+    cache = make_cache(max_bytes=4000)
+    for idx in range(20):
+        # Hashes so the payloads don't compress down to nothing
+        payload = {'rows': [hashlib.sha256((str(idx) + str(x)).encode()).hexdigest()
+                            for x in range(20)]}
+        cache.set("http://stats.nba.com/stats/foo", {'idx': idx}, payload)
+    assert cache._total_bytes <= 4000
+    assert cache.get("http://stats.nba.com/stats/foo", {'idx': 19}) is not None
+    assert cache.get("http://stats.nba.com/stats/foo", {'idx': 0}) is None
+
+
+def test_recent_hits_dont_write():
+    cache = make_cache(touch_seconds=60)
+    cache.set("http://stats.nba.com/stats/foo", {}, {'a': 1})
+    conn = cache._connection()
+    conn.execute("UPDATE response SET last_access = 0")
+    conn.commit()
+    assert cache.get("http://stats.nba.com/stats/foo", {}) == {'a': 1}
+    touched = conn.execute("SELECT last_access FROM response").fetchone()[0]
+    assert touched > 0
+    assert cache.get("http://stats.nba.com/stats/foo", {}) == {'a': 1}
+    assert conn.execute("SELECT last_access FROM response").fetchone()[0] == touched
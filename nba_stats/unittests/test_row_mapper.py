@@ -0,0 +1,22 @@
+import django
+django.setup()
+from nba_stats.models import PlayerTraditionalSplit
+from nba_stats.row_mapper import compile_row_mapper
+from nba_stats.utils import (dictify, convert_dict_keys_to_lowercase,
+                             auto_strip_and_convert_fields)
+
+
+def test_row_mapper_matches_dict_path():
+    headers = ["PLAYER_ID", "PLAYER_NAME", "AGE", "GP", "PTS", "PTS_RANK", "GROUP_SET"]
+    row = [201939, "Stephen Curry", 28, 79, 1999, 4, "Overall"]
+    rset = {'headers': headers, 'rowSet': [row]}
+    constants = {'per_mode': "Totals", 'not_a_field': 1}
+
+    expected = convert_dict_keys_to_lowercase(dictify(rset)[0], override_list=['GROUP_SET'])
+    expected.update(constants)
+    expected = auto_strip_and_convert_fields(PlayerTraditionalSplit, expected, make_instance=False)
+
+    mapper = compile_row_mapper(headers, PlayerTraditionalSplit, override_list=['GROUP_SET'])
+    assert mapper.map_rows([row], constants) == [expected]
+    assert compile_row_mapper(headers, PlayerTraditionalSplit,
+                              override_list=['GROUP_SET']) is mapper
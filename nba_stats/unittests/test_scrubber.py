@@ -0,0 +1,43 @@
+import django
+django.setup()
+from nba_stats.models import Game, PlayByPlayEvent, Stint, LineScore
+from nba_stats.scrubber import GameScrubber, ScrubStep, _cascade_steps
+
+
+def qn(name):
+    return '"' + name + '"'
+
+
+def test_cascade_steps_for_game():
+    steps = _cascade_steps(Game, "SELECT id FROM game WHERE id IN {root}", qn)
+    labels = [step.label for step in steps]
+    for model in [PlayByPlayEvent, Stint, LineScore]:
+        assert model.__name__ in labels
+    # Nothing hanging off of a game is kept around with its game_id nulled out
+    assert not any(step.set_null for step in steps)
+    partitioned = {step.label for step in steps if step.partitioned}
+    assert {"PlayByPlayEvent", "Stint", "PlayerTraditionalBoxScore"} <= partitioned
+    assert "LineScore" not in partitioned
+
+
+def test_game_goes_last():
+    scrubber = GameScrubber(Game.objects.none())
+    assert scrubber.steps[-1].label == "Game"
+    assert scrubber.steps[-1].table == scrubber.connection.ops.quote_name("game")
+
+
+def test_step_sql():
+    scrubber = GameScrubber(Game.objects.none())
+    step = ScrubStep("PlayByPlayEvent", '"play_by_play_event"', '"game_id"',
+                     "SELECT id FROM game WHERE id IN {root}", False, True)
+    sql = scrubber._step_sql(step, "delete", {2016, 2017})
+    assert sql.startswith('DELETE FROM "play_by_play_event" WHERE "game_id" IN (SELECT')
+    # Lets Postgres skip every other season's partition
+    assert sql.endswith(" AND season_year IN (2016, 2017)") or \
+        sql.endswith(" AND season_year IN (2017, 2016)")
+    assert "season_year" not in scrubber._step_sql(step, "delete")
+    assert "season_year" not in scrubber._step_sql(step._replace(partitioned=False), "delete",
+                                                   {2016})
+    nulled = scrubber._step_sql(step._replace(set_null=True), "delete", {2016})
+    assert nulled.startswith('UPDATE "play_by_play_event" SET "game_id" = NULL WHERE')
+    assert scrubber._step_sql(step, "count").startswith("SELECT COUNT(*) FROM")
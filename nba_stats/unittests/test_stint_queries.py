@@ -0,0 +1,22 @@
+import django
+django.setup()
+from datetime import date
+import pandas as pd
+from nba_stats.stint_queries import get_stint_cache, on_off_stats, lineup_stats
+
+
+def test_on_off_stats():
+    frame = pd.DataFrame({'game_id': [1, 1, 2], 'game_date': [date(2017, 1, 1)] * 2 + [date(2017, 1, 3)],
+                          'team_id': [5, 5, 5], 'opponent_id': [6, 6, 7], 'home': [True, True, False],
+                          'player_key': ["a", "b", "a"], 'seconds': [600, 120, 600],
+                          'player_one': [1, 2, 1], 'player_two': [3, 3, 3], 'player_three': [4, 4, 4],
+                          'player_four': [8, 8, 8], 'player_five': [9, 9, 9],
+                          'pts_for': [20, 4, 10], 'pts_against': [10, 6, 12],
+                          'poss_for': [20, 4, 10], 'poss_against': [20, 4, 10]})
+    get_stint_cache().seed(1900, frame)
+    players = on_off_stats(5, 1900).set_index('player_id')
+    assert players.loc[1, 'on_net_rating'] == 26.7
+    assert players.loc[2, 'on_net_rating'] == -50.0
+    assert players.loc[2, 'off_net_rating'] == 26.7
+    assert len(lineup_stats(5, 1900, last_n_games=1)) == 1
+    assert len(lineup_stats(5, 1900, opponent=6, location="Home")) == 2
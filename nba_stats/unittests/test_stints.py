@@ -0,0 +1,18 @@
+import django
+django.setup()
+from nba_stats.stints import PbpRow, game_segments
+
+
+def test_game_segments():
+    def event(num, msgtype, clock, home="", visitor="", p1=None, t1=None, p2=None, t2=None):
+        return PbpRow(num, msgtype, 1, clock, home, visitor, None, p1, t1, p2, t2, None, None, None)
+    starters = {1: [10, 11, 12, 13, 14], 2: [20, 21, 22, 23, 24]}
+    events = [event(1, 1, "11:40", home="Jump Shot (2 PTS)", p1=10, t1=1),
+              event(2, 2, "11:20", visitor="MISS 3PT Jump Shot", p1=20, t1=2),
+              event(3, 4, "11:18", home="Rebound", p1=11, t1=1),
+              event(4, 8, "10:00", home="SUB: 15 FOR 10", p1=10, t1=1, p2=15, t2=1),
+              event(5, 1, "9:30", home="3PT Jump Shot (3 PTS)", p1=15, t1=1)]
+    first, second = game_segments((1, 2), events, starters)
+    assert (first.start, first.end, first.pts, first.poss) == (0, 120, [2, 0], [1, 1])
+    assert sorted(second.lineups[0]) == [11, 12, 13, 14, 15]
+    assert (second.start, second.end, second.pts, second.poss) == (120, 720, [3, 0], [1, 0])
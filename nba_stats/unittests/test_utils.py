@@ -14,6 +14,21 @@ def teardown_func():
 # For now I'm just going to write tests for green light scenarios
 
 
+def test_convert_pctimestring_to_elapsed_seconds():
+    assert convert_pctimestring_to_elapsed_seconds(1, "12:00") == 0
+    assert convert_pctimestring_to_elapsed_seconds(2, "11:30") == 750
+    assert convert_pctimestring_to_elapsed_seconds(5, "0:00") == 3180
+
+
+def test_parse_play_by_play_score():
+    assert parse_play_by_play_score("98 - 101", 3) == (101, 98)
+    assert parse_play_by_play_score("98 - 101") == (101, 98)
+    # Margin says the home team's behind, so they must be listed first
+    assert parse_play_by_play_score("98 - 101", -3) == (98, 101)
+    assert parse_play_by_play_score("98 - 101", "-3") == (98, 101)
+    assert parse_play_by_play_score(None) == (None, None)
+
+
 def test_convert_height_to_inches():
     assert convert_height_to_int("6-7") == 79
 
@@ -63,3 +78,15 @@ def test_convert_colon_tstamp_to_duration():
 
 def test_convert_min_sec_to_float():
     assert convert_min_sec_to_float("24:36") == 24.6
+
+
+def test_convert_dict_keys_to_lowercase():
+    data = {'PTS': 10, 'AGE': 25, 'W_RANK': 3, 'GROUP_SET': "Overall", 'GAME_ID': "0021600001"}
+    result = convert_dict_keys_to_lowercase(data, override_list=['GROUP_SET'])
+    assert result == {'pts': 10, 'player_age': 25, 'group_set': "Overall"}
+
+
+def test_normalize_season_type():
+    assert normalize_season_type("Regular Season") == "Regular"
+    assert normalize_season_type("Playoffs") == "Playoffs"
+    assert normalize_season_type("Career Regular Season Totals") == "Regular"
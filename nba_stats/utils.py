@@ -1,11 +1,16 @@
 import logging
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
 from datetime import date, timedelta
-from requests import get
+from django.db import connections
 from django.apps import apps
 from django.db.models.fields import IntegerField, FloatField, CharField, DecimalField
 from bs4 import BeautifulSoup
-from nba_stats import models as nba_stats_models
+from nba_stats.fetch_client import fetch
+from nba_stats.json_stream import iter_result_sets
+from nba_stats.model_registry import get_model_registry
+from nba_stats.response_cache import get_response_cache
 from nba_stats.constants import *
 __author__ = 'John Griebel'
 
@@ -21,16 +26,71 @@ def extract_values(attrib):
 
 # For right now I'm just going to append the two url halves. Will soon switch to something
 # More modular.
-def get_json_response(url, params={}):
+def get_json_response(url, params={}, stream=False):
     # Note: I've seen examples online that use a 'referrer' element in the headers.
     # So far I've had success without that. Not too sure what's going on there.
-    response = get(url, params=params, headers=HEADERS)
+    # With stream=True you get back a generator of result sets instead; see stream_result_sets
+    cache = get_response_cache()
+    if cache is not None:
+        cached_response = cache.get(url, params)
+        if cached_response is not None:
+            if stream:
+                return _iter_cached_result_sets(cached_response)
+            return cached_response
+    if stream:
+        return stream_result_sets(url, params)
+    response = fetch(url, params=params, headers=HEADERS)
     json_response = response.json()
+    if cache is not None and response.ok:
+        cache.set(url, params, json_response)
     return json_response
 
 
+def _iter_cached_result_sets(json_response):
+    if 'resultSets' in json_response:
+        yield from json_response['resultSets']
+    elif 'resultSet' in json_response:
+        yield json_response['resultSet']
+
+
+def stream_result_sets(url, params={}):
+    # For the really big responses (a season of game logs, a career's worth of shots).
+    # Rather than reading the whole document and decoding it in one go, each result set's
+    # rows are decoded straight off the socket as the handler iterates over its 'rowSet'.
+    # Streamed responses aren't written to the response cache, that would mean holding
+    # onto the whole thing after all.
+    response = fetch(url, params=params, headers=HEADERS, stream=True)
+    with closing(response):
+        response.raise_for_status()
+        # Have urllib3 undo the gzip for us
+        response.raw.decode_content = True
+        yield from iter_result_sets(response.raw)
+
+
+def fetch_json_concurrently(requests_dict, max_workers=FETCH_CONCURRENCY):
+    # requests_dict maps whatever key the caller likes to a (url, params) tuple.
+    # Returns a dict with the same keys mapped to the json responses.
+    def _fetch(url, params):
+        try:
+            return get_json_response(url, params)
+        finally:
+            # Threads get their own db connections (the response cache may query Game),
+            # and django won't clean those up for us.
+            connections.close_all()
+
+    responses = {}
+    if not requests_dict:
+        return responses
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_fetch, url, params): key
+                   for key, (url, params) in requests_dict.items()}
+        for future in as_completed(futures):
+            responses[futures[future]] = future.result()
+    return responses
+
+
 def get_beautiful_soup(url):
-    response = get(url)
+    response = fetch(url)
     html = response.text
     soup = BeautifulSoup(html, 'html5lib')
     return soup
@@ -113,7 +173,7 @@ def get_model(prefix="", middle="", suffix=""):
         raise Exception("What are you doing? You have to pass at least one non-empty argument.")
 
     class_name = prefix + middle + suffix
-    model = getattr(nba_stats_models, class_name.replace(" ", ""))
+    model = get_model_registry().by_name(class_name).model
     return model
 
 
@@ -126,28 +186,69 @@ def convert_colon_tstamp_to_duration(tstamp):
     return duration
 
 
+def period_start_seconds(period):
+    # Seconds since tip off at the start of period, overtimes being 5 minutes
+    if period <= REGULATION_PERIODS:
+        return (period - 1) * PERIOD_SECONDS
+    return REGULATION_PERIODS * PERIOD_SECONDS + (period - REGULATION_PERIODS - 1) * OVERTIME_SECONDS
+
+
+def period_length(period):
+    return PERIOD_SECONDS if period <= REGULATION_PERIODS else OVERTIME_SECONDS
+
+
+def convert_pctimestring_to_elapsed_seconds(period, pctimestring):
+    # Play by play clock, e.g. period 2 with "11:42" left -> 738 seconds since tip off
+    if not pctimestring:
+        return period_start_seconds(period)
+    minutes, _, seconds = pctimestring.strip().partition(":")
+    remaining = int(minutes) * 60 + int(seconds or 0)
+    return period_start_seconds(period) + period_length(period) - remaining
+
+
+def parse_play_by_play_score(score, scoremargin=None):
+    # "98 - 101" -> (home, away). The NBA lists the visitors first; scoremargin (home - away)
+    # is used to double check, in case that ever changes. (None, None) if there's no score.
+    if not score or "-" not in score:
+        return None, None
+    away, _, home = score.partition("-")
+    away, home = int(away), int(home)
+    if scoremargin == "TIE":
+        scoremargin = 0
+    # Straight from the NBA it's still a string
+    scoremargin = int(scoremargin) if scoremargin else 0
+    if scoremargin and home - away != scoremargin and away - home == scoremargin:
+        home, away = away, home
+    return home, away
+
+
+# Keys that convert_dict_keys_to_lowercase drops (a few of them get renamed instead)
+KEYS_TO_IGNORE = frozenset(["GROUP_SET", "GROUP_VALUE", "CFID", "CFPARAMS", "TEAM_ID", "PLAYER_ID",
+                            "AGE", "HOME_TEAM_ID", "VISITOR_TEAM_ID", "TO", "PLAYER1_ID",
+                            "PLAYER2_ID", "PLAYER3_ID", "PLAYER1_TEAM_ID", "PLAYER2_TEAM_ID",
+                            "PLAYER3_TEAM_ID", "DLEAGE_FLAG", "GAMES_PLAYED_FLAG", 'W', 'L',
+                            "SEASON_YEAR", "PCT", "PERSON_ID", "DREB_PCT1", "Team_ID",
+                            "PLAYER_NAME", "LEAGUE_ID", "PTS_2ND_CHANCE"])
+RENAMED_KEYS = {'AGE': 'player_age', 'TO': 'tov', 'PERSON_ID': 'player_id', 'PCT': 'w_pct'}
+
+
+def convert_key_to_lowercase(key, isgame=False, override_list=(), aux_list=()):
+    # Returns None for keys that should be dropped
+    if key in override_list:
+        return key.lower()
+    if key == "GAME_ID" and not isgame:
+        return None
+    if "RANK" not in key and key not in KEYS_TO_IGNORE and key not in aux_list:
+        return key.lower()
+    return RENAMED_KEYS.get(key)
+
+
 def convert_dict_keys_to_lowercase(data, isgame=False, override_list=[], aux_list=[]):
     ret_dict = {}
-    keys_to_ignore = ["GROUP_SET", "GROUP_VALUE", "CFID", "CFPARAMS", "TEAM_ID", "PLAYER_ID", "AGE",
-                      "HOME_TEAM_ID", "VISITOR_TEAM_ID", "TO", "PLAYER1_ID", "PLAYER2_ID",
-                      "PLAYER3_ID", "PLAYER1_TEAM_ID", "PLAYER2_TEAM_ID", "PLAYER3_TEAM_ID",
-                      "DLEAGE_FLAG", "GAMES_PLAYED_FLAG", 'W', 'L', "SEASON_YEAR", "PCT",
-                      "PERSON_ID", "DREB_PCT1", "Team_ID", "PLAYER_NAME", "LEAGUE_ID",
-                      "PTS_2ND_CHANCE"] + aux_list
-    if not isgame:
-        keys_to_ignore.append("GAME_ID")
-
     for k, v in data.items():
-        if ("RANK" not in k and k not in keys_to_ignore) or k in override_list:
-            ret_dict[k.lower()] = v
-        elif k == 'AGE':
-            ret_dict['player_age'] = v
-        elif k == 'TO':
-            ret_dict['tov'] = v
-        elif k == 'PERSON_ID':
-            ret_dict['player_id'] = v
-        elif k == 'PCT':
-            ret_dict['w_pct'] = v
+        new_key = convert_key_to_lowercase(k, isgame, override_list, aux_list)
+        if new_key is not None:
+            ret_dict[new_key] = v
     return ret_dict
 
 
@@ -161,14 +262,7 @@ def convert_min_sec_to_float(min_sec):
 
 
 def auto_strip_and_convert_fields(model, data, uppercase=False, make_instance=True):
-    # I'm sure there is a more elegant way to do this
-    if uppercase:
-        final_data = {field.name: data[field.name.upper()] for field in
-                      model._meta.get_fields()
-                      if (field.name != 'id' and field.name.upper() in data)}
-    else:
-        final_data = {field.name: data[field.name] for field in
-                      model._meta.get_fields() if (field.name != 'id' and field.name in data)}
+    final_data = get_model_registry().strip(model, data, uppercase=uppercase)
     if make_instance:
         model_obj = model(**final_data)
         return model_obj
@@ -245,13 +339,10 @@ def make_unique_filter_dict(model, data=None, instance=None):
     if (data is None and instance is None) or (data is not None and instance is not None):
         raise ValueError("You must pass exactly one of data or instance")
 
-    if hasattr(model, "unique_together"):
-        # In the case of Lineup and its children, we've had to use a hack
-        # To get around the uniqueness constraint, and just made unique_together
-        # a class attribute
-        unique_fields = model.unique_together
-    else:
-        unique_fields = model._meta.unique_together[0]
+    # In the case of Lineup and its children, we've had to use a hack
+    # To get around the uniqueness constraint, and just made unique_together
+    # a class attribute. The registry knows about that.
+    unique_fields = get_model_registry().info(model).unique_fields
 
     if data:
         filter_dict = {fld: data[fld] for fld in unique_fields}
@@ -259,10 +350,13 @@ def make_unique_filter_dict(model, data=None, instance=None):
         filter_dict = {fld: getattr(instance, fld) for fld in unique_fields}
 
     if "season_type" in filter_dict:
-        new_season_type = filter_dict['season_type']
-        for junk_str in [" ", "Career", "Totals", "Season"]:
-            new_season_type = new_season_type.replace(junk_str, "")
-
-        filter_dict['season_type'] = new_season_type
+        filter_dict['season_type'] = normalize_season_type(filter_dict['season_type'])
     return filter_dict
 
+
+def normalize_season_type(season_type):
+    # season_type the way it's stored, e.g. "Regular Season" is saved as "Regular"
+    for junk_str in [" ", "Career", "Totals", "Season"]:
+        season_type = season_type.replace(junk_str, "")
+    return season_type
+
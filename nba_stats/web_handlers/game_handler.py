@@ -2,13 +2,15 @@ import logging
 from datetime import date
 from nba_stats.web_handlers.base_handler import BaseHandler
 from nba_stats.models import *
-from nba_stats.constants import NBA_BASE_URL
+from nba_stats.identity_map import get_identity_map
+from nba_stats.constants import NBA_BASE_URL, FETCH_CONCURRENCY
 from nba_stats.helpers.game import (convert_tracking_dict_to_nbapex_fields,
-                                    instantiate_correct_boxscore_type)
-from nba_stats.utils import (get_json_response,
+                                    instantiate_correct_boxscore_type,
+                                    get_box_score_player_stats, players_in_box_score,
+                                    players_in_play_by_play, set_play_by_play_numbers)
+from nba_stats.utils import (get_json_response, fetch_json_concurrently,
                              convert_datetime_string_to_date_instance as convert_date,
-                             convert_dict_keys_to_lowercase,
-                             convert_min_sec_to_float)
+                             convert_dict_keys_to_lowercase)
 log = logging.getLogger('stats')
 
 
@@ -29,16 +31,17 @@ class GameHandler(BaseHandler):
         self.date = scoreboard_date
         self.raw_data = get_json_response(self.full_url, self.params)
 
-    def game_headers(self, scoreboard_date=date.today(), season=None):
-        self._fetch_raw_data(scoreboard_date)
+    def game_headers(self, scoreboard_date=date.today(), season=None, fetch=True):
+        if fetch:
+            self._fetch_raw_data(scoreboard_date)
         gh_dict = self.raw_data['resultSets'][0]
         columns = gh_dict['headers']
         rows = gh_dict['rowSet']
         uppercase_dicts = [dict(zip(columns, row)) for row in rows]
         season_type = season.determine_season_type_for_date(scoreboard_date)
         for data in uppercase_dicts:
-            data['HOME_TEAM'] = Team.objects.get(team_id=data['HOME_TEAM_ID'])
-            data['VISITOR_TEAM'] = Team.objects.get(team_id=data['VISITOR_TEAM_ID'])
+            data['HOME_TEAM'] = get_identity_map().team(data['HOME_TEAM_ID'])
+            data['VISITOR_TEAM'] = get_identity_map().team(data['VISITOR_TEAM_ID'])
             data['GAME_DATE_EST'] = convert_date(data['GAME_DATE_EST'])
             data['SEASON'] = season
             data['SEASON_TYPE'] = season_type
@@ -47,9 +50,10 @@ class GameHandler(BaseHandler):
                            for data in uppercase_dicts]
         return converted_dicts
 
-    def create_games(self, scoreboard_date=date.today(), season=None):
+    def create_games(self, scoreboard_date=date.today(), season=None, fetch=True):
         log.debug("Creating Games for {d}".format(d=scoreboard_date))
-        data_dicts = self.game_headers(scoreboard_date=scoreboard_date, season=season)
+        data_dicts = self.game_headers(scoreboard_date=scoreboard_date, season=season,
+                                       fetch=fetch)
         self.obj_list = [Game(**data) for data in data_dicts]
         return self.obj_list
 
@@ -101,7 +105,7 @@ class GameSummaryHandler(BaseHandler):
         lscores_list = []
         for lscore in lscores:
             lscore['GAME_DATE_EST'] = convert_date(lscore['GAME_DATE_EST'])
-            lscore['TEAM'] = Team.objects.get(team_id=lscore['TEAM_ID'])
+            lscore['TEAM'] = get_identity_map().team(lscore['TEAM_ID'])
             lscore['GAME'] = self.game
             lscore = convert_dict_keys_to_lowercase(lscore)
             lscores_list.append(LineScore(**lscore))
@@ -126,14 +130,16 @@ class BoxScoreHandler(BaseHandler):
         # For BoxScores, raw_data is a list of dicts
         self.raw_data = {}
 
-    def fetch_raw_data(self):
+    def box_score_requests(self):
+        requests_dict = {}
         for btype in self.box_types[:-1]:
             full_url = self.base_url + self.endpoint.format(btype=btype)
-            rawdata = get_json_response(full_url, params=self.params)
-            self.raw_data[btype] = rawdata
-        full_url = self.base_url + "hustlestatsboxscore"
-        rawdata = get_json_response(full_url, params=self.params)
-        self.raw_data['hustle'] = rawdata
+            requests_dict[btype] = (full_url, self.params)
+        requests_dict['hustle'] = (self.base_url + "hustlestatsboxscore", self.params)
+        return requests_dict
+
+    def fetch_raw_data(self, max_workers=FETCH_CONCURRENCY):
+        fetch_all_box_scores([self], max_workers=max_workers)
 
     def _determine_matchup_and_winners(self, box_scores):
         home_line_score = self.game.linescore_set.get(team=self.game.home_team)
@@ -155,17 +161,12 @@ class BoxScoreHandler(BaseHandler):
         bkey = "playertrack" if box_type == "Tracking" else box_type.lower()
         log.debug(("bkey, btype", bkey, box_type))
         data = self.raw_data.get(bkey.replace(" ", ""))
-
-        if box_type == "Hustle":
-            hustle_status = data['resultSets'][0]['rowSet'][0][1]
-            if not hustle_status:
-                player_stats = None
-            else:
-                player_stats = data['resultSets'][1]
-        else:
-            player_stats = data['resultSets'][0]
+        player_stats = get_box_score_player_stats(data, box_type)
 
         if player_stats:
+            identity_map = get_identity_map()
+            # Anyone we've never heard of gets a placeholder up front, all in one insert.
+            identity_map.ensure_players(players_in_box_score(player_stats))
             player_headers = player_stats['headers']
 
             if box_type == "Hustle":
@@ -179,23 +180,9 @@ class BoxScoreHandler(BaseHandler):
                 temp_dict = dict(zip(player_headers, p))
 
                 temp_dict['GAME'] = self.game
-                temp_dict['TEAM'] = Team.objects.filter(team_id=temp_dict['TEAM_ID']).first()
-
-                player = Player.objects.filter(player_id=temp_dict['PLAYER_ID']).first()
-                if not player:
-                    # TODO: Properly handle the situation where the given player doesn't exist yet
-                    log.debug(
-                        "Player id and name about to look up: %s %s" % (temp_dict['PLAYER_ID'],
-                                                                        temp_dict['PLAYER_NAME']))
-                    # Laziest possible player creation...
-                    # should probably write a script that goes through the db and
-                    # attempts to fill in missing player data
-
-                    player = Player(display_first_last=temp_dict['PLAYER_NAME'],
-                                    player_id=temp_dict['PLAYER_ID'],
-                                    team=temp_dict['TEAM'])
-                    player.save()
-                temp_dict['PLAYER'] = player
+                temp_dict['TEAM'] = get_identity_map().find_team(temp_dict['TEAM_ID'])
+
+                temp_dict['PLAYER'] = identity_map.player(temp_dict['PLAYER_ID'])
 
                 if box_type == "Tracking":
                     converted_dict = convert_tracking_dict_to_nbapex_fields(temp_dict,
@@ -204,18 +191,13 @@ class BoxScoreHandler(BaseHandler):
                     converted_dict = temp_dict
                 p_box_data = convert_dict_keys_to_lowercase(converted_dict)
 
-                if box_type == 'Hustle':
-                    p_box_data['minutes'] = convert_min_sec_to_float(p_box_data['minutes'])
-                else:
-                    p_box_data['min'] = convert_min_sec_to_float(p_box_data['min'])
-
                 pbox = instantiate_correct_boxscore_type(p_box_data, box_type)
                 player_box_scores.append(pbox)
 
             for t in team_stats['rowSet']:
                 temp_dict = dict(zip(team_headers, t))
                 temp_dict['GAME'] = self.game
-                temp_dict['TEAM'] = Team.objects.filter(team_id=temp_dict['TEAM_ID']).first()
+                temp_dict['TEAM'] = get_identity_map().find_team(temp_dict['TEAM_ID'])
 
                 if box_type == 'Tracking':
                     converted_dict = convert_tracking_dict_to_nbapex_fields(temp_dict,
@@ -224,11 +206,6 @@ class BoxScoreHandler(BaseHandler):
                     converted_dict = temp_dict
                 t_box_data = convert_dict_keys_to_lowercase(converted_dict)
 
-                if box_type == "Hustle":
-                    t_box_data['minutes'] = convert_min_sec_to_float(t_box_data['minutes'])
-                else:
-                    t_box_data['min'] = convert_min_sec_to_float(t_box_data['min'])
-
                 tbox = instantiate_correct_boxscore_type(t_box_data, box_type)
                 team_box_scores.append(tbox)
         else:
@@ -239,6 +216,18 @@ class BoxScoreHandler(BaseHandler):
         return ret_dict
 
 
+def fetch_all_box_scores(box_handlers, max_workers=FETCH_CONCURRENCY):
+    # Fetches every box score type for every handler concurrently, e.g. all of the games
+    # on a given date. Afterwards each handler's boxscore() can be called as usual.
+    requests_dict = {}
+    for idx, handler in enumerate(box_handlers):
+        for btype, request in handler.box_score_requests().items():
+            requests_dict[(idx, btype)] = request
+    responses = fetch_json_concurrently(requests_dict, max_workers=max_workers)
+    for (idx, btype), rawdata in responses.items():
+        box_handlers[idx].raw_data[btype] = rawdata
+
+
 class PlayByPlayHandler(BaseHandler):
 
     def __init__(self, game):
@@ -259,41 +248,25 @@ class PlayByPlayHandler(BaseHandler):
     def play_by_play(self):
         pbp_list = []
         pbp_events = self._get_data(0)
+        identity_map = get_identity_map()
+        identity_map.ensure_players(players_in_play_by_play(self.raw_data['resultSets'][0]))
         for event in pbp_events:
             event['GAME'] = self.game
 
             if event['PLAYER1_NAME']:
-                player1 = Player.objects.filter(player_id=event['PLAYER1_ID']).first()
-                if not player1:
-                    player1 = Player(player_id=event['PLAYER1_ID'],
-                                     display_first_last=event['PLAYER1_NAME'])
-                    player1.save()
-                event['PLAYER1'] = player1
+                event['PLAYER1'] = identity_map.player(event['PLAYER1_ID'])
             if event['PLAYER1_TEAM_ID']:
-                event['PLAYER1_TEAM'] = Team.objects.filter(team_id=
-                                                            event['PLAYER1_TEAM_ID']).first()
+                event['PLAYER1_TEAM'] = identity_map.find_team(event['PLAYER1_TEAM_ID'])
 
             if event['PLAYER2_NAME']:
-                player2 = Player.objects.filter(player_id=event['PLAYER2_ID']).first()
-                if not player2:
-                    player2 = Player(player_id=event['PLAYER2_ID'],
-                                     display_first_last=event['PLAYER2_NAME'])
-                    player2.save()
-                event['PLAYER2'] = player2
+                event['PLAYER2'] = identity_map.player(event['PLAYER2_ID'])
             if event['PLAYER2_TEAM_ID']:
-                event['PLAYER2_TEAM'] = Team.objects.filter(
-                    team_id=event['PLAYER2_TEAM_ID']).first()
+                event['PLAYER2_TEAM'] = identity_map.find_team(event['PLAYER2_TEAM_ID'])
 
             if event['PLAYER3_NAME']:
-                player3 = Player.objects.filter(player_id=event['PLAYER3_ID']).first()
-                if not player3:
-                    player3 = Player(player_id=event['PLAYER3_ID'],
-                                     display_first_last=event['PLAYER1_NAME'])
-                    player3.save()
-                event['PLAYER3'] = player3
+                event['PLAYER3'] = identity_map.player(event['PLAYER3_ID'])
             if event['PLAYER3_TEAM_ID']:
-                event['PLAYER3_TEAM'] = Team.objects.filter(
-                    team_id=event['PLAYER3_TEAM_ID']).first()
+                event['PLAYER3_TEAM'] = identity_map.find_team(event['PLAYER3_TEAM_ID'])
 
             if event['SCOREMARGIN'] == 'TIE':
                 event['SCOREMARGIN'] = 0
@@ -302,4 +275,5 @@ class PlayByPlayHandler(BaseHandler):
             pbp = PlayByPlayEvent(**event)
             pbp_list.append(pbp)
 
+        set_play_by_play_numbers(pbp_list)
         return pbp_list
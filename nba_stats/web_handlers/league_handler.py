@@ -1,8 +1,11 @@
 import logging
 from datetime import date
-from nba_py.league import Lineups, PlayerStats, GameLog
+import pandas as pd
+from nba_py.league import Lineups, PlayerStats
 from nba_stats import models
-from nba_stats.models import Player, Team, Game, PlayerGameLog
+from nba_stats.models import Player, Team, Game, PlayerGameLog, make_lineup_player_key
+from nba_stats.identity_map import get_identity_map
+from nba_stats.model_registry import get_model_registry
 # I can't find any docs that say this import is required, but the signal
 # Doesn't seem to work without it
 # I think I've fixed the setup so that this can be removed. Need to test it out
@@ -14,15 +17,19 @@ from nba_stats.utils import (make_season_int,
                              make_season_str,
                              dictify, get_model,
                              convert_dict_keys_to_lowercase,
-                             get_json_response,
-                             convert_datetime_string_to_date_instance)
+                             get_json_response)
 from nba_stats.web_handlers.base_handler import BaseHandler
+from nba_stats.bulk import bulk_upsert
+from nba_stats.row_mapper import compile_row_mapper
+from nba_stats.frames import (result_set_to_frame, datetime_string_to_date, map_column,
+                              frame_for_model, iter_model_instances)
 from nba_stats.helpers.tracking import (convert_shot_type_dict_to_apex,
                                         convert_touch_dict_to_apex)
 from nba_stats.constants import (NBA_BASE_URL, BASE, REGULAR_SEASON,
                                  TOTALS, REVERSE_MONTH_MAP, GROUP_SETS, GROUP_VALUES,
                                  SPEED_DISTANCE, LEAGUE_PLAYER_TRACKING_ENDPOINT,
-                                 LEAUGE_PT_PARMS, USAGE, DEFENSE, MISC)
+                                 LEAUGE_PT_PARMS, USAGE, DEFENSE, MISC,
+                                 GAME_LOG_ENDPOINT, GAME_LOG_PARAMS, DERIVED_PER_MODES)
 
 log = logging.getLogger('stats')
 
@@ -37,7 +44,7 @@ class LineupHandler(BaseHandler):
     def fetch_raw_data(self, season=None, measure_type="Base", per_mode=TOTALS,
                        season_type=REGULAR_SEASON, group_quantity=5):
         self.measure_type = measure_type
-        self.model = get_model(prefix=self.measure_type, suffix="Lineup")
+        self.model = get_model_registry().lookup("", self.measure_type, "Lineup").model
         self.raw_data = []
         if measure_type in [USAGE, DEFENSE]:
             raise ValueError("Usage is not a valid measure type for lineups.")
@@ -59,7 +66,7 @@ class LineupHandler(BaseHandler):
         lineup_rows = dictify(result_set)
 
         for row in lineup_rows:
-            row['TEAM'] = Team.objects.get(team_id=int(row['TEAM_ID']))
+            row['TEAM'] = get_identity_map().team(row['TEAM_ID'])
             row['SEASON_ID'] = make_season_int(parms['Season'])
             row['MEASURE_TYPE'] = parms['MeasureType']
             row['SEASON_TYPE'] = parms['SeasonType']
@@ -82,32 +89,59 @@ class LineupHandler(BaseHandler):
     # that would be even more atypical.
 
     def lineups(self):
-        lineups_list = []
-
+        rows = []
+        player_ids = {}
+        candidates = []
         for row in self.raw_data:
             final_data = auto_strip_and_convert_fields(model=self.model,
                                                        data=row,
                                                        make_instance=False)
-            player_ids = [int(pid.strip()) for pid in row['group_id'].split("-")]
-            players = Player.objects.filter(player_id__in=player_ids).order_by('id')
-
-            filter_dict = make_unique_filter_dict(self.model, final_data)
-            filter_dict['group_quantity'] = final_data['group_quantity']
-            lineup = self.model.filter_on_players(players, filter_dict).first()
-
-            if lineup is None:
-                lineup = self.model(**final_data)
-                lineup.save()
-                lineup.players = players
-                lineup.save()
-                log.debug(("Created new lineup: ", filter_dict, players))
-
-            else:
-                for fld in final_data:
-                    setattr(lineup, fld, final_data[fld])
-                lineup.save()
-
-            lineups_list.append(lineup)
+            ids = [int(pid.strip()) for pid in row['group_id'].split("-")]
+            final_data['player_key'] = make_lineup_player_key(ids)
+            player_ids[final_data['player_key']] = ids
+            rows.append(final_data)
+            # GROUP_NAME lists the players' names in the same order as GROUP_ID
+            names = (row.get('group_name') or "").split(" - ")
+            if len(names) != len(ids):
+                names = [""] * len(ids)
+            candidates += [(pid, name, row['team']) for pid, name in zip(ids, names)]
+        if not rows:
+            return []
+        # Every player in the key has to make it into the m2m, so anyone we've never seen
+        # gets a placeholder first
+        get_identity_map().ensure_players(candidates)
+
+        # Every row in a response shares the same season, measure type, etc., so one query
+        # tells us which of these lineups we already have
+        filter_dict = make_unique_filter_dict(self.model, rows[0])
+        del filter_dict['team']
+        del filter_dict['player_key']
+        existing_keys = set(self.model.objects.filter(player_key__in=list(player_ids),
+                                                      **filter_dict)
+                            .values_list('team_id', 'player_key'))
+
+        # New and existing lineups alike go in with a single statement per batch
+        lineups_list = bulk_upsert(self.model, rows).objects
+
+        # Then the players for all of the new ones in one more. Going through the through
+        # model directly skips the per lineup m2m_changed signal; player_key has already
+        # made sure we aren't creating a duplicate.
+        players_field = self.model._meta.get_field('players')
+        through = players_field.remote_field.through
+        lineup_column = players_field.m2m_field_name() + "_id"
+        player_column = players_field.m2m_reverse_field_name() + "_id"
+        through_rows = []
+        new_lineups = 0
+        for lineup in lineups_list:
+            if (lineup.team_id, lineup.player_key) in existing_keys:
+                continue
+            new_lineups += 1
+            for pid in player_ids[lineup.player_key]:
+                player = get_identity_map().player(pid)
+                through_rows.append(through(**{lineup_column: lineup.pk,
+                                               player_column: player.pk}))
+        through.objects.bulk_create(through_rows)
+        log.debug(("Created ", new_lineups, " new lineups with ", len(through_rows), " players"))
 
         return lineups_list
 
@@ -121,6 +155,9 @@ class LeagueStatsHandler(BaseHandler):
     def fetch_raw_data(self, player_or_team=PlayerStats, season=None, season_type=REGULAR_SEASON,
                        measure_type=BASE, per_mode=TOTALS, group_set="Overall",
                        group_value=None):
+        if per_mode in DERIVED_PER_MODES:
+            raise ValueError("{pm} splits are derived from the Totals, see "
+                             "nba_stats.derived_splits.".format(pm=per_mode))
         self.measure_type = measure_type
         self.player_or_team = player_or_team
         if season is None:
@@ -146,48 +183,45 @@ class LeagueStatsHandler(BaseHandler):
                                **kwargs)
         raw_json = stats.json
         rset = raw_json['resultSets'][0]
-        stat_rows = dictify(result_set=rset)
-        for row in stat_rows:
-            if player_or_team == PlayerStats:
-                row['PLAYER'] = Player.objects.get(player_id=row['PLAYER_ID'])
-            else:
-                row['TEAM'] = Team.objects.get(team_id=row['TEAM_ID'])
-            row['GROUP_SET'] = group_set
-            row['SEASON'] = season
-            row['SEASON_TYPE'] = season_type
-            row['MEASURE_TYPE'] = measure_type
-            row['PER_MODE'] = per_mode
-            if group_set == "Month":
-                row['GROUP_VALUE'] = REVERSE_MONTH_MAP[group_value]
-            else:
-                row['GROUP_VALUE'] = group_value
-            if measure_type == "Misc":
-                row['PTS_SECOND_CHANCE'] = row['PTS_2ND_CHANCE']
-                row['OPP_PTS_SECOND_CHANCE'] = row['OPP_PTS_2ND_CHANCE']
-            elif measure_type == "Scoring":
-                row['PCT_PTS_2PT_MIDRANGE'] = row['PCT_PTS_2PT_MR']
-            elif measure_type == "Shooting":
-                if row['GROUP_SET'] == "Assisted By":
-                    row['GROUP_VALUE'] = row['PLAYER_NAME']
-        stat_rows = [convert_dict_keys_to_lowercase(row, override_list=['GROUP_SET',
-                                                                        'GROUP_VALUE'])
-                       for row in stat_rows]
-        self.raw_data = stat_rows
+        self.model = get_model_registry().lookup(entity, measure_type, "Split").model
+
+        constants = {'group_set': group_set,
+                     'season': season,
+                     'season_type': season_type,
+                     'measure_type': measure_type,
+                     'per_mode': per_mode,
+                     'group_value': (REVERSE_MONTH_MAP[group_value] if group_set == "Month"
+                                     else group_value)}
+        aliases = {}
+        if measure_type == "Misc":
+            aliases = {'PTS_SECOND_CHANCE': 'PTS_2ND_CHANCE',
+                       'OPP_PTS_SECOND_CHANCE': 'OPP_PTS_2ND_CHANCE'}
+        elif measure_type == "Scoring":
+            aliases = {'PCT_PTS_2PT_MIDRANGE': 'PCT_PTS_2PT_MR'}
+        elif measure_type == "Shooting" and group_set == "Assisted By":
+            aliases = {'GROUP_VALUE': 'PLAYER_NAME'}
+            del constants['group_value']
+        mapper = compile_row_mapper(rset['headers'], self.model, aliases=aliases,
+                                    override_list=['GROUP_SET', 'GROUP_VALUE'])
+
+        rows = rset['rowSet']
+        self.raw_data = mapper.map_rows(rows, constants)
+        identity_map = get_identity_map()
+        if player_or_team == PlayerStats:
+            player_idx = mapper.index('PLAYER_ID')
+            for data, row in zip(self.raw_data, rows):
+                data['player'] = identity_map.player(row[player_idx])
+        else:
+            team_idx = mapper.index('TEAM_ID')
+            for data, row in zip(self.raw_data, rows):
+                data['team'] = identity_map.team(row[team_idx])
 
     def splits(self):
-        prefix = "Player" if self.player_or_team == PlayerStats else "Team"
-        model = get_model(prefix=prefix, middle=self.measure_type.replace("Base", "Traditional"),
-                          suffix="Split")
-        splits = []
-        for row in self.raw_data:
-            data = auto_strip_and_convert_fields(model=model, data=row, make_instance=False)
-            filter_dict = make_unique_filter_dict(model, data=data)
-            split, created = model.objects.update_or_create(**filter_dict, defaults=data)
-            if created:
-                log.debug("Created a new split with the following parms:")
-                log.debug(filter_dict)
-            splits.append(split)
-        return splits
+        # raw_data is already a list of model field dicts, courtesy of the row mapper
+        result = bulk_upsert(self.model, self.raw_data)
+        log.debug("Created {c} and updated {u} {m}s".format(c=result.created, u=result.updated,
+                                                            m=self.model.__name__))
+        return result.objects
 
 
 # TODO: Think about how to combine this with LeagueStatsHandler. They're essentially identical
@@ -237,7 +271,7 @@ class LeaguePlayerTrackingHandler(BaseHandler):
         player_rows = dictify(result_set=rset)
         processed_rows = []
         for row in player_rows:
-            row['PLAYER'] = Player.objects.get(player_id=row['PLAYER_ID'])
+            row['PLAYER'] = get_identity_map().player(row['PLAYER_ID'])
             row['GROUP_SET'] = group_set
             row['SEASON'] = season
             row['SEASON_TYPE'] = season_type
@@ -259,24 +293,14 @@ class LeaguePlayerTrackingHandler(BaseHandler):
         self.raw_data = processed_rows
 
     def tracking(self):
-        tracks = []
-
-        for row in self.raw_data:
-            # Something weird is happening here, but only in specific cases
-            # Which are yet to be determined
-            data = auto_strip_and_convert_fields(model=self.model,
-                                                 data=row,
-                                                 make_instance=False)
-            filter_dict = make_unique_filter_dict(self.model, data=data)
-            track, created = self.model.objects.update_or_create(**filter_dict, defaults=data)
-
-            if created:
-                log.debug("Created a new tracking record with the following parms:")
-                log.debug(filter_dict)
-
-            tracks.append(track)
-
-        return tracks
+        # Something weird is happening here, but only in specific cases
+        # Which are yet to be determined
+        rows = [auto_strip_and_convert_fields(model=self.model, data=row, make_instance=False)
+                for row in self.raw_data]
+        result = bulk_upsert(self.model, rows)
+        log.debug("Created {c} and updated {u} {m}s".format(c=result.created, u=result.updated,
+                                                            m=self.model.__name__))
+        return result.objects
 
 
 class GameLogHandler(BaseHandler):
@@ -293,64 +317,50 @@ class GameLogHandler(BaseHandler):
         log.debug(("Fetching game logs for ", season, season_type,
                    self.entity_type.__name__))
 
-        gl = GameLog(season=season,
-                     season_type=season_type,
-                     player_or_team=player_or_team)
-
-        result_set = gl.json['resultSets'][0]
-        self.raw_data = dictify(result_set)
+        params = dict(GAME_LOG_PARAMS)
+        params['Season'] = season
+        params['SeasonType'] = season_type
+        params['PlayerOrTeam'] = player_or_team
+        # A season's worth of game logs is a big response, so it's streamed rather than
+        # decoded in one go
+        result_set = next(get_json_response(NBA_BASE_URL + GAME_LOG_ENDPOINT, params,
+                                            stream=True))
+        self.raw_data = result_set_to_frame(result_set)
 
     def game_logs(self, game_ids=None, team_ids=None, player_ids=None):
+        # A full season of player game logs is ~25k rows, so everything here is done a
+        # column at a time. The PlayerGameLog instances are only built as they're saved, a
+        # chunk at a time by bulk_load_chunks.
         log.debug("Creating GameLogs")
-        glogs = []
-        cur_team_id = None
-        team = None
-        cur_player_id = None
-        player = None
-        cur_game_id = None
-        game = None
-
-        for row in self.raw_data:
-            # While the NBA does give a 'SEASON_ID' in its response,
-            # It seems to be of the form '22016', or '22015', etc.
-            # I don't know what's going on there, and I don't trust it.
-            game_date = convert_datetime_string_to_date_instance(row['GAME_DATE'])
-            row['GAME_DATE'] = game_date
-            row['SEASON_ID'] = determine_season_for_date(game_date)
-            row['WIN_FLAG'] = row['WL'] == "W"
-
-            new_game_id = int(row['GAME_ID'])
-            if new_game_id != cur_game_id:
-                if game_ids is not None and new_game_id not in game_ids:
-                    continue
-
-                game = Game.objects.get(game_id=new_game_id)
-                cur_game_id = new_game_id
-            row['GAME'] = game
-
-            new_team_id = row['TEAM_ID']
-            if new_team_id != cur_team_id:
-                if team_ids is not None and new_team_id not in team_ids:
-                    continue
-
-                team = Team.objects.get(team_id=new_team_id)
-                cur_team_id = new_team_id
-            row['TEAM'] = team
-
-            if self.entity_type == Player:
-                new_player_id = row['PLAYER_ID']
-                if player_ids is not None and new_player_id not in player_ids:
-                    continue
-
-                if new_player_id != cur_player_id:
-                    player = Player.objects.get(player_id=new_player_id)
-                    cur_player_id = new_player_id
-                row['PLAYER'] = player
-
-            gm_log = auto_strip_and_convert_fields(model=PlayerGameLog,
-                                                   data=row,
-                                                   uppercase=True,
-                                                   make_instance=True)
-            glogs.append(gm_log)
-
-        return glogs
+        frame = self.raw_data
+        frame['GAME_ID'] = pd.to_numeric(frame['GAME_ID'])
+
+        keep = pd.Series(True, index=frame.index)
+        if game_ids is not None:
+            keep &= frame['GAME_ID'].isin(game_ids)
+        if team_ids is not None:
+            keep &= frame['TEAM_ID'].isin(team_ids)
+        if self.entity_type == Player and player_ids is not None:
+            keep &= frame['PLAYER_ID'].isin(player_ids)
+        frame = frame[keep].copy()
+
+        # While the NBA does give a 'SEASON_ID' in its response,
+        # It seems to be of the form '22016', or '22015', etc.
+        # I don't know what's going on there, and I don't trust it.
+        frame['GAME_DATE'] = datetime_string_to_date(frame['GAME_DATE'])
+        frame['WIN_FLAG'] = frame['WL'] == "W"
+
+        games = {game.game_id: game for game in
+                 Game.objects.filter(game_id__in=frame['GAME_ID'].unique().tolist())}
+
+        def get_game(game_id):
+            if game_id not in games:
+                raise Game.DoesNotExist("Game with game_id {g} does not exist".format(g=game_id))
+            return games[game_id]
+
+        frame['GAME'] = map_column(frame['GAME_ID'], get_game)
+        frame['TEAM'] = map_column(frame['TEAM_ID'], get_identity_map().team)
+        if self.entity_type == Player:
+            frame['PLAYER'] = map_column(frame['PLAYER_ID'], get_identity_map().player)
+
+        return iter_model_instances(frame_for_model(frame, PlayerGameLog), PlayerGameLog)
@@ -2,7 +2,9 @@ from bs4 import BeautifulSoup as bs
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
 from django.db.models import Q
 from nba_stats.models import *
+from nba_stats.identity_map import get_identity_map
 from nba_stats.utils import *
+from nba_stats.fetch_client import fetch
 from nba_stats.web_handlers.base_handler import BaseHandler
 
 
@@ -15,7 +17,7 @@ class InjuryHandler:
         self.dict_list = []
 
     def fetch_raw_data(self):
-        resp = get(self.url)
+        resp = fetch(self.url)
         html = resp.text
         self.soup = bs(html, 'html.parser')
 
@@ -200,11 +202,11 @@ class TransactionHandler(BaseHandler):
         apex_dict = {}
         pid = int(nba_dict['player_id'])
         log.debug("Looking up player_id " + str(pid))
-        player = Player.objects.get(player_id=pid)
+        player = get_identity_map().player(pid)
         apex_dict['player'] = player
         tid = int(nba_dict['team_id'])
         log.debug("Looking up team_id " + str(tid))
-        team = Team.objects.get(team_id=tid)
+        team = get_identity_map().team(tid)
         apex_dict['team'] = team
         apex_dict['transaction_date'] = convert_datetime_string_to_date_instance(nba_dict['transaction_date'])
         apex_dict['transaction_type'] = nba_dict['transaction_type']
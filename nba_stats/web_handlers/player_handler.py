@@ -1,18 +1,23 @@
 import logging
-from urllib.request import urlretrieve
 from bs4 import BeautifulSoup, Comment
 from django.db.models import Q
 from datetime import date
+import pandas as pd
 from nba_py.player import PlayerSummary
-from nba_py.shotchart import ShotChart
 from nba_stats.models import (Team, Transaction, Player, Game, PlayerShotChartDetail)
+from nba_stats.identity_map import get_identity_map
 from nba_stats.helpers.player import sanitize_player_data
+from nba_stats.fingerprints import content_hash
 from nba_stats.utils import (get_beautiful_soup, make_unique_filter_dict,
                              auto_strip_and_convert_fields,
                              make_season_str, determine_season_for_date,
-                             dictify, convert_dict_keys_to_lowercase)
+                             get_json_response)
 from nba_stats.web_handlers.base_handler import BaseHandler
-from nba_stats.constants import (NBA_BASE_URL, BBREF_BASE_URL, MONTHS)
+from nba_stats.bulk import bulk_upsert
+from nba_stats.frames import result_set_to_frame, map_column, frame_for_model, iter_frame_rows
+from nba_stats.fetch_client import fetch
+from nba_stats.constants import (NBA_BASE_URL, BBREF_BASE_URL, MONTHS, REGULAR_SEASON,
+                                 SHOTCHART_ENDPOINT, SHOTCHART_PARAMS)
 
 log = logging.getLogger('stats')
 
@@ -34,7 +39,9 @@ class PlayerHandler(BaseHandler):
     def get_player_image(self, filepath):
         url = "http://stats.nba.com/media/players/230x185/{pid}.png".format(pid=
                                                                             self.player_instance.player_id)
-        urlretrieve(url, filepath + str(self.player_instance.player_id) + ".png")
+        response = fetch(url)
+        with open(filepath + str(self.player_instance.player_id) + ".png", "wb") as image_file:
+            image_file.write(response.content)
 
     def fetch_raw_data(self):
         log.debug(("Before summary request", self.player_nba_id))
@@ -44,8 +51,9 @@ class PlayerHandler(BaseHandler):
         values = plr_sum.json['resultSets'][0]['rowSet'][0]
         data_dict = dict(zip(headers, values))
         data_dict = sanitize_player_data(data_dict)
+        self.content_hash = content_hash(data_dict)
         try:
-            data_dict['TEAM'] = Team.objects.get(team_id=data_dict['TEAM_ID'])
+            data_dict['TEAM'] = get_identity_map().team(data_dict['TEAM_ID'])
         except Exception as e:
             log.debug(("DINGO", data_dict))
             raise e
@@ -90,6 +98,7 @@ class PlayerTransactionHandler(BaseHandler):
         transaction_div = soup.find(attrs={'id': 'all_transactions'})
         comment = transaction_div.find_all(string=lambda text: isinstance(text, Comment))[0]
         new_html = comment.strip()
+        self.content_hash = content_hash(new_html)
         self.raw_data = BeautifulSoup(new_html, 'lxml')
 
     def transactions(self):
@@ -177,51 +186,42 @@ class PlayerShotChartHandler(BaseHandler):
         super().__init__(base_url=NBA_BASE_URL)
         self.player = None
 
-    def fetch_raw_data(self, player, season=None):
+    def fetch_raw_data(self, player, season=None, season_type=REGULAR_SEASON):
         self.player = player
         if season is None:
             season = make_season_str(determine_season_for_date(date.today()))
+        params = dict(SHOTCHART_PARAMS)
+        params['PlayerID'] = player.player_id
+        params['Season'] = str(season)
+        params['SeasonType'] = season_type
         log.debug("Pre network call")
-        shot_chart = ShotChart(player_id=player.player_id,
-                               season=str(season))
+        # Streamed; the shots are decoded straight into the frame as they arrive
+        result_set = next(get_json_response(NBA_BASE_URL + SHOTCHART_ENDPOINT, params,
+                                            stream=True))
+        self.raw_data = result_set_to_frame(result_set)
         log.debug("post network call")
-        scdtl_dicts = dictify(shot_chart.json['resultSets'][0])
-        self.raw_data = scdtl_dicts
 
     def shotcharts(self, game_ids=None):
-        shotchart_details = []
-        team = None
-        game = None
-        for detail in self.raw_data:
-            if game_ids is not None and detail['GAME_ID'] not in game_ids:
-                continue
-
-            detail['PLAYER'] = self.player
-
-            if team is None or detail['TEAM_ID'] != team.team_id:
-                log.debug(detail['TEAM_ID'])
-                team = Team.objects.get(team_id=detail['TEAM_ID'])
-                log.debug(team)
-            detail['TEAM'] = team
-
-            if game is None or detail['GAME_ID'] != getattr(game, 'game_id', None):
-
-                try:
-                    game = Game.objects.get(game_id=detail['GAME_ID'])
-
-                except Exception as e:
-                    log.debug(("DATA", detail))
-                    log.exception(e)
-                    raise e
-
-                detail['GAME'] = game
-
-            converted_dict = convert_dict_keys_to_lowercase(detail)
-            filter_dict = make_unique_filter_dict(PlayerShotChartDetail, converted_dict)
-            shotchart_dtl, created = PlayerShotChartDetail.objects.get_or_create(**filter_dict,
-                                                                                 defaults=converted_dict)
-            if created:
-                log.debug(("Created a new shot chart detail: ", filter_dict))
-            shotchart_details.append(shotchart_dtl)
-
-        return shotchart_details
+        frame = self.raw_data
+        frame['GAME_ID'] = pd.to_numeric(frame['GAME_ID'])
+        if game_ids is not None:
+            frame = frame[frame['GAME_ID'].isin(game_ids)].copy()
+
+        games = {game.game_id: game for game in
+                 Game.objects.filter(game_id__in=frame['GAME_ID'].unique().tolist())}
+
+        def get_game(game_id):
+            if game_id not in games:
+                log.debug(("No game for shot chart detail ", game_id))
+                raise Game.DoesNotExist("Game with game_id {g} does not exist".format(g=game_id))
+            return games[game_id]
+
+        frame['PLAYER'] = self.player
+        frame['TEAM'] = map_column(frame['TEAM_ID'], get_identity_map().team)
+        frame['GAME'] = map_column(frame['GAME_ID'], get_game)
+
+        rows = iter_frame_rows(frame_for_model(frame, PlayerShotChartDetail))
+        result = bulk_upsert(PlayerShotChartDetail, rows)
+        log.debug(("Created ", result.created, " and updated ", result.updated,
+                   " shot chart details for ", self.player))
+        return result.objects
@@ -1,9 +1,9 @@
 import logging
 from datetime import date
-from urllib.request import urlretrieve
 from nba_py.team import (TeamPlayerOnOffDetail, TeamPlayerOnOffSummary,
                          TeamSummary, TeamDetails)
-from nba_stats.models import Team, Player, Coach
+from nba_stats.models import Team, Coach
+from nba_stats.identity_map import get_identity_map
 from nba_stats.web_handlers.base_handler import BaseHandler
 from nba_stats.constants import NBA_BASE_URL, REGULAR_SEASON, BASE, TOTALS
 from nba_stats.utils import (make_season_int, auto_strip_and_convert_fields,
@@ -117,8 +117,8 @@ class OnOffHandler(BaseHandler):
             data['MEASURE_TYPE'] = parms['MeasureType']
             data['SEASON_TYPE'] = parms['SeasonType']
             data['PER_MODE'] = parms['PerMode']
-            data['TEAM'] = Team.objects.get(team_id=data['TEAM_ID'])
-            data['PLAYER'] = Player.objects.get(player_id=data['VS_PLAYER_ID'])
+            data['TEAM'] = get_identity_map().team(data['TEAM_ID'])
+            data['PLAYER'] = get_identity_map().player(data['VS_PLAYER_ID'])
 
             if detail_flag:
                 if measure_type == "Misc":